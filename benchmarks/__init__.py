@@ -0,0 +1,3 @@
+"""Benchmarks run by run_benchmarks.py. Importing a module of this package
+registers its benchmarks with libheat.benchmark.
+"""
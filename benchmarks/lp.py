@@ -0,0 +1,251 @@
+"""Compares LP backends on the LPs the simulator really solves.
+
+capture() runs simulations of the strategies that solve LPs, writing every
+SREA LP (srea.srea_LP()) and optimal decoupling LP
+(optdecouple.maximize_interagent_flex()) they solve to a file (see
+libheat.lpcapture). run() then replays the captured LPs against every
+available backend: every PuLP solver installed, and every method of
+scipy.optimize.linprog(). For each backend and kind of LP, it reports the
+distribution of solve times, the time spent building the LP for the backend,
+and how often the backend's status and optimal objective agree with the
+ones the simulator got. Run it with run_benchmarks.py --lp; its results can
+be saved and compared like those of the micro-benchmarks, on the median
+solve time.
+"""
+
+import statistics
+import time
+import warnings
+
+import numpy as np
+import pulp
+import scipy.optimize
+
+import run_simulator
+from libheat import benchmark
+from libheat import lpcapture
+from libheat.decoupling import optdecouple
+
+
+STRATEGIES = ("srea", "drea", "da")
+"""Strategies whose LPs are captured. drea solves SREA LPs whenever it
+reschedules, and da decouples agents with SREA by default."""
+
+FIDELITY = 0.005
+"""Fidelity of the alpha search of the optimal decoupling, as in
+DecoupledMonteSim."""
+
+LIMIT = 50
+"""Most LPs captured of every kind on each STN."""
+
+LINPROG_METHODS = ("highs-ds", "highs-ipm", "interior-point", "simplex")
+"""Methods of scipy.optimize.linprog() to try. Which exist depends on the
+version of scipy."""
+
+TOLERANCE = 1e-5
+"""Relative difference under which two optimal objectives agree."""
+
+_STATUS = {0: "Optimal", 2: "Infeasible", 3: "Unbounded"}
+"""PuLP status of each linprog() status. Others are "Not Solved"."""
+
+
+def capture(path, stns, strategies=STRATEGIES, samples=5, seed=None,
+            limit=LIMIT, sim_options=None) -> dict:
+    """Capture the LPs solved by simulations, and by the optimal decoupling
+    (the "opt_inter" decoupling of DecoupledMonteSim) of every STN with
+    interagent constraints.
+
+    Args:
+        path (str): JSON lines file to append the LPs to.
+        stns (list): The (name, STN) tuples to simulate.
+        strategies (iterable, optional): Strategies to simulate.
+        samples (int, optional): Samples per strategy and STN.
+        seed (int, optional): Random seed of the simulations.
+        limit (int, optional): Most LPs to capture of every kind on each
+            STN.
+        sim_options (dict, optional): Options of the simulator.
+
+    Returns:
+        The number of LPs captured of every kind.
+    """
+    counts = {}
+    for name, stn in stns:
+        lpcapture.start(path, limit=limit)
+        try:
+            for strategy in strategies:
+                run_simulator.multiple_simulations(
+                    stn, strategy, samples, threads=1, random_seed=seed,
+                    sim_options=sim_options)
+            if stn.interagent_edges:
+                optdecouple.decouple_agents(stn, fidelity=FIDELITY)
+        finally:
+            for kind, n in lpcapture.stop().items():
+                counts[kind] = counts.get(kind, 0) + n
+    return counts
+
+
+def backends() -> dict:
+    """Find every LP backend that can run here.
+
+    Returns:
+        A dictionary of the solve function of every backend, by name:
+        "pulp.<solver>" for PuLP solvers and "linprog.<method>" for the
+        methods of scipy.optimize.linprog(). Each takes a captured LP, and
+        returns its build seconds, solve seconds, status and objective.
+    """
+    found = {}
+    for name in pulp.listSolvers(onlyAvailable=True):
+        found["pulp." + name] = _pulp_backend(name)
+    for method in LINPROG_METHODS:
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                scipy.optimize.linprog([1.0], bounds=[(0, 1)],
+                                       method=method)
+        except ValueError:
+            continue
+        found["linprog." + method.replace(" ", "-")] = _linprog_backend(
+            method)
+    return found
+
+
+def _pulp_backend(name):
+    solver = pulp.getSolver(name, msg=False)
+
+    def solve(lp):
+        start = time.perf_counter()
+        prob = lpcapture.to_pulp(lp)
+        built = time.perf_counter()
+        prob.solve(solver)
+        solved = time.perf_counter()
+        return (built - start, solved - built, pulp.LpStatus[prob.status],
+                pulp.value(prob.objective))
+    return solve
+
+
+def _linprog_backend(method):
+    def solve(lp):
+        start = time.perf_counter()
+        arrays = lpcapture.to_arrays(lp)
+        built = time.perf_counter()
+        # The older methods warn about, and some fail on, the huge bounds
+        # standing in for infinite ones. Failures count as not solved.
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            try:
+                result = scipy.optimize.linprog(
+                    arrays["c"], A_ub=arrays["A_ub"], b_ub=arrays["b_ub"],
+                    A_eq=arrays["A_eq"], b_eq=arrays["b_eq"],
+                    bounds=arrays["bounds"], method=method)
+                status = _STATUS.get(result.status, "Not Solved")
+            except (ValueError, IndexError, np.linalg.LinAlgError):
+                status = "Not Solved"
+        solved = time.perf_counter()
+        objective = None
+        if status == "Optimal":
+            objective = arrays["sign"] * result.fun + arrays["constant"]
+        return built - start, solved - built, status, objective
+    return solve
+
+
+def agrees(objective, reference) -> bool:
+    """Whether two optimal objectives agree, within TOLERANCE."""
+    if objective is None or reference is None:
+        return objective is None and reference is None
+    return abs(objective - reference) \
+        <= TOLERANCE * max(1.0, abs(reference))
+
+
+def replay(lps, solve, repeat=1) -> dict:
+    """Solve captured LPs with one backend.
+
+    Args:
+        lps (list): LPs from lpcapture.load(), all of one kind.
+        solve (callable): A backend's solve function, from backends().
+        repeat (int, optional): Times to solve each LP. Each LP's fastest
+            build and solve are kept.
+
+    Returns:
+        A dictionary with the "median_s", "min_s", "p90_s" and "max_s" of
+        the solve times, the "build_median_s" of the build times, the
+        "build_fraction" of the total time spent building, the number of
+        "instances", and the fraction of them whose status
+        ("status_agreement") and, of those optimal for both, optimal
+        objective ("objective_agreement") agree with the simulator's.
+    """
+    builds, solves = [], []
+    same_status = same_objective = optimal = 0
+    for lp in lps:
+        runs = [solve(lp) for _ in range(repeat)]
+        builds.append(min(r[0] for r in runs))
+        solves.append(min(r[1] for r in runs))
+        status, objective = runs[0][2:]
+        if status == lp["status"]:
+            same_status += 1
+            if status == "Optimal":
+                optimal += 1
+                same_objective += agrees(objective, lp["objective_value"])
+    return {"median_s": statistics.median(solves),
+            "min_s": min(solves),
+            "p90_s": float(np.percentile(solves, 90)),
+            "max_s": max(solves),
+            "build_median_s": statistics.median(builds),
+            "build_fraction": sum(builds) / (sum(builds) + sum(solves)),
+            "instances": len(lps),
+            "status_agreement": same_status / len(lps),
+            "objective_agreement": (same_objective / optimal
+                                    if optimal else 1.0)}
+
+
+def run(path, pattern=None, repeat=1, progress=None) -> dict:
+    """Replay every captured LP against every backend.
+
+    Args:
+        path (str): JSON lines file of the captured LPs.
+        pattern (str, optional): Only run benchmarks whose name, e.g.
+            "lp.pulp.PULP_CBC_CMD", matches this shell-style pattern.
+        repeat (int, optional): Times to solve each LP with each backend.
+        progress (callable, optional): Called with the key and result of
+            every benchmark as it finishes.
+
+    Returns:
+        A dictionary of results from replay(), by benchmark.result_key() of
+        the benchmark's name and the kind of LP. Each result also holds its
+        "name" and "size" (the kind of LP).
+    """
+    by_kind = {}
+    for lp in lpcapture.load(path):
+        by_kind.setdefault(lp["kind"], []).append(lp)
+    results = {}
+    for backend, solve in sorted(backends().items()):
+        name = "lp." + backend
+        if pattern is not None and not benchmark.matches(name, pattern):
+            continue
+        for kind, lps in sorted(by_kind.items()):
+            result = replay(lps, solve, repeat=repeat)
+            result.update(name=name, size=kind)
+            key = benchmark.result_key(name, kind)
+            results[key] = result
+            if progress is not None:
+                progress(key, result)
+    return results
+
+
+def report(results) -> str:
+    """Format the latency distribution, build time and agreement of results
+    as a table.
+    """
+    width = max([len(k) for k in results] + [9])
+    lines = ["{:<{w}}  {:>5}  {:>9}  {:>9}  {:>9}  {:>9}  {:>6}  {:>6}"
+             .format("benchmark", "LPs", "p90", "max", "build", "build %",
+                     "status", "obj", w=width)]
+    for key, result in results.items():
+        lines.append(
+            "{:<{w}}  {:>5}  {:>7.2f}ms  {:>7.2f}ms  {:>7.2f}ms  {:>8.1f}%  "
+            "{:>5.0f}%  {:>5.0f}%".format(
+                key, result["instances"], result["p90_s"] * 1000,
+                result["max_s"] * 1000, result["build_median_s"] * 1000,
+                result["build_fraction"] * 100,
+                result["status_agreement"] * 100,
+                result["objective_agreement"] * 100, w=width))
+    return "\n".join(lines)
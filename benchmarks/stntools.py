@@ -0,0 +1,117 @@
+"""Benchmarks of the core operations of libheat.stntools, across STN sizes.
+
+The STNs are synthetic, with two agents (see libheat.stntools.generator).
+Sizes are numbers of timepoints, not counting the zero timepoint.
+"""
+
+import json
+import os.path
+import tempfile
+
+from libheat import benchmark
+from libheat.stntools import (generate_json, generate_stn,
+                              load_stn_from_json_file, mit2stn)
+
+
+SIZES = (10, 50, 200)
+"""Number of timepoints of the STNs most benchmarks run on."""
+
+CUBIC_SIZES = (10, 20, 40)
+"""Smaller sizes, for the benchmarks whose time grows with the cube of the
+number of timepoints."""
+
+AGENTS = 2
+SEED = 11
+
+_files = None
+"""Temporary directory holding the STN files of the benchmarks."""
+
+
+def stn_json(size) -> dict:
+    """Build the JSON object of an STN with size timepoints."""
+    return generate_json(agents=AGENTS, timepoints=size // AGENTS, seed=SEED)
+
+
+def mit_json(size) -> dict:
+    """Build the MIT format JSON object of a single STN with size
+    timepoints, in a chain.
+    """
+    edges = []
+    for k in range(1, size):
+        edge = {"start_event_name": "e{}".format(k - 1),
+                "end_event_name": "e{}".format(k),
+                "name": "c{}".format(k)}
+        if k % 2 == 1:
+            edge["type"] = "uncontrollable_probabilistic"
+            edge["properties"] = {"distribution": {
+                "type": "gaussian", "mean": 6.0, "variance": 4.0}}
+        else:
+            edge["type"] = "controllable"
+            edge["properties"] = {"lb": 0.0, "ub": 30.0}
+        edges.append(edge)
+    return {"name": "chain", "instances": [{"chain": edges}]}
+
+
+def make_stn(size):
+    """Build an STN with size timepoints."""
+    return generate_stn(agents=AGENTS, timepoints=size // AGENTS, seed=SEED)
+
+
+def _write(name, obj) -> str:
+    """Write a JSON object to a temporary file, and return its path."""
+    global _files
+    if _files is None:
+        _files = tempfile.TemporaryDirectory()
+    path = os.path.join(_files.name, name)
+    with open(path, "w") as f:
+        json.dump(obj, f)
+    return path
+
+
+def _middle(stn) -> int:
+    """Returns the ID of a timepoint in the middle of an STN."""
+    return sorted(stn.verts)[len(stn.verts) // 2]
+
+
+@benchmark.case("stn.copy", sizes=SIZES)
+def copy(size):
+    return make_stn(size).copy
+
+
+@benchmark.case("stn.floyd_warshall", sizes=CUBIC_SIZES)
+def floyd_warshall(size):
+    stn = make_stn(size)
+    return stn.copy, lambda s: s.floyd_warshall()
+
+
+@benchmark.case("stn.get_incoming", sizes=SIZES)
+def get_incoming(size):
+    stn = make_stn(size)
+    node_id = _middle(stn)
+    return lambda: stn.get_incoming(node_id)
+
+
+@benchmark.case("stn.remove_vertex", sizes=SIZES)
+def remove_vertex(size):
+    stn = make_stn(size)
+    node_id = _middle(stn)
+    return stn.copy, lambda s: s.remove_vertex(node_id)
+
+
+@benchmark.case("stn.get_substn", sizes=SIZES)
+def get_substn(size):
+    stn = make_stn(size)
+    verts = stn.getAgentVerts(stn.agents[0])
+    return lambda: stn.get_substn(verts, True)
+
+
+@benchmark.case("stntools.load_stn_from_json_file", sizes=SIZES)
+def load_json_file(size):
+    path = _write("stn{}.json".format(size), stn_json(size))
+    return lambda: load_stn_from_json_file(path)
+
+
+@benchmark.case("stntools.mit2stn", sizes=SIZES)
+def load_mit_file(size):
+    path = _write("mit{}.json".format(size), mit_json(size))
+    return lambda: mit2stn(path, add_z=True, connect_origin=True)
@@ -0,0 +1,158 @@
+"""End-to-end throughput of every execution strategy.
+
+Runs run_simulator.multiple_simulations() for each strategy on the STNs of
+test_data and on synthetic STNs, with a fixed seed, and measures samples per
+second, LP solves and builds per sample, and the time per sample spent in
+each top-level profiling span (see libheat.profiling). Run it with
+run_benchmarks.py --throughput; its results can be saved and compared like
+those of the micro-benchmarks, on the median time of a single simulation.
+"""
+
+import glob
+import json
+import statistics
+import time
+
+import run_simulator
+from libheat import benchmark
+from libheat import counters
+from libheat import profiling
+from libheat import stages
+from libheat.stntools import generate_stn, load_stn_from_json_file, mit2stn
+
+
+STRATEGIES = ("early", "srea", "drea", "drea-s", "drea-si", "drea-alp",
+              "drea-ar", "drea-ara", "arsi", "da")
+"""Every strategy of Simulator.get_guide(), and the decoupled "da"."""
+
+STN_FILES = "test_data/*.json"
+SYNTHETIC = ((2, 10), (4, 10))
+"""The (agents, timepoints per agent) of the synthetic STNs."""
+SYNTHETIC_SEED = 1
+
+SAMPLES = 20
+SEED = 4242
+SIM_OPTIONS = {"ar_threshold": 0.5, "si_threshold": 0.5,
+               "alp_threshold": 0.5}
+
+PHASES = ("get_guide", "srea", "selection", "propagation & check",
+          "lazy_propagation", "fast_forward", "draw_samples")
+"""Spans reported per sample. srea is nested in get_guide, and every other
+span is top-level."""
+
+
+def instances(pattern=STN_FILES, synthetic=SYNTHETIC) -> list:
+    """Load the STNs to run on.
+
+    Args:
+        pattern (str, optional): Glob of the STN files to load.
+        synthetic (iterable, optional): The (agents, timepoints per agent)
+            of every synthetic STN to generate.
+
+    Returns:
+        A list of (name, STN) tuples: the first instance of every file
+        matching pattern, MIT format or not, then the synthetic STNs, named
+        "synthetic-<agents>x<timepoints>".
+    """
+    stns = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path) as f:
+            mit = "instances" in json.load(f)
+        if mit:
+            stn = mit2stn(path, add_z=True, connect_origin=True)[0]
+        else:
+            stn = load_stn_from_json_file(path)["stn"]
+        stns.append((path.rsplit("/", 1)[-1], stn))
+    for agents, timepoints in synthetic:
+        stns.append(("synthetic-{}x{}".format(agents, timepoints),
+                     generate_stn(agents=agents, timepoints=timepoints,
+                                  seed=SYNTHETIC_SEED)))
+    return stns
+
+
+def measure(stn, strategy, samples=SAMPLES, seed=SEED, threads=1) -> dict:
+    """Simulate one strategy on an STN, and measure its throughput.
+
+    Returns:
+        A dictionary with the "median_s" and "min_s" seconds a single
+        simulation took, the "samples" run and their "robustness", the wall
+        clock "samples_per_s" (which includes starting the workers and
+        solving the initial guide), the mean "lp_solves_per_sample" and
+        "lp_builds_per_sample", and the "phases" seconds per sample of
+        every span in PHASES.
+    """
+    # Only the spans of the simulations are kept, and not those of the
+    # initial guide, which each worker solves once for every sample.
+    report = stages.stage_report()
+    was_enabled = profiling.is_enabled()
+    profiling.enable()
+    try:
+        start = time.perf_counter()
+        response = run_simulator.multiple_simulations(
+            stn, strategy, samples, threads=threads, random_seed=seed,
+            sim_options=SIM_OPTIONS, report=report)
+        wall = time.perf_counter() - start
+    finally:
+        profiling.enable(was_enabled)
+    spans = profiling.by_name(report["profile"])
+    counts = counters.columns(response["counters"])
+    return {"median_s": statistics.median(response["sim_times"]),
+            "min_s": min(response["sim_times"]),
+            "samples": samples,
+            "robustness": response["sample_results"].count(True) / samples,
+            "samples_per_s": samples / wall,
+            "lp_solves_per_sample": counts["lp_solves_per_sample"],
+            "lp_builds_per_sample": counts["lp_builds_per_sample"],
+            "phases": {name: spans.get(name, (0, 0.0))[1] / samples
+                       for name in PHASES}}
+
+
+def run(pattern=None, strategies=STRATEGIES, samples=SAMPLES, seed=SEED,
+        threads=1, synthetic=SYNTHETIC, max_size=None, progress=None) -> dict:
+    """Measure every strategy on every instance.
+
+    Args:
+        pattern (str, optional): Only run benchmarks whose name, e.g.
+            "throughput.drea", matches this shell-style pattern.
+        synthetic (iterable, optional): The (agents, timepoints per agent)
+            of the synthetic STNs to run on, e.g. a sweep of agent counts.
+        max_size (int, optional): Skip synthetic STNs with more timepoints
+            than this.
+        progress (callable, optional): Called with the key and result of
+            every benchmark as it finishes.
+
+    Returns:
+        A dictionary of results from measure(), by benchmark.result_key()
+        of the benchmark's name and the instance's. Each result also holds
+        its "name" and "size" (the instance's name).
+    """
+    stns = instances(synthetic=[(a, t) for a, t in synthetic
+                                if max_size is None or a * t <= max_size])
+    results = {}
+    for strategy in strategies:
+        name = "throughput." + strategy
+        if pattern is not None and not benchmark.matches(name, pattern):
+            continue
+        for instance, stn in stns:
+            result = measure(stn, strategy, samples=samples, seed=seed,
+                             threads=threads)
+            result.update(name=name, size=instance)
+            key = benchmark.result_key(name, instance)
+            results[key] = result
+            if progress is not None:
+                progress(key, result)
+    return results
+
+
+def report(results) -> str:
+    """Format the throughput and phase split of results as a table."""
+    width = max([len(k) for k in results] + [9])
+    lines = ["{:<{w}}  {:>9}  {:>9}  {}".format(
+        "benchmark", "samples/s", "LP/sample",
+        "  ".join("{:>11}".format(p) for p in PHASES), w=width)]
+    for key, result in results.items():
+        lines.append("{:<{w}}  {:>9.2f}  {:>9.2f}  {}".format(
+            key, result["samples_per_s"], result["lp_solves_per_sample"],
+            "  ".join("{:>9.2f}ms".format(result["phases"][p] * 1000)
+                      for p in PHASES), w=width))
+    return "\n".join(lines)
@@ -0,0 +1,217 @@
+"""Micro-benchmarks, and JSON baselines to catch regressions against.
+
+A benchmark registers a setup function with case(), along with the sizes it
+runs at. The setup builds what the benchmark needs for one size, untimed, and
+returns the function to time. If that function changes what it works on
+(removing a vertex, say), the setup returns a (prepare, func) tuple instead,
+and func(prepare()) is timed, with prepare() untimed before every call.
+
+run() times every case, save() writes the timings as a baseline, and
+compare() flags every benchmark whose median time per call grew by more than
+a threshold percentage over the baseline. See run_benchmarks.py.
+
+Examples:
+    >>> @benchmark.case("stn.copy", sizes=(10, 100))
+    ... def copy(size):
+    ...     stn = make_stn(size)
+    ...     return stn.copy
+    >>> results = benchmark.run(pattern="stn.*")
+    >>> benchmark.compare(results, benchmark.load("baseline.json"))
+"""
+
+import fnmatch
+import json
+import platform
+import statistics
+import time
+
+from . import fileio
+
+
+CASES = {}
+"""Registered benchmarks, of the form {name: (setup, sizes)}."""
+
+DEFAULT_THRESHOLD = 10.0
+"""Percentage by which a benchmark may slow down before it is flagged."""
+
+REPEAT = 5
+"""Number of timed rounds of each benchmark."""
+
+MIN_TIME = 0.2
+"""Seconds each benchmark is timed for, at least, over all of its rounds."""
+
+
+def case(name, sizes=(None,)):
+    """Decorator registering the setup function of a benchmark.
+
+    Args:
+        name (str): Name of the benchmark, such as "stn.copy".
+        sizes (iterable, optional): Sizes to run the benchmark at, each
+            given to the setup function. Default is a single run with a size
+            of None.
+    """
+    def register(setup):
+        CASES[name] = (setup, tuple(sizes))
+        return setup
+    return register
+
+
+def result_key(name, size) -> str:
+    """Build the key of the result of a benchmark at one size.
+
+    Examples:
+        >>> result_key("stn.copy", 100)
+        'stn.copy[100]'
+    """
+    return name if size is None else "{}[{}]".format(name, size)
+
+
+def matches(name, pattern) -> bool:
+    """Check whether a benchmark name matches a shell-style pattern."""
+    return fnmatch.fnmatchcase(name, pattern)
+
+
+def measure(func, prepare=None, repeat=REPEAT, min_time=MIN_TIME) -> dict:
+    """Time a function.
+
+    The number of calls per round is doubled until a round takes at least
+    min_time / repeat seconds, then repeat rounds are timed.
+
+    Args:
+        func (callable): Function to time. Called with no arguments, or with
+            what prepare() returned.
+        prepare (callable, optional): Called, untimed, before every call.
+
+    Returns:
+        A dictionary of the "median_s" and "min_s" seconds per call over the
+        rounds, and the number of "calls" per round and of "rounds".
+    """
+    target = min_time / repeat
+    calls = 1
+    while _time_round(func, prepare, calls) < target and calls < 2 ** 20:
+        calls *= 2
+    rounds = [_time_round(func, prepare, calls) / calls
+              for i in range(repeat)]
+    return {"median_s": statistics.median(rounds), "min_s": min(rounds),
+            "calls": calls, "rounds": repeat}
+
+
+def _time_round(func, prepare, calls) -> float:
+    """Returns the seconds spent in calls calls of func."""
+    if prepare is None:
+        start = time.perf_counter()
+        for i in range(calls):
+            func()
+        return time.perf_counter() - start
+    total = 0.0
+    for i in range(calls):
+        arg = prepare()
+        start = time.perf_counter()
+        func(arg)
+        total += time.perf_counter() - start
+    return total
+
+
+def run(pattern=None, max_size=None, repeat=REPEAT, min_time=MIN_TIME,
+        progress=None) -> dict:
+    """Run registered benchmarks.
+
+    Args:
+        pattern (str, optional): Only run benchmarks whose name matches this
+            shell-style pattern, e.g. "stn.*".
+        max_size (int, optional): Skip sizes above this.
+        progress (callable, optional): Called with the key and result of
+            every benchmark as it finishes.
+
+    Returns:
+        A dictionary of results from measure(), by result_key(). Each result
+        also holds its benchmark's "name" and "size".
+    """
+    results = {}
+    for name, (setup, sizes) in CASES.items():
+        if pattern is not None and not matches(name, pattern):
+            continue
+        for size in sizes:
+            if max_size is not None and size is not None and size > max_size:
+                continue
+            func = setup(size)
+            prepare = None
+            if isinstance(func, tuple):
+                prepare, func = func
+            result = measure(func, prepare=prepare, repeat=repeat,
+                             min_time=min_time)
+            result.update(name=name, size=size)
+            key = result_key(name, size)
+            results[key] = result
+            if progress is not None:
+                progress(key, result)
+    return results
+
+
+def save(path, results):
+    """Write results as a baseline, along with the machine they ran on."""
+    baseline = {"created": time.time(),
+                "machine": platform.platform(),
+                "python": platform.python_version(),
+                "results": results}
+    with fileio.atomic_write(path) as f:
+        json.dump(baseline, f, indent=1, sort_keys=True)
+
+
+def load(path) -> dict:
+    """Read the results of a baseline written by save()."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD) -> list:
+    """Compare results with a baseline.
+
+    Args:
+        results (dict): Results from run().
+        baseline (dict): Results from load().
+        threshold (float, optional): Percentage by which the median time of
+            a benchmark may grow before it is flagged as a regression.
+
+    Returns:
+        A list of dictionaries, one per benchmark in both, in the order of
+        results, of its "key", "baseline_s" and "median_s" medians, the
+        "change" in percent, and whether it "regressed".
+    """
+    comparison = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        before = baseline[key]["median_s"]
+        change = (result["median_s"] - before) / before * 100.0
+        comparison.append({"key": key, "baseline_s": before,
+                           "median_s": result["median_s"],
+                           "change": change,
+                           "regressed": change > threshold})
+    return comparison
+
+
+def report(results, comparison=None) -> str:
+    """Format results, and their comparison with a baseline, as a table."""
+    changes = {c["key"]: c for c in comparison or []}
+    width = max([len(k) for k in results] + [9])
+    lines = ["{:<{w}}  {:>12}  {:>12}  {:>9}".format(
+        "benchmark", "median", "min", "change", w=width)]
+    for key, result in results.items():
+        change = ""
+        if key in changes:
+            change = "{:+.1f}%{}".format(
+                changes[key]["change"],
+                " !" if changes[key]["regressed"] else "")
+        lines.append("{:<{w}}  {:>12}  {:>12}  {:>9}".format(
+            key, _format_time(result["median_s"]),
+            _format_time(result["min_s"]), change, w=width))
+    return "\n".join(lines)
+
+
+def _format_time(seconds) -> str:
+    """Format a duration with a readable unit."""
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return "{:.3f} {}".format(seconds / scale, unit)
+    return "{:.1f} ns".format(seconds / 1e-9)
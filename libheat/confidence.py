@@ -0,0 +1,110 @@
+"""Confidence intervals for robustness estimates.
+
+Robustness is the fraction of successful Monte-Carlo samples, so it is a
+binomial proportion. The Wilson score interval behaves well near 0% and 100%
+robustness, which is where many of our STNs end up.
+"""
+
+from math import sqrt
+
+from scipy.stats import norm
+
+
+DEFAULT_CONFIDENCE = 0.95
+"""The default confidence level for robustness intervals."""
+
+
+def wilson_interval(successes, trials, confidence=DEFAULT_CONFIDENCE) -> tuple:
+    """Returns the Wilson score interval of a binomial proportion.
+
+    Args:
+        successes (int): Number of successful trials.
+        trials (int): Total number of trials.
+        confidence (float, optional): Confidence level of the interval.
+            Default is 0.95.
+
+    Returns:
+        A tuple of (lower, upper) bounds on the proportion. If there are no
+        trials, returns (0.0, 1.0).
+
+    Examples:
+        >>> wilson_interval(0, 0)
+        (0.0, 1.0)
+        >>> low, high = wilson_interval(50, 100)
+        >>> round(low, 3), round(high, 3)
+        (0.404, 0.596)
+    """
+    if trials <= 0:
+        return 0.0, 1.0
+    z = float(norm.ppf(1.0 - (1.0 - confidence) / 2.0))
+    p_hat = successes / trials
+    denom = 1.0 + z**2 / trials
+    centre = (p_hat + z**2 / (2.0 * trials)) / denom
+    spread = (z * sqrt(p_hat * (1.0 - p_hat) / trials
+                       + z**2 / (4.0 * trials**2))) / denom
+    return max(0.0, centre - spread), min(1.0, centre + spread)
+
+
+def half_width(successes, trials, confidence=DEFAULT_CONFIDENCE) -> float:
+    """Returns half the width of the Wilson score interval.
+
+    Args:
+        successes (int): Number of successful trials.
+        trials (int): Total number of trials.
+        confidence (float, optional): Confidence level of the interval.
+
+    Returns:
+        Half of the width of the interval, as a float.
+    """
+    low, high = wilson_interval(successes, trials, confidence=confidence)
+    return (high - low) / 2.0
+
+
+def should_stop(successes, trials, tolerance, cap,
+                confidence=DEFAULT_CONFIDENCE) -> bool:
+    """Decide whether sequential sampling can stop.
+
+    Args:
+        successes (int): Number of successful samples so far.
+        trials (int): Number of samples so far.
+        tolerance (float): Target half-width of the robustness interval.
+        cap (int): Maximum number of samples to run.
+        confidence (float, optional): Confidence level of the interval.
+
+    Returns:
+        True if the interval is narrow enough or the cap has been reached.
+    """
+    if trials >= cap:
+        return True
+    if trials <= 0:
+        return False
+    return half_width(successes, trials, confidence=confidence) <= tolerance
+
+
+def paired_difference(results, baseline) -> tuple:
+    """Returns the mean paired difference between two lists of sample
+    results, and the standard error of that mean.
+
+    Samples must be paired: results[i] and baseline[i] were simulated on the
+    same contingent durations.
+
+    Args:
+        results (list): List of bools (or numbers) for each sample.
+        baseline (list): List of bools (or numbers) for the same samples.
+
+    Returns:
+        A tuple of (mean difference, standard error).
+
+    Examples:
+        >>> paired_difference([True, True], [True, False])
+        (0.5, 0.5)
+    """
+    n = min(len(results), len(baseline))
+    if n == 0:
+        return 0.0, 0.0
+    diffs = [float(results[i]) - float(baseline[i]) for i in range(n)]
+    mean = sum(diffs) / n
+    if n == 1:
+        return mean, 0.0
+    variance = sum((d - mean)**2 for d in diffs) / (n - 1)
+    return mean, sqrt(variance / n)
@@ -0,0 +1,470 @@
+"""Distributing simulation tasks to workers on several machines.
+
+A CoordinatorPool serves tasks over a TCP or Unix socket, in place of a local
+WorkerPool. Workers, started on any machine with run_worker(), fetch the
+shared objects once, then pull batches of tasks and send back results. Each
+worker sends a heartbeat while it runs. If a worker stops sending heartbeats
+(because it crashed, or its machine went down), the tasks it holds are given
+to other workers, up to MAX_REQUEUES times. A task that raises does not stop
+its worker: the exception is sent back, and raised again in the coordinator,
+as multiprocessing.Pool does.
+
+The manager socket unpickles what the other side sends, so the coordinator
+and its workers must share a secret key. Without one, a random key is made
+and printed, and only Unix sockets and loopback addresses may be served on.
+"""
+
+import collections
+import ipaddress
+import itertools
+import pickle
+import secrets
+import socket
+import threading
+import time
+import traceback
+import uuid
+from multiprocessing.connection import Client
+from multiprocessing.managers import BaseManager
+
+from . import printers as pr
+from . import workerpool
+
+
+HEARTBEAT_INTERVAL = 5.0
+"""Seconds between the heartbeats of a worker."""
+
+HEARTBEAT_TIMEOUT = 30.0
+"""Seconds without a heartbeat after which a worker is presumed lost, and its
+tasks are queued again."""
+
+POLL_INTERVAL = 0.2
+"""Seconds to wait before asking again when there is nothing to do."""
+
+TASKS_PER_REQUEST = 4
+"""Number of tasks a worker takes at a time."""
+
+CONNECT_RETRIES = 30
+"""Number of times a worker tries to connect before giving up."""
+
+MAX_REQUEUES = 3
+"""Number of times a task is queued again after its worker was lost, before
+it counts as failed. A task that crashes every worker it runs on would
+otherwise take down all of them in turn."""
+
+STOP = "stop"
+"""Returned to workers once the coordinator has no more work."""
+
+
+class RemoteTraceback(Exception):
+    """The traceback of an exception raised on a worker. Set as the cause of
+    the exception raised again in the coordinator.
+    """
+
+    def __str__(self):
+        return self.args[0]
+
+
+class TaskError(object):
+    """The exception a task raised on a worker, or the failure of a task
+    whose workers were all lost. Sent in place of the task's result.
+
+    Args:
+        exception (Exception): The exception to raise in the coordinator.
+        text (str, optional): The formatted traceback from the worker.
+    """
+
+    def __init__(self, exception, text=""):
+        self.exception = exception
+        self.text = text
+
+    def raise_(self):
+        """Raise the exception, with the worker's traceback as its cause."""
+        if self.text:
+            raise self.exception from RemoteTraceback(self.text)
+        raise self.exception
+
+
+def _task_error(exception) -> TaskError:
+    """Wrap the exception being handled, so that it can be sent back from a
+    worker. Exceptions which cannot be pickled are sent as a RuntimeError.
+    """
+    text = traceback.format_exc()
+    try:
+        pickle.dumps(exception)
+    except Exception:
+        exception = RuntimeError(repr(exception))
+    return TaskError(exception, text)
+
+
+def parse_address(address):
+    """Parse a coordinator address.
+
+    Args:
+        address (str): Either "host:port" for a TCP socket, or the path of a
+            Unix socket.
+
+    Returns:
+        The address in the form multiprocessing expects.
+
+    Examples:
+        >>> parse_address("localhost:5000")
+        ('localhost', 5000)
+        >>> parse_address("/tmp/dream.sock")
+        '/tmp/dream.sock'
+    """
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        return host, int(port)
+    return address
+
+
+def is_local(address) -> bool:
+    """Whether an address can only be reached from this machine: a Unix
+    socket, or a TCP socket on a loopback interface.
+
+    Examples:
+        >>> is_local("localhost:5000")
+        True
+        >>> is_local("0.0.0.0:5000")
+        False
+    """
+    address = parse_address(address)
+    if isinstance(address, str):
+        return True
+    try:
+        return ipaddress.ip_address(
+            socket.gethostbyname(address[0])).is_loopback
+    except (OSError, ValueError):
+        return False
+
+
+def new_authkey() -> bytes:
+    """Make a random key for a coordinator and its workers."""
+    return secrets.token_hex(16).encode()
+
+
+class Coordinator(object):
+    """The task queue served to the workers. Safe to use from several
+    threads at once.
+
+    Args:
+        shared (dict): Objects that every worker needs, keyed by ID.
+        timeout (float, optional): Seconds without a heartbeat before a
+            worker's tasks are queued again.
+    """
+
+    def __init__(self, shared, timeout=HEARTBEAT_TIMEOUT):
+        self._shared = shared
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._tasks = {}
+        self._pending = collections.deque()
+        self._leases = {}
+        self._seen = {}
+        self._results = []
+        self._requeues = collections.Counter()
+        self._stopped = False
+        self.requeued = 0
+
+    def register(self) -> str:
+        """Register a new worker, and return its ID."""
+        worker_id = uuid.uuid4().hex
+        with self._lock:
+            self._seen[worker_id] = time.time()
+        pr.verbose("Worker {} joined".format(worker_id))
+        return worker_id
+
+    def shared(self) -> dict:
+        """Returns the objects shared with every worker."""
+        return self._shared
+
+    def heartbeat(self, worker_id):
+        """Record that a worker is still alive."""
+        with self._lock:
+            self._seen[worker_id] = time.time()
+
+    def submit(self, tasks) -> list:
+        """Queue tasks for the workers.
+
+        Returns:
+            The IDs of the tasks, in order.
+        """
+        with self._lock:
+            ids = []
+            for task in tasks:
+                task_id = next(self._ids)
+                self._tasks[task_id] = task
+                self._pending.append(task_id)
+                ids.append(task_id)
+            return ids
+
+    def get_tasks(self, worker_id, count=TASKS_PER_REQUEST):
+        """Give a worker up to count tasks.
+
+        Returns:
+            A list of (task ID, task) tuples, which is empty if no task is
+            ready yet, or STOP if the coordinator is done.
+        """
+        with self._lock:
+            if self._stopped:
+                return STOP
+            self._seen[worker_id] = time.time()
+            self._requeue_lost()
+            given = []
+            while self._pending and len(given) < count:
+                task_id = self._pending.popleft()
+                if task_id not in self._tasks:
+                    # Finished by another worker since it was queued again.
+                    continue
+                self._leases[task_id] = worker_id
+                given.append((task_id, self._tasks[task_id]))
+            return given
+
+    def put_result(self, worker_id, task_id, result):
+        """Receive the result of a task from a worker, or the TaskError it
+        raised. Results of tasks that were already finished by another worker
+        are dropped.
+        """
+        with self._lock:
+            self._seen[worker_id] = time.time()
+            if self._tasks.pop(task_id, None) is None:
+                return
+            self._leases.pop(task_id, None)
+            self._requeues.pop(task_id, None)
+            self._results.append((task_id, result))
+
+    def take_results(self) -> list:
+        """Returns the (task ID, result) tuples received since the last
+        call, and requeues the tasks of lost workers.
+        """
+        with self._lock:
+            self._requeue_lost()
+            results, self._results = self._results, []
+            return results
+
+    def stop(self):
+        """Tell every worker to stop."""
+        with self._lock:
+            self._stopped = True
+
+    def _requeue_lost(self):
+        now = time.time()
+        lost = {w for w, seen in self._seen.items()
+                if now - seen > self._timeout}
+        for task_id, worker_id in list(self._leases.items()):
+            if worker_id in lost:
+                del self._leases[task_id]
+                self._requeues[task_id] += 1
+                if self._requeues[task_id] > MAX_REQUEUES:
+                    del self._tasks[task_id]
+                    del self._requeues[task_id]
+                    self._results.append((task_id, TaskError(RuntimeError(
+                        "Task {} was lost along with {} workers".format(
+                            task_id, MAX_REQUEUES + 1)))))
+                    continue
+                self._pending.appendleft(task_id)
+                self.requeued += 1
+        for worker_id in lost:
+            pr.warning("Lost worker {}; its tasks were queued again"
+                       .format(worker_id))
+            del self._seen[worker_id]
+
+
+_coordinator = None
+"""The Coordinator served by this process."""
+
+
+def _get_coordinator():
+    return _coordinator
+
+
+class _ServerManager(BaseManager):
+    pass
+
+
+_ServerManager.register("coordinator", callable=_get_coordinator)
+
+
+class _ClientManager(BaseManager):
+    pass
+
+
+_ClientManager.register("coordinator")
+
+
+def _run(func, task):
+    """Run a task that was served with its function."""
+    return func(task)
+
+
+class CoordinatorPool(object):
+    """A worker pool whose workers connect over a socket. It has the same
+    interface as workerpool.WorkerPool.
+
+    Args:
+        shared (dict): Objects to send to every worker, keyed by ID. These
+            are pickled, so they must not refer to local shared memory.
+        address (str): Address to serve on; see parse_address().
+        authkey (bytes, optional): Key the workers must present. Default is
+            a new random key, which is printed, and is only allowed if the
+            address is local (see is_local()).
+        timeout (float, optional): Seconds without a heartbeat before a
+            worker's tasks are queued again.
+
+    Raises:
+        ValueError: If no key is given, and the address can be reached from
+            other machines.
+    """
+
+    def __init__(self, shared, address, authkey=None,
+                 timeout=HEARTBEAT_TIMEOUT):
+        global _coordinator
+        if authkey is None:
+            if not is_local(address):
+                raise ValueError("Serving on {} needs a key, since other "
+                                 "machines can reach it".format(address))
+            authkey = new_authkey()
+            print("Start workers with --authkey {}".format(authkey.decode()))
+        self.shared = shared
+        self.address = parse_address(address)
+        self.authkey = authkey
+        self.coordinator = Coordinator(shared, timeout=timeout)
+        _coordinator = self.coordinator
+        manager = _ServerManager(address=self.address, authkey=authkey)
+        self._server = manager.get_server()
+        # Normally made by Server.serve_forever(), which would also take
+        # over this process. Setting it stops every connection thread.
+        self._server.stop_event = threading.Event()
+        self._closed = self._server.stop_event
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+        self._thread.start()
+        print("Serving tasks on {}".format(address))
+
+    def _accept(self):
+        """Accept worker connections, each served by its own thread, until
+        the pool is closed.
+        """
+        while not self._closed.is_set():
+            try:
+                connection = self._server.listener.accept()
+            except OSError:
+                continue
+            if self._closed.is_set():
+                connection.close()
+                break
+            threading.Thread(target=self._server.handle_request,
+                             args=(connection,), daemon=True).start()
+
+    def imap_unordered(self, func, tasks, chunksize=None):
+        """Run func on every task on the workers, yielding results as they
+        arrive. chunksize is ignored; workers take TASKS_PER_REQUEST tasks at
+        a time.
+
+        Raises:
+            Exception: The exception a task raised on its worker, or a
+                RuntimeError if a task lost more than MAX_REQUEUES workers.
+        """
+        ids = set(self.coordinator.submit([(func, t) for t in tasks]))
+        while ids:
+            results = self.coordinator.take_results()
+            if not results:
+                time.sleep(POLL_INTERVAL)
+            for task_id, result in results:
+                ids.discard(task_id)
+                if isinstance(result, TaskError):
+                    result.raise_()
+                yield result
+
+    def close(self):
+        """Tell the workers to stop, and stop serving."""
+        if self._closed.is_set():
+            return
+        self.coordinator.stop()
+        # Give the workers a chance to hear that there is no more work.
+        time.sleep(2 * POLL_INTERVAL)
+        self._closed.set()
+        # Wake the accepting thread up with one last connection.
+        try:
+            Client(self.address, authkey=self.authkey).close()
+        except (OSError, EOFError):
+            pass
+        self._thread.join()
+        self._server.listener.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _connect(address, authkey):
+    """Connect to a coordinator, retrying while it starts up."""
+    for attempt in range(CONNECT_RETRIES):
+        manager = _ClientManager(address=parse_address(address),
+                                 authkey=authkey)
+        try:
+            manager.connect()
+            return manager.coordinator()
+        except (ConnectionError, FileNotFoundError):
+            time.sleep(1.0)
+    raise ConnectionError("Could not reach a coordinator at {}"
+                          .format(address))
+
+
+def _heartbeat(address, authkey, worker_id, done):
+    """Send heartbeats until done is set. Uses its own connection, since
+    proxies cannot be shared between threads.
+    """
+    coordinator = _connect(address, authkey)
+    while not done.wait(HEARTBEAT_INTERVAL):
+        try:
+            coordinator.heartbeat(worker_id)
+        except (ConnectionError, EOFError):
+            return
+
+
+def run_worker(address, authkey) -> int:
+    """Pull and run tasks from a coordinator until it has no more work.
+
+    Args:
+        address (str): Address of the coordinator; see parse_address().
+        authkey (bytes): Key of the coordinator.
+
+    Returns:
+        The number of tasks this worker ran.
+    """
+    coordinator = _connect(address, authkey)
+    worker_id = coordinator.register()
+    workerpool.set_shared(coordinator.shared())
+    done = threading.Event()
+    heart = threading.Thread(target=_heartbeat,
+                             args=(address, authkey, worker_id, done),
+                             daemon=True)
+    heart.start()
+    ran = 0
+    try:
+        while True:
+            try:
+                tasks = coordinator.get_tasks(worker_id)
+            except (ConnectionError, EOFError):
+                # The coordinator went away; there is nothing left to do.
+                break
+            if tasks == STOP:
+                break
+            if not tasks:
+                time.sleep(POLL_INTERVAL)
+                continue
+            for task_id, (func, task) in tasks:
+                try:
+                    result = _run(func, task)
+                except Exception as e:
+                    result = _task_error(e)
+                coordinator.put_result(worker_id, task_id, result)
+                ran += 1
+    finally:
+        done.set()
+    pr.verbose("Worker {} ran {} tasks".format(worker_id, ran))
+    return ran
@@ -0,0 +1,184 @@
+"""Counters of the expensive operations of a simulation.
+
+The simulator counts, in every process, how often it builds and solves LPs,
+probes an alpha level in SREA, runs Floyd-Warshall, copies an STN, removes a
+vertex and dispatches a timepoint. The timed ones also add up the time they
+took, from time.perf_counter_ns(). Unlike profiling spans, counters are
+always on, since a count costs no more than a dictionary update. The STN
+operations are counted where the simulator calls them, as libheat.stntools
+does not depend on the rest of libheat; copy STNs with copy_stn().
+
+Each count is kept under the strategy hook it happened in, the innermost
+function decorated with hook(), as "<hook>/<counter>". Counts outside of
+any hook are kept under NO_HOOK.
+
+Only the work of a simulation is counted. The SREA solve of the initial guide
+is shared by every sample of an STN, and its counts are dropped by the
+collect() each simulation starts with, so no sample's lp_solves (or other
+counters) include it.
+
+Examples:
+    >>> counters.collect()
+    {'simulator/stn_copies': (4, 0.0003), '_drea_algorithm/lp_solves':
+    (10, 0.21), ...}
+"""
+
+import functools
+import json
+import time
+
+
+COUNTERS = ("lp_builds", "lp_solves", "alpha_probes", "srea_calls",
+            "floyd_warshall", "stn_copies", "vertices_removed",
+            "dispatch_steps")
+"""Names of every counter, which get columns in the results row."""
+
+TIMED = ("lp_builds", "lp_solves", "floyd_warshall", "stn_copies")
+"""Counters which are timed as well as counted."""
+
+NO_HOOK = "simulator"
+"""Name counts outside of every strategy hook are kept under."""
+
+SEPARATOR = "/"
+
+_counts = {}
+"""Maps each "<hook>/<counter>" to its [count, total nanoseconds]."""
+
+_hooks = [NO_HOOK]
+"""The hooks being run right now, innermost last."""
+
+
+def count(name, n=1):
+    """Add n to a counter, under the current hook."""
+    key = _hooks[-1] + SEPARATOR + name
+    entry = _counts.get(key)
+    if entry is None:
+        _counts[key] = [n, 0]
+    else:
+        entry[0] += n
+
+
+class _Timer(object):
+    """A running call of a timed counter. Made by timed()."""
+
+    __slots__ = ("key", "start")
+
+    def __init__(self, name):
+        self.key = _hooks[-1] + SEPARATOR + name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter_ns() - self.start
+        entry = _counts.get(self.key)
+        if entry is None:
+            _counts[self.key] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+        return False
+
+
+def timed(name):
+    """Count one call of a timed counter, and add the time spent in it.
+
+    Args:
+        name (str): Name of the counter.
+
+    Returns:
+        A context manager.
+    """
+    return _Timer(name)
+
+
+def copy_stn(stn):
+    """Copy an STN, counting the copy under "stn_copies"."""
+    with _Timer("stn_copies"):
+        return stn.copy()
+
+
+def hook(func):
+    """Decorator marking a strategy hook. Counts made while it runs are
+    kept under its name.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        _hooks.append(func.__name__)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _hooks.pop()
+    return wrapper
+
+
+def collect() -> dict:
+    """Returns the counts of this process, and clears them.
+
+    Returns:
+        A dictionary of the form {"<hook>/<counter>": (count, seconds)}.
+    """
+    counts = {key: (entry[0], entry[1] / 1e9)
+              for key, entry in _counts.items()}
+    _counts.clear()
+    return counts
+
+
+def scale(counts, factor) -> dict:
+    """Multiply every count and time by factor. Used to share the counts
+    of work done once for several variants.
+    """
+    return {key: (n * factor, seconds * factor)
+            for key, (n, seconds) in counts.items()}
+
+
+def totals(counts) -> dict:
+    """Sum counts from collect() over every hook.
+
+    Returns:
+        A dictionary of the form {counter: (count, seconds)}, with every
+        counter in COUNTERS.
+    """
+    summed = {name: (0, 0.0) for name in COUNTERS}
+    for key, (n, seconds) in counts.items():
+        name = key.rsplit(SEPARATOR, 1)[-1]
+        old = summed.get(name, (0, 0.0))
+        summed[name] = (old[0] + n, old[1] + seconds)
+    return summed
+
+
+def columns(sample_counts) -> dict:
+    """Build the counter columns of a results row.
+
+    Args:
+        sample_counts (list): The counts from collect() of every simulated
+            sample.
+
+    Returns:
+        A dictionary with the mean "<counter>_per_sample" of every counter
+        in COUNTERS, the mean "<counter>_s_per_sample" of every counter in
+        TIMED, "alpha_probes_per_srea", and "counters_by_hook", a JSON
+        object of the mean count of every counter in every hook.
+    """
+    samples = max(len(sample_counts), 1)
+    merged = {}
+    for counts in sample_counts:
+        for key, (n, seconds) in counts.items():
+            old = merged.get(key, (0, 0.0))
+            merged[key] = (old[0] + n, old[1] + seconds)
+    summed = totals(merged)
+    by_hook = {}
+    for key, (n, seconds) in sorted(merged.items()):
+        hook_name, name = key.rsplit(SEPARATOR, 1)
+        by_hook.setdefault(hook_name, {})[name] = n / samples
+    row = {}
+    for name in COUNTERS:
+        row["{}_per_sample".format(name)] = summed[name][0] / samples
+        if name in TIMED:
+            row["{}_s_per_sample".format(name)] = summed[name][1] / samples
+    row["alpha_probes_per_srea"] = (
+        summed["alpha_probes"][0] / summed["srea_calls"][0]
+        if summed["srea_calls"][0] else 0.0)
+    row["counters_by_hook"] = json.dumps(by_hook)
+    return row
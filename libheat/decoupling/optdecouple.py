@@ -2,7 +2,9 @@ import pulp
 
 
 from ..stntools import STN
-from ..stntools.distempirical import invcdf_norm
+from ..srea import invcdf_norm
+from .. import counters
+from .. import lpcapture
 
 
 def decouple_agents(stn: STN, fidelity=0.001):
@@ -20,7 +22,7 @@ def decouple_agents(stn: STN, fidelity=0.001):
     alpha, assignments = alpha_binary_search(stn, fidelity)
     if assignments is None:
         return None, None
-    restricted_stn = stn.copy()
+    restricted_stn = counters.copy_stn(stn)
     for from_id, to_id in stn.interagent_edges:
         restricted_stn.update_edge(0, from_id, assignments[from_id][1])
         restricted_stn.update_edge(from_id, 0, -assignments[from_id][0])
@@ -70,13 +72,15 @@ def alpha_binary_search(stn: STN, fidelity=0.001):
 
 def wilson_flex(stn: STN):
     """ Calculate Wilson Flexibility Decoupling """
-    prob, dual_events = _wilson_lp_setup(stn)
+    with counters.timed("lp_builds"):
+        prob, dual_events = _wilson_lp_setup(stn)
     diffs = [dual_events[(i, "+")] - dual_events[(i, "-")]
              for i in stn.verts.keys()]
     prob_sum = sum(diffs)
     prob += prob_sum, "Maximise the differences within dual constraints"
     prob.writeLP("/tmp/wilson_flex.lp")
-    prob.solve()
+    with counters.timed("lp_solves"):
+        lpcapture.solve(prob, "wilson_flex")
     # Check the status of the LP.
     status = pulp.LpStatus[prob.status]
     if status != "Optimal":
@@ -96,8 +100,9 @@ def maximize_interagent_flex(stn: STN, alpha: float):
             constraints.
         alpha (float): Alpha to use for contingent bounds.
     """
-    prob, duals = _wilson_lp_setup(stn)
-    apply_contingent_bounds(stn, prob, duals, alpha)
+    with counters.timed("lp_builds"):
+        prob, duals = _wilson_lp_setup(stn)
+        apply_contingent_bounds(stn, prob, duals, alpha)
 
     synchrony_pairs = stn.interagent_edges.keys()
     # Create a set of synchrony points.
@@ -115,7 +120,8 @@ def maximize_interagent_flex(stn: STN, alpha: float):
                     for i in synchrony_points])
     # Set the optimisation function.
     prob += prob_sum, "Maximise the flexibility of interagent constraints"
-    prob.solve()
+    with counters.timed("lp_solves"):
+        lpcapture.solve(prob, "interagent_flex", alpha=alpha)
     if pulp.LpStatus[prob.status] == "Optimal":
         assignments = _get_lp_assignments(prob)
         return (pulp.value(prob.objective), assignments)
@@ -4,6 +4,7 @@ import pulp
 from ..stntools import STN, Edge
 from ..stntools.distempirical import invcdf_norm
 from ..srea import srea
+from .. import counters
 
 
 def decouple_agents(stn: STN):
@@ -46,7 +47,7 @@ def apply_decoupling_constraints(stn: STN, guide: STN) -> STN:
         Returns a copy of `stn` but with decoupling constraints extracted
         from guide.
     """
-    stncopy = stn.copy()
+    stncopy = counters.copy_stn(stn)
     # Extract the edge weights from the guide, and apply them to the copy.
     for from_id, to_id in guide.interagent_edges.keys():
         from_max = guide.get_edge_weight(0, from_id)
@@ -1,8 +1,9 @@
-from .montsim import Simulator
+from .montsim import Simulator, NO_FAILURE
 from .decoupling import optdecouple
 from .decoupling import sreadecouple
 from . import srea
-from . import functiontimer
+from . import profiling
+from . import counters
 from . import printers as pr
 
 
@@ -12,7 +13,7 @@ Z_NODE_ID = 0
 class DecoupledSimulator(Simulator):
 
     def simulate(self, starting_stn, decouple_type="opt_inter",
-                 sim_options={}) -> bool:
+                 sim_options={}, samples=None) -> bool:
         """Run one simulation.
 
         Args:
@@ -21,20 +22,36 @@ class DecoupledSimulator(Simulator):
                 "opt_inter". "srea" is also an acceptable input.
             sim_options (:obj:`dict`, optional): A dictionary of possible
                 options to pass into the
+            samples (:obj:`dict`, optional): Contingent edge durations to use
+                instead of resampling, as returned by montsim.draw_samples().
+
+        Note:
+            If sim_options has "fast_forward" set, the timepoints left after
+            the last contingent timepoint are dispatched at once.
 
         Returns:
             Boolean indicating whether the simulation was successful or not.
         """
         # Initial setup
         self._current_time = 0.0
-        self.stn = starting_stn.copy()
-        self.assignment_stn = starting_stn.copy()
+        self.stn = counters.copy_stn(starting_stn)
+        self.assignment_stn = counters.copy_stn(starting_stn)
         self.num_reschedules = 0
         self.num_sent_schedules = 0
+        self.num_fast_forwarded = 0
+        self.num_steps = 0
+        self.failure_step = NO_FAILURE
+        self.failure_vertex = NO_FAILURE
+        self.trace = [] if self.tracing else None
+        fast_forward = bool(sim_options.get("fast_forward"))
         # Resample the contingent edges.
         # Super important!
-        pr.verbose("Resampling Stored STN")
-        self.resample_stored_stn()
+        if samples is None:
+            pr.verbose("Resampling Stored STN")
+            self.resample_stored_stn()
+        else:
+            pr.verbose("Using provided samples for Stored STN")
+            self.apply_samples(self.stn, samples)
         # Create the decoupled substns
         substns = self._instantiate_subproblems(self.stn,
                                                 decouple_type=decouple_type)
@@ -64,51 +81,89 @@ class DecoupledSimulator(Simulator):
 
             # Calculate the guide STN.
             pr.vverbose("Getting Guide...")
-            functiontimer.start("get_guide")
-            if substns is not None:
-                for i, sub in enumerate(substns):
-                    current_alpha, guide_stn = self.get_guide(
-                        sub,
-                        current_alpha,
-                        guides[i],
-                        options=options[i])
-                    guides[i] = guide_stn
-            else:
-                for i in range(len(self.stn.agents)):
-                    # Use early first as a fallback.
-                    guides[i] = self._early_first_guide()
-            functiontimer.stop("get_guide")
+            sent = self.num_sent_schedules
+            with profiling.span("get_guide"):
+                if substns is not None:
+                    for i, sub in enumerate(substns):
+                        current_alpha, guide_stn = self.get_guide(
+                            sub,
+                            current_alpha,
+                            guides[i],
+                            options=options[i])
+                        guides[i] = guide_stn
+                else:
+                    for i in range(len(self.stn.agents)):
+                        # Use early first as a fallback.
+                        guides[i] = self._early_first_guide()
+            if self.num_sent_schedules > sent:
+                profiling.instant("sent_schedule", {"alpha": current_alpha})
             pr.vverbose("Got guide")
 
+            # Once no contingent timepoints remain, the guides stop changing
+            # and the rest of the simulation can be dispatched at once.
+            if (fast_forward and
+                    self.remaining_contingent_count(self.assignment_stn) == 0):
+                times = self._remaining_decoupled_times(
+                    guides, options[0]["first_run"])
+                if times is not None:
+                    with profiling.span("fast_forward"):
+                        consistent = self._check_remaining(self.stn, times)
+                        if substns is not None:
+                            consistent = consistent and all(
+                                self._check_remaining(sub, times)
+                                for sub in substns)
+                    counters.count("dispatch_steps", len(times))
+                    for vert_id, time in times.items():
+                        self._trace_dispatch(guides, vert_id, time, False,
+                                             current_alpha)
+                        for stn in guides + (substns or []):
+                            if vert_id in stn.verts:
+                                self.assign_timepoint(stn, vert_id, time)
+                        self.assign_timepoint(self.stn, vert_id, time)
+                        self.assign_timepoint(self.assignment_stn, vert_id,
+                                              time)
+                    self.num_fast_forwarded = len(times)
+                    if not consistent:
+                        pr.verbose("Assignments: "
+                                   + str(self.get_assigned_times()))
+                        pr.verbose("Failed to fast-forward {} points"
+                                   .format(len(times)))
+                        return self.fail()
+                    break
+
             # Select the next timepoint.
             pr.vverbose("Selecting timepoint...")
-            functiontimer.start("selection")
-
             # We do this weird new_selection switch so that we select the
             # earliest timepoint from *all* of the guides, not just any one
             # guide.
             # The "selection" variable represents the earliest selection we
             # make, which holds the id, the time, and whether it was
             # contingent.
-            selection = None
-            for i, guide_stn in enumerate(guides):
-                new_selection = self.select_next_timepoint(guide_stn,
-                                                           self._current_time)
-                if selection is None:
-                    selection = new_selection
-                    continue
-                if selection[1] > new_selection[1]:
-                    selection = new_selection
-                options[i]["executed_contingent"] = selection[2]
-                options[i]["executed_time"] = selection[1]
-
-            functiontimer.stop("selection")
+            with profiling.span("selection"):
+                selection = None
+                for i, guide_stn in enumerate(guides):
+                    new_selection = self.select_next_timepoint(
+                        guide_stn, self._current_time)
+                    if selection is None:
+                        selection = new_selection
+                        continue
+                    if selection[1] > new_selection[1]:
+                        selection = new_selection
+                    options[i]["executed_contingent"] = selection[2]
+                    options[i]["executed_time"] = selection[1]
+
             pr.vverbose("Selected timepoint, node_id of {}"
                         .format(selection[0]))
+            counters.count("dispatch_steps")
 
             next_vert_id = selection[0]
             next_time = selection[1]
             executed_contingent = selection[2]
+            if executed_contingent:
+                profiling.instant("contingent_execution",
+                                  {"vertex": next_vert_id, "time": next_time})
+            self._trace_dispatch(guides, next_vert_id, next_time,
+                                 executed_contingent, current_alpha)
 
             # Propagate constraints (minimise) and check consistency.
             for guide_stn in guides:
@@ -124,34 +179,34 @@ class DecoupledSimulator(Simulator):
                         #print("After assignment:\n{}".format(substn))
             self.assign_timepoint(self.stn, next_vert_id, next_time)
             self.assign_timepoint(self.assignment_stn, next_vert_id, next_time)
-            functiontimer.start("propagation & check")
-            stn_copy = self.stn.copy()
-            consistent = self.propagate_constraints(stn_copy)
-            if not consistent:
-                pr.verbose("Assignments: " + str(self.get_assigned_times()))
-                pr.verbose("Failed to place point {}, at {}"
-                           .format(next_vert_id, next_time))
-                return False
-            self.stn = stn_copy
-            if substns is not None:
-                for i, sub in enumerate(substns):
-                    sub_copy = sub.copy()
-                    subcons = self.propagate_constraints(sub_copy)
-                    if subcons:
-                        sub = sub_copy
-                    else:
-                        # The substn is not consistent, but the whole STN is.
-                        # This means we do not want to follow the SREA guide
-                        # any further. A smart decision here would to now
-                        # ignore decoupling constraints, and try to solve the
-                        # STN locally. But this is too much effort for this
-                        # algorithm. Return failure prematurely instead, and
-                        # spit out a warning.
-                        pr.warning(
-                            "Whole STN was consistent, but substn was not.")
-                        return False
-                pr.vverbose("Done propagating our STN")
-                functiontimer.stop("propagation & check")
+            with profiling.span("propagation & check"):
+                stn_copy = counters.copy_stn(self.stn)
+                consistent = self.propagate_constraints(stn_copy)
+                if not consistent:
+                    pr.verbose("Assignments: "
+                               + str(self.get_assigned_times()))
+                    pr.verbose("Failed to place point {}, at {}"
+                               .format(next_vert_id, next_time))
+                    return self.fail(next_vert_id)
+                self.stn = stn_copy
+                if substns is not None:
+                    for i, sub in enumerate(substns):
+                        sub_copy = counters.copy_stn(sub)
+                        subcons = self.propagate_constraints(sub_copy)
+                        if subcons:
+                            sub = sub_copy
+                        else:
+                            # The substn is not consistent, but the whole
+                            # STN is. This means we do not want to follow the
+                            # SREA guide any further. A smart decision here
+                            # would to now ignore decoupling constraints, and
+                            # try to solve the STN locally. But this is too
+                            # much effort for this algorithm. Return failure
+                            # prematurely instead, and spit out a warning.
+                            pr.warning("Whole STN was consistent, but substn"
+                                       " was not.")
+                            return self.fail(next_vert_id)
+                    pr.vverbose("Done propagating our STN")
 
             #print("Full STN:\n{}".format(self.stn))
             # for i, s in enumerate(substns):
@@ -164,14 +219,61 @@ class DecoupledSimulator(Simulator):
                     self.remove_old_timepoints(sub)
 
             self._current_time = next_time
+            self.num_steps += 1
         pr.verbose("Assignments: " + str(self.get_assigned_times()))
-        assignment_check = self.propagate_constraints(self.assignment_stn)
         if not self.propagate_constraints(self.assignment_stn):
             pr.warning("False positive: assigned all events, but was not a"
                        " solution.")
-            return False
+            return self.fail()
         return True
 
+    def _trace_dispatch(self, guides, vert_id, time, contingent, alpha):
+        """Record a dispatch in the trace, with the Z-bounds of the first
+        guide holding the timepoint.
+        """
+        if self.trace is None:
+            return
+        for guide in guides:
+            if vert_id in guide.verts:
+                self.trace.append((vert_id, time,
+                                   -guide.get_edge_weight(vert_id, Z_NODE_ID),
+                                   guide.get_edge_weight(Z_NODE_ID, vert_id),
+                                   contingent, alpha))
+                return
+
+    def _remaining_decoupled_times(self, guides, first_run):
+        """Find the dispatch times of every unexecuted timepoint, following
+        a list of guides which no longer change.
+
+        Args:
+            guides (list): The guide STN of each agent.
+            first_run (bool): Whether no timepoint has been dispatched yet.
+
+        Returns:
+            A dictionary of the form {vert_id: time}, or None if the times
+            cannot be found in one pass.
+        """
+        times = {}
+        seen = set()
+        for guide in guides:
+            if id(guide) in seen:
+                continue
+            seen.add(id(guide))
+            guide_times = self._remaining_times(guide, first_run)
+            if guide_times is None:
+                return None
+            for vert_id, time in guide_times.items():
+                # Which guide dispatches a shared timepoint would depend on
+                # the order of the other agents' timepoints.
+                if times.get(vert_id, time) != time:
+                    return None
+                times[vert_id] = time
+        remaining = [i for i, v in self.assignment_stn.verts.items()
+                     if not v.is_executed()]
+        if any(i not in times for i in remaining):
+            return None
+        return times
+
     def assign_timepoint(self, stn, vert_id, time):
         """ Assigns a timepoint to specified time
 
@@ -0,0 +1,48 @@
+"""Helpers shared by the modules writing the simulator's output files.
+
+Examples:
+    >>> json.dumps({"seed": numpy.int64(4)}, default=fileio.to_json)
+    '{"seed": 4}'
+    >>> with fileio.atomic_write("rover.json") as f:
+    ...     json.dump(meta, f)
+"""
+
+import contextlib
+import os
+
+
+def to_json(value):
+    """Convert numpy scalars, which json cannot write, to Python ones. Pass
+    as the default of json.dump() and json.dumps().
+    """
+    try:
+        return value.item()
+    except AttributeError:
+        raise TypeError("{} is not JSON serializable".format(type(value)))
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode="w", encoding=None):
+    """Open a file to replace path with, so that readers never see it partly
+    written. The file is written next to path, and moved over it once it is
+    closed. Nothing is replaced if writing fails.
+
+    Args:
+        path (str): Path of the file to write.
+        mode (str, optional): "w" for text, "wb" for binary.
+        encoding (str, optional): Encoding of a text file. Default is UTF-8.
+
+    Returns:
+        A context manager giving the open file.
+    """
+    if encoding is None and "b" not in mode:
+        encoding = "utf-8"
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, mode, encoding=encoding) as f:
+            yield f
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
@@ -0,0 +1,128 @@
+"""cProfile statistics of worker tasks, merged in the parent process.
+
+Pool workers run the first few tasks of each strategy they receive under
+cProfile, one profiler per strategy, and send the raw statistics back with
+each task's answers. The parent merges them with merge(), keeps one set of
+statistics per strategy, and can dump them as .pstats files or summarize their
+hotspots.
+
+Examples:
+    >>> answers, stats = hotspots.run(simulate, stn)
+    >>> hotspots.merge([("drea", stats)])
+    >>> print(hotspots.report(lines=20))
+"""
+
+import cProfile
+import io
+import os.path
+import pstats
+
+
+_tasks_profiled = {}
+"""Number of tasks this worker has profiled, by key."""
+
+_stats = {}
+"""Merged pstats.Stats of every key (usually a strategy)."""
+
+
+class _RawStats(object):
+    """Holds raw cProfile statistics, so that pstats can load them."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def should_profile(limit, key=None) -> bool:
+    """Check whether this worker should profile its next task, and count it
+    if so. Only the first limit tasks of each key are profiled.
+
+    Args:
+        limit (int): Number of tasks to profile per key.
+        key (optional): Kind of the task, such as the strategies it runs.
+    """
+    done = _tasks_profiled.get(key, 0)
+    if done >= limit:
+        return False
+    _tasks_profiled[key] = done + 1
+    return True
+
+
+def run(func, *args, **kwargs) -> tuple:
+    """Call func under cProfile.
+
+    Returns:
+        A tuple of what func returned, and the raw statistics of the call,
+        which can be pickled and given to merge().
+    """
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    profiler.create_stats()
+    return result, profiler.stats
+
+
+def merge(stats):
+    """Add raw statistics to this process' statistics.
+
+    Args:
+        stats (list): List of (key, raw statistics from run()) tuples. The
+            key is usually a strategy. May be None.
+    """
+    for key, raw in stats or []:
+        if not raw:
+            continue
+        if key in _stats:
+            _stats[key].add(_RawStats(dict(raw)))
+        else:
+            _stats[key] = pstats.Stats(_RawStats(dict(raw)))
+
+
+def keys() -> list:
+    """Returns the keys that statistics were merged under."""
+    return sorted(_stats)
+
+
+def clear():
+    """Forget every merged statistic."""
+    _stats.clear()
+
+
+def dump(path) -> list:
+    """Write the combined statistics of every key to path, and those of each
+    key next to it, as "<root>.<key><ext>".
+
+    Returns:
+        The list of paths written.
+    """
+    if not _stats:
+        return []
+    combined = None
+    for key in keys():
+        if combined is None:
+            combined = pstats.Stats(_RawStats(dict(_stats[key].stats)))
+        else:
+            combined.add(_stats[key])
+    combined.dump_stats(path)
+    written = [path]
+    root, ext = os.path.splitext(path)
+    for key in keys():
+        key_path = "{}.{}{}".format(root, key, ext or ".pstats")
+        _stats[key].dump_stats(key_path)
+        written.append(key_path)
+    return written
+
+
+def report(lines=30, sort="tottime") -> str:
+    """Summarize the hotspots of every key: the lines functions with the
+    most time spent in them.
+    """
+    parts = []
+    for key in keys():
+        stream = io.StringIO()
+        stats = _stats[key]
+        stats.stream = stream
+        stats.sort_stats(sort).print_stats(lines)
+        parts.append("Hotspots of {}:\n{}".format(key, stream.getvalue()))
+    return "\n".join(parts)
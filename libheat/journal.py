@@ -0,0 +1,160 @@
+"""Journal of completed simulation work, for resuming interrupted runs.
+
+The journal is a JSON Lines file which is only ever appended to. A run
+records its random seed, the answers of every sample as soon as it finishes,
+and every stage whose results were written out. A run resumed from the
+journal skips finished stages, and only simulates the samples of unfinished
+stages that have no recorded answers.
+"""
+
+import json
+import os
+import os.path
+
+from . import fileio
+from . import printers as pr
+
+
+class Journal(object):
+    """An append-only journal of finished stages and samples.
+
+    Args:
+        path (str): Path of the journal file. Created if it does not exist.
+        resume (bool, optional): Read the work already recorded in the
+            journal. Otherwise, the journal is only written to.
+
+    Attributes:
+        random_seed (int): The random seed of the last run recorded in the
+            journal, or None.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.random_seed = None
+        self._samples = {}
+        self._finished = set()
+        if resume and os.path.isfile(self.path):
+            self.load(self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        if not _ends_line(self.path):
+            # A run was killed in the middle of writing its last line. End
+            # that line, so that the next record is not appended onto it.
+            self._file.write("\n")
+            self._file.flush()
+
+    def load(self, path):
+        """Read the work recorded in a journal file into this journal.
+
+        Used to resume a run, and to merge the journals of several shards of
+        a run.
+
+        Args:
+            path (str): Path of the journal file to read.
+        """
+        lines = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The run stopped in the middle of writing this line.
+                    continue
+                lines += 1
+                if record["type"] == "run":
+                    self.random_seed = record["random_seed"]
+                elif record["type"] == "sample":
+                    answers = [tuple(a) for a in record["answers"]]
+                    self._samples.setdefault(record["stage"], {})[
+                        record["index"]] = answers
+                elif record["type"] == "stage":
+                    self._finished.add(record["stage"])
+                    self._samples.pop(record["stage"], None)
+        pr.verbose("Read {} journal records from {}; {} stages finished"
+                   .format(lines, path, len(self._finished)))
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, default=fileio.to_json) + "\n")
+        self._file.flush()
+
+    def start_run(self, random_seed):
+        """Record the random seed the run uses."""
+        self.random_seed = None if random_seed is None else int(random_seed)
+        self._write({"type": "run", "random_seed": self.random_seed})
+
+    def is_finished(self, stage) -> bool:
+        """Check if the results of a stage were already written out."""
+        return stage in self._finished
+
+    def finish_stage(self, stage):
+        """Record that the results of a stage were written out."""
+        self._finished.add(stage)
+        self._samples.pop(stage, None)
+        self._write({"type": "stage", "stage": stage})
+
+    def checkpoint(self, stage):
+        """Returns the Checkpoint of a stage."""
+        return Checkpoint(self, stage, self._samples.setdefault(stage, {}))
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class Checkpoint(object):
+    """The recorded samples of a single stage.
+
+    Attributes:
+        samples (dict): Answers of every recorded sample, keyed by the index
+            of the sample.
+    """
+
+    def __init__(self, journal, stage, samples):
+        self.journal = journal
+        self.stage = stage
+        self.samples = samples
+
+    def record(self, index, answers):
+        """Record the answers of a sample.
+
+        Args:
+            index (int): Index of the sample within the stage.
+            answers (list): The answers of every variant on the sample.
+        """
+        self.samples[index] = answers
+        self.journal._write({"type": "sample", "stage": self.stage,
+                             "index": index, "answers": answers})
+
+
+def _ends_line(path) -> bool:
+    """Whether a file is empty or ends with a newline."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def stage_key(stn_path, instance, variants, random_seed, samples) -> str:
+    """Build the key a stage is recorded under in a journal.
+
+    Args:
+        stn_path (str): Path of the STN file.
+        instance (int): Index of the STN within the file.
+        variants (list): List of (execution_strat, sim_options) tuples.
+        random_seed (int): The random seed of the run.
+        samples (int): The number of samples (or cap on them) of the stage.
+
+    Returns:
+        A string uniquely describing the stage.
+    """
+    settings = [[execution, sim_options.get("ar_threshold"),
+                 sim_options.get("si_threshold")]
+                for execution, sim_options in variants]
+    return json.dumps([os.path.abspath(stn_path), instance, settings,
+                       random_seed, samples], default=fileio.to_json)
@@ -0,0 +1,172 @@
+"""Captures the LPs solved during a simulation, to replay them later.
+
+SREA (srea.srea_LP()) and the optimal decoupling of the "da" strategy
+(decoupling.optdecouple) solve their LPs through solve(). Between start()
+and stop(), each LP is written, with the status and objective the simulator
+got for it, as one line of a JSON lines file. load() reads them back, and
+to_pulp() and to_arrays() rebuild them for PuLP solvers or for
+scipy.optimize.linprog(), e.g. to compare LP backends on the LPs the
+simulator really solves (see benchmarks.lp).
+
+Capturing is per process, so capture with a single thread. When not
+capturing, solve() costs one global lookup more than prob.solve().
+
+Examples:
+    >>> lpcapture.start("lps.jsonl", limit=100)
+    >>> multiple_simulations(stn, "drea", 10, threads=1)
+    >>> lpcapture.stop()
+    {'srea': 100}
+    >>> lps = lpcapture.load("lps.jsonl")
+"""
+
+import json
+
+import numpy as np
+import pulp
+
+
+_capture = None
+"""The capture running, as a dictionary with its "file", its "limit" and
+the "counts" of LPs captured of every kind. None when not capturing."""
+
+
+def start(path, limit=None):
+    """Start capturing every LP solved by this process.
+
+    Args:
+        path (str): JSON lines file to append the LPs to.
+        limit (int, optional): Most LPs to capture of every kind. Default is
+            no limit.
+    """
+    global _capture
+    stop()
+    _capture = {"file": open(path, "a"), "limit": limit, "counts": {}}
+
+
+def stop() -> dict:
+    """Stop capturing LPs.
+
+    Returns:
+        The number of LPs captured of every kind, or an empty dictionary if
+        not capturing.
+    """
+    global _capture
+    if _capture is None:
+        return {}
+    _capture["file"].close()
+    counts = _capture["counts"]
+    _capture = None
+    return counts
+
+
+def is_capturing() -> bool:
+    return _capture is not None
+
+
+def solve(prob, kind, alpha=None):
+    """Solve a PuLP problem with its default solver, as prob.solve() does,
+    and capture it if capturing.
+
+    Args:
+        prob (pulp.LpProblem): The LP to solve.
+        kind (str): What the LP is for, e.g. "srea".
+        alpha (float, optional): The risk level the LP was built for.
+
+    Returns:
+        The status of prob.solve().
+    """
+    if _capture is None:
+        return prob.solve()
+    count = _capture["counts"].get(kind, 0)
+    if _capture["limit"] is not None and count >= _capture["limit"]:
+        return prob.solve()
+    lp = to_json(prob)
+    status = prob.solve()
+    lp.update(kind=kind, alpha=alpha, status=pulp.LpStatus[prob.status],
+              objective_value=pulp.value(prob.objective))
+    _capture["file"].write(json.dumps(lp) + "\n")
+    _capture["counts"][kind] = count + 1
+    return status
+
+
+def to_json(prob) -> dict:
+    """Convert a PuLP problem to a JSON serializable dictionary.
+
+    Returns:
+        A dictionary with the "sense" of the problem (pulp.LpMinimize or
+        pulp.LpMaximize), its "variables" as [name, lower bound, upper bound]
+        lists, with None for no bound, its "objective" as [name, coefficient]
+        pairs and "objective_constant", and its "constraints" as
+        [[[name, coefficient], ...], sense, right hand side] lists, where the
+        sense is one of pulp.LpConstraintLE, LpConstraintEQ or
+        LpConstraintGE.
+    """
+    objective = prob.objective if prob.objective is not None else {}
+    return {
+        "sense": prob.sense,
+        "variables": [[v.name, v.lowBound, v.upBound]
+                      for v in prob.variables()],
+        "objective": [[v.name, coef] for v, coef in objective.items()],
+        "objective_constant": getattr(objective, "constant", 0),
+        "constraints": [[[[v.name, coef] for v, coef in c.items()],
+                         c.sense, -c.constant]
+                        for c in prob.constraints.values()]}
+
+
+def load(path) -> list:
+    """Read the LPs captured in a JSON lines file."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def to_pulp(lp):
+    """Rebuild a captured LP as a PuLP problem.
+
+    Returns:
+        A pulp.LpProblem, which can be solved by any PuLP solver.
+    """
+    prob = pulp.LpProblem(lp.get("kind", "captured"), lp["sense"])
+    variables = {name: pulp.LpVariable(name, lowBound=lb, upBound=ub)
+                 for name, lb, ub in lp["variables"]}
+    for terms, sense, rhs in lp["constraints"]:
+        expr = pulp.LpAffineExpression([(variables[name], coef)
+                                        for name, coef in terms])
+        prob += pulp.LpConstraint(expr, sense, rhs=rhs)
+    prob += pulp.LpAffineExpression(
+        [(variables[name], coef) for name, coef in lp["objective"]],
+        constant=lp["objective_constant"])
+    return prob
+
+
+def to_arrays(lp) -> dict:
+    """Rebuild a captured LP as the arguments of scipy.optimize.linprog().
+
+    Returns:
+        A dictionary of the "c", "A_ub", "b_ub", "A_eq", "b_eq" and "bounds"
+        arguments, for minimizing the objective (negated if the LP
+        maximizes), and the "sign" and "constant" to turn linprog()'s optimum
+        into the LP's objective value.
+    """
+    columns = {name: k for k, (name, lb, ub) in enumerate(lp["variables"])}
+    sign = -1.0 if lp["sense"] == pulp.LpMaximize else 1.0
+    c = np.zeros(len(columns))
+    for name, coef in lp["objective"]:
+        c[columns[name]] = sign * coef
+    rows = {pulp.LpConstraintLE: [], pulp.LpConstraintEQ: []}
+    rhs = {pulp.LpConstraintLE: [], pulp.LpConstraintEQ: []}
+    for terms, sense, value in lp["constraints"]:
+        row = np.zeros(len(columns))
+        for name, coef in terms:
+            row[columns[name]] = coef
+        # linprog() only takes <= inequalities.
+        if sense == pulp.LpConstraintGE:
+            row, value, sense = -row, -value, pulp.LpConstraintLE
+        rows[sense].append(row)
+        rhs[sense].append(value)
+    arrays = {"c": c, "bounds": [(lb, ub) for name, lb, ub in lp["variables"]],
+              "sign": sign, "constant": lp["objective_constant"]}
+    for sense, suffix in ((pulp.LpConstraintLE, "ub"),
+                          (pulp.LpConstraintEQ, "eq")):
+        arrays["A_" + suffix] = np.array(rows[sense]) if rows[sense] else None
+        arrays["b_" + suffix] = np.array(rhs[sense]) if rhs[sense] else None
+    return arrays
@@ -0,0 +1,193 @@
+"""Memory use of pool workers, per task and per stage.
+
+There are two levels of tracking, by MODES:
+
+* "rss": The peak resident set size of each worker during each task. On
+  Linux, the peak is reset before each task through /proc/self/clear_refs,
+  so it is the peak of that task alone. Elsewhere, it is the peak of the
+  worker so far.
+* "tracemalloc": As well as the RSS, trace the Python allocations of every
+  task: their peak above what was allocated before the task, that peak per
+  dispatch step, and the source lines holding the most memory at the end of
+  each simulation. Tracing slows the simulations down a lot.
+
+Workers make a TaskMemory for each task, and hand its finish() back with the
+task's answers. The parent adds them up per stage with merge(), and
+columns() turns them into the memory columns of the stage's results row.
+
+Examples:
+    >>> task = memory.TaskMemory("tracemalloc")
+    >>> simulator.simulate(stn, "drea")
+    >>> task.sample_sites()
+    >>> stage = {}
+    >>> memory.merge(task.finish(steps=12), into=stage)
+    >>> memory.columns(stage)["traced_bytes_per_step"]
+"""
+
+import json
+import os
+import resource
+import sys
+import tracemalloc
+
+
+MODES = ("rss", "tracemalloc")
+"""The levels of memory tracking."""
+
+TOP_SITES = 5
+"""Number of allocation sites kept per stage."""
+
+MB = 1024.0 * 1024.0
+
+_STATUS = "/proc/self/status"
+_CLEAR_REFS = "/proc/self/clear_refs"
+
+
+def reset_peak_rss() -> bool:
+    """Reset the peak RSS of this process, if the system allows it.
+
+    Returns:
+        Whether the peak was reset.
+    """
+    try:
+        with open(_CLEAR_REFS, "w") as f:
+            # 5 resets the peak RSS (VmHWM) to the current RSS.
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss() -> int:
+    """Returns the peak RSS of this process since it was last reset, in
+    bytes.
+    """
+    try:
+        with open(_STATUS) as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes, except on macOS.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class TaskMemory(object):
+    """Tracks the memory use of a single task, from when it is made.
+
+    Args:
+        mode (str): One of MODES.
+    """
+
+    def __init__(self, mode):
+        if mode not in MODES:
+            raise ValueError("Unknown memory mode '{}'".format(mode))
+        self.mode = mode
+        self.sites = {}
+        self._baseline = 0
+        reset_peak_rss()
+        if mode == "tracemalloc":
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            self._baseline = tracemalloc.get_traced_memory()[0]
+
+    def sample_sites(self):
+        """Record the source lines holding the most traced memory right now.
+        Meant to be called at the end of each simulation, while its STNs are
+        still alive. Does nothing unless tracing allocations.
+        """
+        if self.mode != "tracemalloc":
+            return
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__)))
+        for stat in snapshot.statistics("lineno")[:TOP_SITES]:
+            site = _site_name(stat.traceback[0])
+            self.sites[site] = max(self.sites.get(site, 0), stat.size)
+
+    def finish(self, steps=0) -> dict:
+        """Finish tracking the task.
+
+        Args:
+            steps (int, optional): Number of dispatch steps of the task.
+
+        Returns:
+            A dictionary to give to merge().
+        """
+        task = {"pid": os.getpid(), "peak_rss": peak_rss()}
+        if self.mode == "tracemalloc":
+            task["traced_peak"] = max(
+                tracemalloc.get_traced_memory()[1] - self._baseline, 0)
+            task["steps"] = steps
+            task["sites"] = self.sites
+        return task
+
+
+def _site_name(frame) -> str:
+    """Name an allocation site "path:line", with the path relative to the
+    working directory, or to its package if outside of it.
+    """
+    path = os.path.relpath(frame.filename)
+    if path.startswith(os.pardir):
+        path = os.path.join(*os.path.normpath(frame.filename).split(
+            os.sep)[-2:])
+    return "{}:{}".format(path, frame.lineno)
+
+
+def merge(task, into):
+    """Add the memory use of a task to that of its stage.
+
+    Args:
+        task (dict): What TaskMemory.finish() returned. May be None.
+        into (dict): The memory use of the stage, which starts empty. May
+            be None, if memory is not being tracked.
+    """
+    if task is None or into is None:
+        return
+    workers = into.setdefault("peak_rss", {})
+    workers[task["pid"]] = max(workers.get(task["pid"], 0), task["peak_rss"])
+    if "traced_peak" in task:
+        into["traced_peak"] = max(into.get("traced_peak", 0),
+                                  task["traced_peak"])
+        into["traced_bytes"] = into.get("traced_bytes", 0) \
+            + task["traced_peak"]
+        into["steps"] = into.get("steps", 0) + task["steps"]
+        sites = into.setdefault("sites", {})
+        for site, size in task["sites"].items():
+            sites[site] = max(sites.get(site, 0), size)
+
+
+def columns(stage) -> dict:
+    """Build the memory columns of a results row.
+
+    Args:
+        stage (dict): The memory use of the stage, from merge().
+
+    Returns:
+        A dictionary with "peak_rss_mb", the highest peak RSS of any worker,
+        "peak_rss_by_worker", a JSON object of the peak RSS of each worker
+        process in MB, and the traced "traced_peak_mb",
+        "traced_bytes_per_step" and "top_allocation_sites" (a JSON list of
+        [site, KiB] pairs), which are None unless allocations were traced.
+    """
+    workers = stage.get("peak_rss", {})
+    row = {"peak_rss_mb": max(workers.values()) / MB if workers else None,
+           "peak_rss_by_worker": json.dumps(
+               {str(pid): round(peak / MB, 3)
+                for pid, peak in sorted(workers.items())}),
+           "traced_peak_mb": None,
+           "traced_bytes_per_step": None,
+           "top_allocation_sites": None}
+    if "traced_peak" in stage:
+        row["traced_peak_mb"] = stage["traced_peak"] / MB
+        row["traced_bytes_per_step"] = (
+            stage["traced_bytes"] / stage["steps"] if stage["steps"]
+            else None)
+        top = sorted(stage["sites"].items(), key=lambda s: -s[1])
+        row["top_allocation_sites"] = json.dumps(
+            [[site, round(size / 1024.0, 1)]
+             for site, size in top[:TOP_SITES]])
+    return row
@@ -1,11 +1,36 @@
+import copy
+from collections import deque
+
 import numpy as np
 
 from . import srea
-from . import functiontimer
+from . import profiling
+from . import counters
 from . import printers as pr
 
 
 Z_NODE_ID = 0
+NO_FAILURE = -1
+"""failure_step and failure_vertex of a simulation which did not fail"""
+
+
+def draw_samples(stn, random_state) -> dict:
+    """Draw one duration for every contingent edge of an STN.
+
+    Samples are drawn in the same order that Simulator.resample_stored_stn()
+    draws them, so a fresh RandomState with the same seed produces the same
+    durations. The STN itself is left untouched.
+
+    Args:
+        stn (STN): STN to sample the contingent edges of.
+        random_state (RandomState): Numpy RandomState to sample with.
+
+    Returns:
+        A dictionary of the form {(i, j): sampled duration}.
+    """
+    with profiling.span("draw_samples"):
+        return {k: e.copy().resample(random_state)
+                for k, e in stn.contingent_edges.items()}
 
 
 class Simulator(object):
@@ -20,8 +45,24 @@ class Simulator(object):
         self._rand_state = np.random.RandomState(random_seed)
         self.num_reschedules = 0
         self.num_sent_schedules = 0
+        self._initial_guide = None
+        self._first_run = True
+        self._options = {}
+        self._guide_stn = None
+        self._current_alpha = 0.0
+        self._lazy_propagation = False
+        self._stale = False
+        self.num_skipped_propagations = 0
+        self._fast_forward = False
+        self.num_fast_forwarded = 0
+        self.num_steps = 0
+        self.failure_step = NO_FAILURE
+        self.failure_vertex = NO_FAILURE
+        self.tracing = False
+        self.trace = None
 
-    def simulate(self, starting_stn, execution_strat, sim_options=None):
+    def simulate(self, starting_stn, execution_strat, sim_options=None,
+                 samples=None, initial_guide=None):
         """Run one simulation.
 
         Args:
@@ -35,105 +76,365 @@ class Simulator(object):
                 "arsi"
             sim_options (dict, optional): A dictionary of possible options to
                 pass into the simulator.
+            samples (dict, optional): Contingent edge durations to use instead
+                of resampling, as returned by draw_samples(). Lets several
+                strategies run against the same draws.
+            initial_guide (tuple, optional): The (alpha, guide) tuple SREA
+                returns for starting_stn. If given, the first SREA call of the
+                simulation reuses it instead of solving the LP again.
+
+        Note:
+            If sim_options has "lazy_propagation" set, the stored STN is only
+            fully propagated when a contingent timepoint executes or a guide
+            needs it. Other dispatches only tighten the bounds on the edges to
+            Z. The number of skipped propagations is kept in
+            num_skipped_propagations.
+
+            If sim_options has "fast_forward" set, every timepoint left once
+            the last contingent timepoint has executed is dispatched at once
+            by fast_forward().
+
+            If tracing is set, every dispatch is recorded in trace as a
+            (vertex, time, guide_min, guide_max, contingent, alpha) tuple
+            (see libheat.trace).
 
         Returns:
             Boolean indicating whether the simulation was successful or not.
         """
+        self.setup(starting_stn, sim_options=sim_options, samples=samples,
+                   initial_guide=initial_guide)
+
+        # Loop until all timepoints assigned.
+        while not self.all_assigned():
+            self.update_guide(execution_strat)
+            if self._fast_forward:
+                ans = self.fast_forward()
+                if ans is not None:
+                    return ans
+            if not self.dispatch_next():
+                return False
+        return self.finish()
+
+    def setup(self, starting_stn, sim_options=None, samples=None,
+              initial_guide=None) -> None:
+        """Reset the simulator to the start of a new simulation.
+
+        See simulate() for the arguments. After calling this, a simulation can
+        be advanced one step at a time with update_guide() and
+        dispatch_next().
+        """
         # Initial setup
         self._current_time = 0.0
-        self.stn = starting_stn.copy()
-        self.assignment_stn = starting_stn.copy()
+        self.stn = counters.copy_stn(starting_stn)
+        self.assignment_stn = counters.copy_stn(starting_stn)
         self._ar_contingent_event_counter = 0
         self._ara_successfactor = 1.0
         self.num_reschedules = 0
         self.num_sent_schedules = 0
+        self._initial_guide = initial_guide
         # Resample the contingent edges.
         # Super important!
-        pr.verbose("Resampling Stored STN")
-        self.resample_stored_stn()
+        if samples is None:
+            pr.verbose("Resampling Stored STN")
+            self.resample_stored_stn()
+        else:
+            pr.verbose("Using provided samples for Stored STN")
+            self.apply_samples(self.stn, samples)
 
         # Setup options
-        first_run = True
-        options = {"first_run": True,
-                   "executed_contingent": False,
-                   "executed_time": 0.0,
-                   "guide_min": 0.0,
-                   "guide_max": 0.0}
+        self._first_run = True
+        self._options = {"first_run": True,
+                         "executed_contingent": False,
+                         "executed_time": 0.0,
+                         "guide_min": 0.0,
+                         "guide_max": 0.0}
 
         if sim_options is not None:
             if "si_threshold" in sim_options:
-                options["si_threshold"] = sim_options["si_threshold"]
+                self._options["si_threshold"] = sim_options["si_threshold"]
             if "ar_threshold" in sim_options:
-                options["ar_threshold"] = sim_options["ar_threshold"]
+                self._options["ar_threshold"] = sim_options["ar_threshold"]
             if "alp_threshold" in sim_options:
-                options["alp_threshold"] = sim_options["alp_threshold"]
+                self._options["alp_threshold"] = sim_options["alp_threshold"]
+        self._lazy_propagation = bool(sim_options is not None and
+                                      sim_options.get("lazy_propagation"))
+        self._stale = False
+        self.num_skipped_propagations = 0
+        self._fast_forward = bool(sim_options is not None and
+                                  sim_options.get("fast_forward"))
+        self.num_fast_forwarded = 0
+        self.num_steps = 0
+        self.failure_step = NO_FAILURE
+        self.failure_vertex = NO_FAILURE
+        self.trace = [] if self.tracing else None
 
         # Setup default guide settings
-        guide_stn = self.stn
-        current_alpha = 0.0
+        self._guide_stn = self.stn
+        self._current_alpha = 0.0
 
-        # Loop until all timepoints assigned.
-        while not self.all_assigned():
-            options["first_run"] = first_run
-            if first_run:
-                first_run = False
-
-            # Calculate the guide STN.
-            pr.vverbose("Getting Guide...")
-            functiontimer.start("get_guide")
-            current_alpha, guide_stn = self.get_guide(execution_strat,
-                                                      current_alpha,
-                                                      guide_stn,
-                                                      options=options)
-            # print("GUIDE")
-            # print(guide_stn)
-            functiontimer.stop("get_guide")
-            pr.vverbose("Got guide")
-
-            # Select the next timepoint.
-            pr.vverbose("Selecting timepoint...")
-            functiontimer.start("selection")
+    def update_guide(self, execution_strat) -> None:
+        """Calculate the guide STN for the next dispatch step.
+
+        Args:
+            execution_strat (str): The strategy to use for timepoint execution.
+        """
+        self._options["first_run"] = self._first_run
+        self._first_run = False
+
+        # Calculate the guide STN.
+        pr.vverbose("Getting Guide...")
+        sent = self.num_sent_schedules
+        with profiling.span("get_guide"):
+            self._current_alpha, self._guide_stn = self.get_guide(
+                execution_strat,
+                self._current_alpha,
+                self._guide_stn,
+                options=self._options)
+        if self.num_sent_schedules > sent:
+            profiling.instant("sent_schedule",
+                              {"alpha": self._current_alpha})
+        # The initial guide is only valid for the first SREA call.
+        self._initial_guide = None
+        pr.vverbose("Got guide")
+
+    def dispatch_next(self) -> bool:
+        """Execute the next timepoint of the current guide, then propagate.
+
+        Returns:
+            Boolean indicating whether the STN is still consistent.
+        """
+        options = self._options
+        guide_stn = self._guide_stn
+
+        # Select the next timepoint.
+        pr.vverbose("Selecting timepoint...")
+        with profiling.span("selection"):
             selection = self.select_next_timepoint(guide_stn,
                                                    self._current_time)
-            functiontimer.stop("selection")
-            pr.vverbose("Selected timepoint, node_id of {}"
-                        .format(selection[0]))
-
-            next_vert_id = selection[0]
-            next_time = selection[1]
-            executed_contingent = selection[2]
-
-            options["executed_contingent"] = executed_contingent
-            options["executed_time"] = next_time
-            options["guide_max"] = guide_stn.get_edge_weight(0, next_vert_id)
-            options["guide_min"] = -guide_stn.get_edge_weight(next_vert_id, 0)
-
-            # Propagate constraints (minimise) and check consistency.
-            self._assign_timepoint(guide_stn, next_vert_id, next_time)
-            self._assign_timepoint(self.stn, next_vert_id, next_time)
-            self._assign_timepoint(
-                self.assignment_stn, next_vert_id, next_time)
-            functiontimer.start("propagation & check")
-            stn_copy = self.stn.copy()
-            consistent = self.propagate_constraints(stn_copy)
-            if not consistent:
-                pr.verbose("Assignments: " + str(self.get_assigned_times()))
-                pr.verbose("Failed to place point {}, at {}"
-                           .format(next_vert_id, next_time))
-                return False
-            self.stn = stn_copy
-            pr.vverbose("Done propagating our STN")
-            functiontimer.stop("propagation & check")
+        pr.vverbose("Selected timepoint, node_id of {}"
+                    .format(selection[0]))
+        counters.count("dispatch_steps")
 
-            # Clean up the STN
-            self.remove_old_timepoints(self.stn)
+        next_vert_id = selection[0]
+        next_time = selection[1]
+        executed_contingent = selection[2]
+        if executed_contingent:
+            profiling.instant("contingent_execution",
+                              {"vertex": next_vert_id, "time": next_time})
+
+        options["executed_contingent"] = executed_contingent
+        options["executed_time"] = next_time
+        options["guide_max"] = guide_stn.get_edge_weight(0, next_vert_id)
+        options["guide_min"] = -guide_stn.get_edge_weight(next_vert_id, 0)
+        if self.trace is not None:
+            self.trace.append((next_vert_id, next_time, options["guide_min"],
+                               options["guide_max"], executed_contingent,
+                               self._current_alpha))
+
+        # Executing a controllable timepoint within its bounds to Z cannot
+        # make the STN inconsistent, so full propagation can wait.
+        lazy = (self._lazy_propagation and not executed_contingent
+                and self._within_z_bounds(next_vert_id, next_time))
+        if not lazy:
+            # Assigning overwrites the old bounds of this timepoint, so any
+            # deferred propagation must be done before then.
+            self._minimize_stored_stn()
 
+        # Propagate constraints (minimise) and check consistency.
+        self._assign_timepoint(guide_stn, next_vert_id, next_time)
+        self._assign_timepoint(self.stn, next_vert_id, next_time)
+        self._assign_timepoint(
+            self.assignment_stn, next_vert_id, next_time)
+        if lazy:
+            with profiling.span("lazy_propagation"):
+                self._tighten_z_bounds(self.stn, next_vert_id)
+                self.remove_old_timepoints(self.stn)
+            self._stale = True
+            self.num_skipped_propagations += 1
             self._current_time = next_time
+            self.num_steps += 1
+            return True
+
+        with profiling.span("propagation & check"):
+            stn_copy = counters.copy_stn(self.stn)
+            consistent = self.propagate_constraints(stn_copy)
+        if not consistent:
+            pr.verbose("Assignments: " + str(self.get_assigned_times()))
+            pr.verbose("Failed to place point {}, at {}"
+                       .format(next_vert_id, next_time))
+            return self.fail(next_vert_id)
+        self.stn = stn_copy
+        self._stale = False
+        pr.vverbose("Done propagating our STN")
+
+        # Clean up the STN
+        self.remove_old_timepoints(self.stn)
+
+        self._current_time = next_time
+        self.num_steps += 1
+        return True
+
+    def fast_forward(self):
+        """Dispatch every remaining timepoint of the current guide at once.
+
+        Once no contingent timepoints are left to execute, no strategy changes
+        its guide again, so the rest of the simulation is fully determined.
+        The remaining times are found in one longest path pass over the guide,
+        and the STN is checked for consistency once, instead of once per
+        timepoint.
+
+        Returns:
+            None if the simulation cannot be fast-forwarded yet. Otherwise, a
+            boolean indicating whether the simulation was successful or not.
+        """
+        if self.remaining_contingent_count(self.assignment_stn) > 0:
+            return None
+        times = self._remaining_times(self._guide_stn,
+                                      self._options["first_run"])
+        if times is None:
+            return None
+        with profiling.span("fast_forward"):
+            consistent = self._check_remaining(self.stn, times)
+        counters.count("dispatch_steps", len(times))
+        for vert_id, time in times.items():
+            if self.trace is not None:
+                self.trace.append((
+                    vert_id, time,
+                    -self._guide_stn.get_edge_weight(vert_id, Z_NODE_ID),
+                    self._guide_stn.get_edge_weight(Z_NODE_ID, vert_id),
+                    False, self._current_alpha))
+            self._assign_timepoint(self._guide_stn, vert_id, time)
+            self._assign_timepoint(self.stn, vert_id, time)
+            self._assign_timepoint(self.assignment_stn, vert_id, time)
+        self.num_fast_forwarded = len(times)
+        if not consistent:
+            pr.verbose("Assignments: " + str(self.get_assigned_times()))
+            pr.verbose("Failed to fast-forward {} points"
+                       .format(len(times)))
+            return self.fail()
+        if times:
+            self._current_time = max(times.values())
+        return self.finish()
+
+    def _remaining_times(self, guide, first_run):
+        """Find the times at which select_next_timepoint() would dispatch
+        every unexecuted timepoint of a guide, if no contingent timepoints
+        remain and the guide no longer changes.
+
+        Each time only depends on the times of the timepoint's predecessors,
+        so they are found in a single pass in topological order.
+
+        Args:
+            guide (STN): The guide being followed.
+            first_run (bool): Whether no timepoint has been dispatched yet.
+
+        Returns:
+            A dictionary of the form {vert_id: time}, or None if the times
+            cannot be found this way.
+        """
+        incoming = {i: [] for i, vert in guide.verts.items()
+                    if not vert.is_executed()}
+        for e in guide.get_all_edges():
+            if e.j in incoming:
+                incoming[e.j].append(e)
+        if guide is self.stn:
+            # When the stored STN is the guide, it is propagated after every
+            # assignment. Its earliest times only stay the same if it is
+            # already minimal, and if every timepoint has an edge from Z.
+            if first_run or self._stale:
+                return None
+            if any(all(e.i != Z_NODE_ID for e in edges)
+                   for edges in incoming.values()):
+                return None
+
+        times = {}
+        while len(times) < len(incoming):
+            progress = False
+            for i, edges in incoming.items():
+                if i in times:
+                    continue
+                if any(e.i in incoming and e.i not in times for e in edges):
+                    continue
+                if edges == []:
+                    times[i] = 0.0
+                else:
+                    times[i] = max(e.get_weight_min()
+                                   + (times[e.i] if e.i in times
+                                      else self.stn.get_assigned_time(e.i))
+                                   for e in edges)
+                progress = True
+            if not progress:
+                # Some timepoints can never be enabled.
+                return None
+        return times
+
+    def _check_remaining(self, stn, times) -> bool:
+        """Check whether assigning several timepoints keeps an STN
+        consistent.
+
+        Unlike _assign_timepoint(), the old bounds of each timepoint are kept,
+        so one propagation catches any assignment which breaks them.
+
+        Args:
+            stn (STN): STN to check. It is not modified.
+            times (dict): Dictionary of the form {vert_id: time}.
+
+        Returns:
+            Boolean indicating whether the STN stays consistent.
+        """
+        stn_copy = counters.copy_stn(stn)
+        for vert_id, time in times.items():
+            if vert_id == Z_NODE_ID or vert_id not in stn_copy.verts:
+                continue
+            stn_copy.update_edge(Z_NODE_ID, vert_id, time, create=True)
+            stn_copy.update_edge(vert_id, Z_NODE_ID, -time, create=True)
+        return self.propagate_constraints(stn_copy)
+
+    def fail(self, vert_id=None) -> bool:
+        """Record that the simulation failed at the current step.
+
+        Args:
+            vert_id (int, optional): The timepoint that could not be placed.
+                None if the failure was not caused by a single timepoint.
+
+        Returns:
+            False, for the simulation to return.
+        """
+        self.failure_step = self.num_steps
+        self.failure_vertex = NO_FAILURE if vert_id is None else vert_id
+        return False
+
+    def finish(self) -> bool:
+        """Wrap up a simulation in which every timepoint was assigned."""
         pr.verbose("Assignments: " + str(self.get_assigned_times()))
         pr.verbose("Successful!")
         assert (self.propagate_constraints(self.assignment_stn))
         return True
 
+    def fork(self):
+        """Returns an independent copy of this simulator, mid-simulation.
+
+        The copy continues from exactly the same state as this simulator, so
+        both can be advanced separately without affecting each other. Only the
+        STNs which are modified during dispatch are copied.
+
+        Returns:
+            A new Simulator (of the same class as this one).
+        """
+        forked = copy.copy(self)
+        forked.stn = counters.copy_stn(self.stn)
+        forked.assignment_stn = counters.copy_stn(self.assignment_stn)
+        if self._guide_stn is self.stn:
+            forked._guide_stn = forked.stn
+        else:
+            forked._guide_stn = counters.copy_stn(self._guide_stn)
+        forked._options = dict(self._options)
+        if self.trace is not None:
+            forked.trace = list(self.trace)
+        forked._rand_state = np.random.RandomState()
+        forked._rand_state.set_state(self._rand_state.get_state())
+        return forked
+
     def select_next_timepoint(self, dispatch, current_time):
         """Retrieves the earliest possible vert.
 
@@ -233,10 +534,82 @@ class Simulator(object):
     def propagate_constraints(self, stn_to_prop):
         """ Updates current constraints and minimises
         """
-        functiontimer.start("propogate_constraints")
-        ans = stn_to_prop.floyd_warshall()
-        functiontimer.stop("propogate_constraints")
-        return ans
+        with counters.timed("floyd_warshall"):
+            return stn_to_prop.floyd_warshall()
+
+    def _minimize_stored_stn(self) -> None:
+        """Run any propagation of the stored STN that lazy propagation
+        deferred.
+        """
+        if not self._stale:
+            return
+        self._stale = False
+        consistent = self.propagate_constraints(self.stn)
+        # Lazy steps are only taken when they keep the STN consistent.
+        assert consistent
+        self.remove_old_timepoints(self.stn)
+
+    def _within_z_bounds(self, vert_id, time) -> bool:
+        """Check whether a timepoint of the stored STN can be assigned to a
+        time without the STN becoming inconsistent.
+
+        The edges to and from Z of the stored STN always hold the tightest
+        bounds, so any time within them extends to a full schedule.
+        """
+        if (vert_id == Z_NODE_ID
+                or self.stn.get_edge(Z_NODE_ID, vert_id) is None):
+            return False
+        upper = self.stn.get_edge_weight(Z_NODE_ID, vert_id)
+        lower = -self.stn.get_edge_weight(vert_id, Z_NODE_ID)
+        return lower <= time <= upper
+
+    def _tighten_z_bounds(self, stn, vert_id) -> None:
+        """Update the edges to and from Z after assigning one timepoint.
+
+        Only the shortest paths to and from Z that pass through the newly
+        assigned timepoint can change, so these are found by relaxing outwards
+        from it, instead of running a full Floyd-Warshall. Other edges are
+        left as they were.
+
+        Args:
+            stn (STN): A consistent STN, modified in-place.
+            vert_id (int): The timepoint which was just assigned.
+        """
+        neighbours = {v: [] for v in stn.verts}
+        for e in stn.get_all_edges():
+            neighbours[e.i].append(e.j)
+            neighbours[e.j].append(e.i)
+        for from_z in (True, False):
+            if from_z:
+                dist = {v: stn.get_edge_weight(Z_NODE_ID, v)
+                        for v in stn.verts}
+            else:
+                dist = {v: stn.get_edge_weight(v, Z_NODE_ID)
+                        for v in stn.verts}
+            queue = deque([vert_id])
+            queued = {vert_id}
+            while queue:
+                k = queue.popleft()
+                queued.discard(k)
+                for v in neighbours[k]:
+                    if v == Z_NODE_ID:
+                        continue
+                    if from_z:
+                        new_dist = dist[k] + stn.get_edge_weight(k, v)
+                    else:
+                        new_dist = stn.get_edge_weight(v, k) + dist[k]
+                    if new_dist < dist[v]:
+                        dist[v] = new_dist
+                        if v not in queued:
+                            queue.append(v)
+                            queued.add(v)
+            for v, d in dist.items():
+                if v == Z_NODE_ID:
+                    continue
+                if from_z:
+                    stn.update_edge(Z_NODE_ID, v, d)
+                else:
+                    stn.update_edge(v, Z_NODE_ID, d)
 
     def all_assigned(self) -> bool:
         """ Check if all vertices of the STN have been executed.
@@ -262,12 +635,42 @@ class Simulator(object):
             if (stn.outgoing_executed(v_id) and
                     stn.get_vertex(v_id).is_executed()):
                 stn.remove_vertex(v_id)
+                counters.count("vertices_removed")
 
     def resample_stored_stn(self) -> None:
         """Resample the stored STN contingent edges (self.stn)"""
         for e in self.stn.contingent_edges.values():
             e.resample(self._rand_state)
 
+    def apply_samples(self, stn, samples) -> None:
+        """Set the sampled durations of an STN's contingent edges.
+
+        Args:
+            stn (STN): STN to modify in-place.
+            samples (dict): Dictionary of the form {(i, j): duration}.
+        """
+        for k, e in stn.contingent_edges.items():
+            e.set_sampled_time(samples[k])
+
+    def _run_srea(self):
+        """Run SREA on the stored STN (self.stn).
+
+        If the simulation was given an initial guide, the first call returns
+        a copy of it carrying this simulation's samples instead.
+
+        Returns:
+            The same as srea.srea(): an (alpha, guide) tuple, or None.
+        """
+        if self._initial_guide is not None:
+            alpha, guide = self._initial_guide
+            self._initial_guide = None
+            guide = counters.copy_stn(guide)
+            self.apply_samples(guide, {k: e.sampled_time() for k, e
+                                       in self.stn.contingent_edges.items()})
+            return alpha, guide
+        self._minimize_stored_stn()
+        return srea.srea(self.stn)
+
     def get_assigned_times(self) -> dict:
         """Return when each timepoint in the simulation was assigned"""
         times = {}
@@ -295,6 +698,8 @@ class Simulator(object):
             | [1]: dispatch (type STN) which the simulator should follow,
         """
         if execution_strat == "early":
+            # The stored STN is the guide, so it must be fully propagated.
+            self._minimize_stored_stn()
             return 1.0, self.stn
         elif execution_strat == "srea":
             return self._srea_algorithm(previous_alpha,
@@ -374,7 +779,7 @@ class Simulator(object):
             consistent.
         """
         self.num_reschedules += 1
-        result = srea.srea(self.stn)
+        result = self._run_srea()
         if result is not None:
             self.num_sent_schedules += 1
             return result[0], result[1]
@@ -383,6 +788,7 @@ class Simulator(object):
         # Follow the previous guide?
         return previous_alpha, previous_guide
 
+    @counters.hook
     def _srea_algorithm(self, previous_alpha, previous_guide, first_run):
         """ Implements the SREA algorithm. """
         if first_run:
@@ -390,6 +796,7 @@ class Simulator(object):
         # Not our first run, use the previous guide.
         return previous_alpha, previous_guide
 
+    @counters.hook
     def _drea_algorithm(self, previous_alpha, previous_guide, first_run,
                         executed_contingent):
         """ Implements the DREA algorithm. """
@@ -399,6 +806,7 @@ class Simulator(object):
             return ans
         return previous_alpha, previous_guide
 
+    @counters.hook
     def _drea_s_algorithm(self, previous_alpha, previous_guide, first_run,
                           executed_contingent, next_time, min_time, max_time):
         """ Implements the SREA-S algorithm. """
@@ -414,13 +822,14 @@ class Simulator(object):
                        .format(next_time, min_time, max_time))
         return previous_alpha, previous_guide
 
+    @counters.hook
     def _drea_si_algorithm(self, previous_alpha, previous_guide, first_run,
                            executed_contingent, threshold):
         """ Implements the DREA-SI algorithm. """
         # Exit early if the STN was not consistent at all.
 
         if first_run:
-            result = srea.srea(self.stn)
+            result = self._run_srea()
             self.num_reschedules += 1
             self.num_sent_schedules += 1
             if result is None:
@@ -434,7 +843,7 @@ class Simulator(object):
         if not executed_contingent:
             return previous_alpha, previous_guide
         # Reschedule
-        result = srea.srea(self.stn)
+        result = self._run_srea()
         self.num_reschedules += 1
         if result is None:
             return previous_alpha, previous_guide
@@ -453,6 +862,7 @@ class Simulator(object):
             pr.verbose("Did not reschedule, p_0={}, p_1={}".format(p_0, p_1))
             return previous_alpha, previous_guide
 
+    @counters.hook
     def _drea_alp_algorithm(self, previous_alpha, previous_guide, first_run,
                             executed_contingent, threshold):
         """ Implements the DREA alpha difference algorithm, which is an attempt
@@ -461,7 +871,7 @@ class Simulator(object):
         """
         if first_run:
             self.num_reschedules += 1
-            result = srea.srea(self.stn)
+            result = self._run_srea()
             if result is None:
                 return previous_alpha, previous_guide
             new_alpha = result[0]
@@ -475,7 +885,7 @@ class Simulator(object):
         if not executed_contingent:
             return previous_alpha, previous_guide
         # We are therefore actually running the algorithm.
-        result = srea.srea(self.stn)
+        result = self._run_srea()
         self.num_reschedules += 1
         if result is None:
             return previous_alpha, previous_guide
@@ -497,12 +907,13 @@ class Simulator(object):
                        .format(previous_alpha, new_alpha))
             return previous_alpha, previous_guide
 
+    @counters.hook
     def _drea_ar_algorithm(self, previous_alpha, previous_guide, first_run,
                            executed_contingent, threshold,
                            contingent_event_counter):
         """ Implements the DREA-AR algorithm. """
         if first_run:
-            result = srea.srea(self.stn)
+            result = self._run_srea()
             self.num_reschedules += 1
             if result is not None:
                 self.num_sent_schedules += 1
@@ -527,7 +938,7 @@ class Simulator(object):
         # Temporary variable to maintain unique names.
         new_counter = contingent_event_counter
         if contingent_event_counter >= n:
-            result = srea.srea(self.stn)
+            result = self._run_srea()
             self.num_reschedules += 1
             if result is not None:
                 pr.verbose("DREA-AR rescheduled our STN")
@@ -538,6 +949,7 @@ class Simulator(object):
                 return new_alpha, maybe_guide, new_counter
         return previous_alpha, previous_guide, new_counter
 
+    @counters.hook
     def _drea_ara_algorithm(self, previous_alpha, previous_guide, first_run,
                             threshold, successfactor, in_bounds):
         """ Implements the DREA-ARA algorithm.
@@ -546,7 +958,7 @@ class Simulator(object):
         Oh god please, this function's arguments are cancer. -Jordan 2018
         """
         if first_run:
-            result = srea.srea(self.stn)
+            result = self._run_srea()
             self.num_reschedules += 1
             if result is not None:
                 self.num_sent_schedules += 1
@@ -562,7 +974,7 @@ class Simulator(object):
             newfactor = min(1.0 - previous_alpha, previous_alpha / 2.0)
 
         if successfactor <= threshold:
-            result = srea.srea(self.stn)
+            result = self._run_srea()
             self.num_reschedules += 1
             if result is not None:
                 pr.verbose("DREA-AR rescheduled our STN")
@@ -573,6 +985,7 @@ class Simulator(object):
                 return new_alpha, maybe_guide, newfactor
         return previous_alpha, previous_guide, newfactor
 
+    @counters.hook
     def _arsi_algorithm(self, previous_alpha, previous_guide, first_run,
                         executed_contingent, contingent_event_counter,
                         ar_threshold=0.0,
@@ -584,7 +997,7 @@ class Simulator(object):
         where we *do* see an increase in risk, rather than a decrease.
         """
         if first_run:
-            result = srea.srea(self.stn)
+            result = self._run_srea()
             self.num_reschedules += 1
             if result is not None:
                 self.num_sent_schedules += 1
@@ -608,7 +1021,7 @@ class Simulator(object):
         if contingent_event_counter >= n:
             # Get a new schedule
             pr.verbose("ARSC rescheduled...")
-            result = srea.srea(self.stn)
+            result = self._run_srea()
             self.num_reschedules += 1
         if result is None:
             # Early exit if SREA failed OR if it's not time yet to reschedule
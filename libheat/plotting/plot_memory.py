@@ -0,0 +1,45 @@
+"""Plots how the memory use and runtime of each strategy scale with the size
+of the STN, from results written with run_simulator.py --memory.
+"""
+
+
+import matplotlib.pyplot as plt
+
+
+def plot_memory_scaling(df, ax=None, executions=None):
+    """Plot peak memory and runtime against the number of vertices.
+
+    X axis: Number of vertices of the STN
+    Left Y axis: Peak RSS of any worker (MB), solid lines
+    Right Y axis: Runtime per sample (seconds), dashed lines
+
+    Args:
+        df (DataFrame): DataFrame of results. Must have the "peak_rss_mb"
+            column written by --memory.
+        ax (pyplot.axes, optional): Axes to plot on. Otherwise, plot on the
+            default.
+        executions (list, optional): List of strings of execution strats to
+            plot. Default is every strategy in df.
+    """
+    if ax is None:
+        ax = plt.gca()
+    if executions is None:
+        executions = sorted(df["execution"].unique().tolist())
+    runtime_ax = ax.twinx()
+    for i, ex in enumerate(executions):
+        runs = df.loc[df["execution"] == ex]
+        by_size = runs.assign(
+            runtime_per_sample=runs["runtime"] / runs["samples"]).groupby(
+                "vert_count")
+        peak = by_size["peak_rss_mb"].max()
+        runtime = by_size["runtime_per_sample"].mean()
+        color = "C{}".format(i)
+        ax.plot(peak.index, peak.values, linewidth=1, marker="o",
+                color=color, label=ex)
+        runtime_ax.plot(runtime.index, runtime.values, linewidth=1,
+                        marker="x", linestyle="--", color=color)
+    ax.set_xlabel("Vertices")
+    ax.set_ylabel("Peak RSS (MB), solid")
+    runtime_ax.set_ylabel("Runtime per sample (s), dashed")
+    ax.legend()
+    ax.set_title("Memory and Runtime Scaling")
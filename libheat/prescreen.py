@@ -0,0 +1,94 @@
+"""Pre-screening of Monte-Carlo samples.
+
+If an STN is inconsistent once every contingent edge is fixed to its sampled
+duration, no dispatch strategy can succeed on that sample, so there is no
+need to simulate it. The check is a Floyd-Warshall over a dense distance
+matrix, which numpy can run for many samples at once.
+"""
+
+import numpy as np
+
+
+DEFAULT_BATCH_SIZE = 256
+"""Number of samples checked together by batch_consistent()."""
+
+TOLERANCE = 1e-9
+"""Slack allowed on negative cycles, so that rounding errors never screen
+out a sample that the simulator would accept."""
+
+
+def distance_matrix(stn) -> tuple:
+    """Returns the distance graph of an STN as a dense matrix.
+
+    Args:
+        stn (STN): The STN to convert.
+
+    Returns:
+        A tuple of (index, matrix), where index maps each vertex ID to its
+        row/column in matrix, and matrix[i, j] is the weight of the edge
+        from i to j (infinity if there is none).
+    """
+    index = {v: n for n, v in enumerate(sorted(stn.verts))}
+    matrix = np.full((len(index), len(index)), np.inf)
+    np.fill_diagonal(matrix, 0.0)
+    for e in stn.get_all_edges():
+        i, j = index[e.i], index[e.j]
+        matrix[i, j] = min(matrix[i, j], e.Cij)
+        matrix[j, i] = min(matrix[j, i], e.Cji)
+    return index, matrix
+
+
+def batch_consistent(stn, samples_list, batch_size=DEFAULT_BATCH_SIZE,
+                     distances=None):
+    """Check the instantiated STN of several samples for consistency.
+
+    Args:
+        stn (STN): The STN that the samples were drawn from.
+        samples_list (list): List of sample dictionaries, each of the form
+            {(i, j): duration}, as returned by montsim.draw_samples().
+        batch_size (int, optional): Number of samples to check at once.
+            Bounds the memory used to batch_size * N^2 floats.
+        distances (tuple, optional): The result of distance_matrix(stn), if
+            it is already known.
+
+    Returns:
+        A numpy array of bools, one per sample, which is False where the
+        instantiated STN is inconsistent.
+    """
+    if distances is None:
+        distances = distance_matrix(stn)
+    index, base = distances
+    keys = list(stn.contingent_edges.keys())
+    rows = np.array([index[i] for i, j in keys], dtype=int)
+    cols = np.array([index[j] for i, j in keys], dtype=int)
+    results = np.ones(len(samples_list), dtype=bool)
+    for start in range(0, len(samples_list), batch_size):
+        chunk = samples_list[start:start + batch_size]
+        durations = np.array([[samples[k] for k in keys] for samples in chunk],
+                             dtype=float).reshape(len(chunk), len(keys))
+        dist = np.repeat(base[np.newaxis, :, :], len(chunk), axis=0)
+        # Fix each contingent edge to its duration, keeping its bounds.
+        dist[:, rows, cols] = np.minimum(dist[:, rows, cols], durations)
+        dist[:, cols, rows] = np.minimum(dist[:, cols, rows], -durations)
+        for k in range(base.shape[0]):
+            np.minimum(dist, dist[:, :, k, np.newaxis]
+                       + dist[:, np.newaxis, k, :], out=dist)
+        diagonals = np.diagonal(dist, axis1=1, axis2=2)
+        results[start:start + len(chunk)] = np.all(diagonals >= -TOLERANCE,
+                                                   axis=1)
+    return results
+
+
+def is_consistent(stn, samples, distances=None) -> bool:
+    """Check the instantiated STN of one sample for consistency.
+
+    Args:
+        stn (STN): The STN that the sample was drawn from.
+        samples (dict): Dictionary of the form {(i, j): duration}.
+        distances (tuple, optional): The result of distance_matrix(stn), if
+            it is already known.
+
+    Returns:
+        False if no strategy can succeed on this sample, True otherwise.
+    """
+    return bool(batch_consistent(stn, [samples], distances=distances)[0])
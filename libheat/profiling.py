@@ -0,0 +1,279 @@
+"""Profiling of named spans of code, across worker processes.
+
+Spans are opened with the span() context manager or the profiled()
+decorator. Spans nest: each is recorded under its path, the names of the
+spans open around it, with its number of calls and total time in
+nanoseconds (from time.perf_counter_ns()). A span re-entered while it is
+already open, as in recursion, only counts the call, so that its time is not
+counted twice.
+
+Profiling is off by default. While it is off, span() returns a shared no-op
+context manager, and profiled functions call straight through, so the spans
+can stay in the hot paths of the simulator.
+
+Every process keeps its own totals. Workers hand theirs back with collect(),
+and the parent adds them to its own with merge().
+
+Spans can also be recorded as a timeline of events, for a single simulation
+(see record_events() and libheat.timeline). While recording, instant()
+marks points in time, such as contingent executions.
+
+Examples:
+    >>> profiling.enable()
+    >>> with profiling.span("propagation & check"):
+    ...     stn.floyd_warshall()
+    >>> @profiling.profiled("srea")
+    ... def srea(stn): ...
+    >>> profiling.collect()
+    {'propagation & check': (1, 5310210)}
+"""
+
+import functools
+import json
+import re
+import time
+
+
+SPANS = ("get_guide", "srea", "alpha_probe", "selection",
+         "propagation & check", "lazy_propagation", "fast_forward",
+         "draw_samples", "invcdf_norm")
+"""Names of the spans in libheat, which get a column in the results row."""
+
+SEPARATOR = "/"
+"""Joins the names of nested spans into a path."""
+
+_enabled = False
+_recording = False
+_active = False
+"""Whether spans are timed at all: while profiling or recording events."""
+
+_totals = {}
+"""Maps each span path to its [calls, total nanoseconds]."""
+
+_open = []
+"""Paths of the spans open right now, innermost last."""
+
+_events = []
+"""Recorded (name, phase, start ns, duration ns, args) events."""
+
+
+def enable(on=True):
+    """Turn profiling on (or off) in this process."""
+    global _enabled, _active
+    _enabled = bool(on)
+    _active = _enabled or _recording
+
+
+def is_enabled() -> bool:
+    """Check whether profiling is on in this process."""
+    return _enabled
+
+
+def record_events(on=True):
+    """Start (or stop) recording spans and instants as events, whether
+    profiling is on or not. Starting clears any events recorded before.
+    """
+    global _recording, _active
+    _recording = bool(on)
+    _active = _enabled or _recording
+    if _recording:
+        _events.clear()
+
+
+def take_events() -> list:
+    """Stop recording events, and return them.
+
+    Returns:
+        A list of (name, phase, start, duration, args) tuples, in the order
+        the events ended. phase is "X" for a span and "i" for an instant.
+        Times are in nanoseconds, from time.perf_counter_ns().
+    """
+    record_events(False)
+    events = list(_events)
+    _events.clear()
+    return events
+
+
+def instant(name, args=None):
+    """Mark a point in time, while recording events."""
+    if _recording:
+        _events.append((name, "i", time.perf_counter_ns(), 0, args))
+
+
+class _Span(object):
+    """An open span. Made by span() only while profiling or recording."""
+
+    __slots__ = ("name", "path", "start", "args")
+
+    def __init__(self, name, args=None):
+        parent = _open[-1] if _open else ""
+        names = parent.split(SEPARATOR) if parent else []
+        self.name = name
+        self.args = args
+        self.start = None
+        if name in names:
+            # Already open further out. The call is counted under the
+            # outermost span of that name, and so is any span nested in it.
+            self.path = SEPARATOR.join(names[:names.index(name) + 1])
+        else:
+            self.path = parent + SEPARATOR + name if parent else name
+
+    def __enter__(self):
+        if self.path in _open:
+            if _enabled:
+                _totals.setdefault(self.path, [0, 0])[0] += 1
+        else:
+            self.start = time.perf_counter_ns()
+        _open.append(self.path)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _open.pop()
+        if self.start is not None:
+            elapsed = time.perf_counter_ns() - self.start
+            if _enabled:
+                entry = _totals.setdefault(self.path, [0, 0])
+                entry[0] += 1
+                entry[1] += elapsed
+            if _recording:
+                _events.append((self.name, "X", self.start, elapsed,
+                                self.args))
+        return False
+
+
+class _NoSpan(object):
+    """Stands in for every span while profiling is off."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name, args=None):
+    """Time a block of code.
+
+    Args:
+        name (str): Name of the span.
+        args (dict, optional): Details of the span, kept with its event
+            while recording events.
+
+    Returns:
+        A context manager.
+    """
+    if not _active:
+        return _NO_SPAN
+    return _Span(name, args)
+
+
+def profiled(name=None):
+    """Decorator timing every call of a function as a span.
+
+    Args:
+        name (str, optional): Name of the span. Default is the function's
+            name.
+    """
+    def decorator(func):
+        span_name = func.__name__ if name is None else name
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _active:
+                return func(*args, **kwargs)
+            with _Span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def snapshot() -> dict:
+    """Returns the totals of this process, as {path: (calls, nanoseconds)}."""
+    return {path: tuple(entry) for path, entry in _totals.items()}
+
+
+def collect() -> dict:
+    """Returns the totals of this process, like snapshot(), and clears them.
+    Used by workers to hand their totals to the parent.
+    """
+    totals = snapshot()
+    _totals.clear()
+    return totals
+
+
+def merge(totals, into=None):
+    """Add totals from collect() to this process' totals, or to into.
+
+    Args:
+        totals (dict): Totals to add. May be None.
+        into (dict, optional): A {path: (calls, nanoseconds)} dictionary to
+            add to instead.
+    """
+    if not totals:
+        return
+    for path, (calls, ns) in totals.items():
+        if into is None:
+            entry = _totals.setdefault(path, [0, 0])
+            entry[0] += calls
+            entry[1] += ns
+        else:
+            old = into.get(path, (0, 0))
+            into[path] = (old[0] + calls, old[1] + ns)
+
+
+def by_name(totals) -> dict:
+    """Sum totals over every path ending in the same span name.
+
+    Returns:
+        A dictionary of the form {name: (calls, seconds)}.
+    """
+    names = {}
+    for path, (calls, ns) in totals.items():
+        # A name appears at most once in a path, so no time is counted twice.
+        name = path.rsplit(SEPARATOR, 1)[-1]
+        old = names.get(name, (0, 0.0))
+        names[name] = (old[0] + calls, old[1] + ns / 1e9)
+    return names
+
+
+def columns(totals) -> dict:
+    """Build the profiling columns of a results row.
+
+    Returns:
+        A dictionary with the "profile_<name>_s" and "profile_<name>_calls"
+        of every span in SPANS, and "profile_spans", a JSON object of every
+        path's [calls, seconds]. Each run of characters other than letters,
+        digits and "_" in a name becomes one "_", as in
+        "profile_propagation_check_s".
+    """
+    names = by_name(totals)
+    row = {}
+    for name in SPANS:
+        calls, seconds = names.get(name, (0, 0.0))
+        column = re.sub(r"\W+", "_", name)
+        row["profile_{}_s".format(column)] = seconds
+        row["profile_{}_calls".format(column)] = calls
+    row["profile_spans"] = json.dumps(
+        {path: [calls, ns / 1e9]
+         for path, (calls, ns) in sorted(totals.items())})
+    return row
+
+
+def report(totals=None) -> str:
+    """Format totals (by default, this process' totals) as a table of
+    nested spans.
+    """
+    if totals is None:
+        totals = snapshot()
+    lines = ["{:<48} {:>10} {:>12}".format("span", "calls", "seconds")]
+    for path in sorted(totals):
+        calls, ns = totals[path]
+        depth = path.count(SEPARATOR)
+        name = "  " * depth + path.rsplit(SEPARATOR, 1)[-1]
+        lines.append("{:<48} {:>10} {:>12.6f}".format(name, calls, ns / 1e9))
+    return "\n".join(lines)
@@ -0,0 +1,183 @@
+"""Live progress of a run.
+
+ProgressReporter is told of every sample as soon as its task finishes,
+from the completion events of the worker pool's imap_unordered(). From
+them it prints a status line with the samples done per second, the ETA of
+the run and of the stage that last finished a sample, how busy the workers
+are, and the running robustness of every strategy of that stage. Each
+event only updates a few counters; the line is printed at most once every
+INTERVAL seconds. On a terminal, the line is rewritten in place, and
+elsewhere (e.g. a log file) a new line is printed every LOG_INTERVAL
+seconds.
+
+Examples:
+    >>> reporter = ProgressReporter(workers=4)
+    >>> on_sample = reporter.add_stage("a", 100, "rover.json", ["drea"])
+    >>> multiple_simulations(stn, "drea", 100, threads=4,
+    ...                      progress=on_sample)
+    >>> reporter.close()
+"""
+
+import sys
+import time
+
+
+INTERVAL = 0.5
+"""Least seconds between two status lines on a terminal."""
+
+LOG_INTERVAL = 30.0
+"""Least seconds between two status lines when not on a terminal."""
+
+
+class ProgressReporter(object):
+    """Prints the live progress of the samples of one or more stages.
+
+    Args:
+        workers (int, optional): Number of worker processes the samples run
+            on, to report how busy they are. Default is not to report it,
+            e.g. when the workers are remote.
+        stream (file, optional): Where to print. Default is sys.stderr.
+        interval (float, optional): Least seconds between two status lines.
+            Default is INTERVAL on a terminal, and LOG_INTERVAL otherwise.
+        clock (function, optional): Returns the current time in seconds.
+    """
+
+    def __init__(self, workers=None, stream=None, interval=None,
+                 clock=time.monotonic):
+        self.workers = workers
+        self.stream = sys.stderr if stream is None else stream
+        self.tty = hasattr(self.stream, "isatty") and self.stream.isatty()
+        if interval is None:
+            interval = INTERVAL if self.tty else LOG_INTERVAL
+        self.interval = interval
+        self.clock = clock
+        self.start = clock()
+        self.total = 0
+        self.done = 0
+        self.busy = 0.0
+        self._stages = {}
+        self._last_stage = None
+        self._printed = self.start
+        self._width = 0
+
+    def add_stage(self, key, samples, label, variants):
+        """Add the samples of a stage to the run.
+
+        Args:
+            key: Hashable ID of the stage.
+            samples (int): Number of samples the stage will run, at most.
+            label (str): Name of the stage in the status line.
+            variants (list): Names of the strategies of the stage, in the
+                order of the answers of its samples.
+
+        Returns:
+            A function to call with the answers of every sample of the
+            stage, as soon as it finishes. See task_done().
+        """
+        self.total += samples
+        self._stages[key] = {"label": label, "variants": list(variants),
+                             "samples": samples, "done": 0, "first": None,
+                             "robust": [0] * len(variants)}
+        return lambda answers: self.task_done(key, answers)
+
+    def task_done(self, key, answers):
+        """Count a finished sample of a stage.
+
+        Args:
+            key: ID of the stage, from add_stage().
+            answers (list): The answers of every variant on the sample, as
+                returned by the sample's task.
+        """
+        now = self.clock()
+        stage = self._stages[key]
+        if stage["first"] is None:
+            stage["first"] = now
+        stage["done"] += 1
+        self.done += 1
+        for v, answer in enumerate(answers):
+            stage["robust"][v] += bool(answer[0])
+            self.busy += answer[3]
+        self._last_stage = key
+        if now - self._printed >= self.interval:
+            self._printed = now
+            self._print(self.status(now))
+
+    def stage_done(self, key):
+        """Finish a stage, dropping the samples it did not need (e.g. when
+        sequentially stopped) from the run.
+        """
+        stage = self._stages.pop(key)
+        self.total -= stage["samples"] - stage["done"]
+        if self._last_stage == key:
+            self._last_stage = None
+
+    def status(self, now=None) -> str:
+        """Returns the status line."""
+        if now is None:
+            now = self.clock()
+        elapsed = max(now - self.start, 1e-9)
+        rate = self.done / elapsed
+        parts = ["{}/{} samples ({:.0%})".format(
+            self.done, self.total, self.done / max(self.total, 1)),
+                 "{:.1f}/s".format(rate),
+                 "ETA {}".format(_eta(self.total - self.done, rate))]
+        if self.workers:
+            parts.append("busy {:.0%}".format(
+                min(1.0, self.busy / (elapsed * self.workers))))
+        line = "  ".join(parts)
+        stage = self._stages.get(self._last_stage)
+        if stage is not None:
+            # The first sample of a stage may have started long before the
+            # stage's first event, so its rate is measured from there.
+            stage_rate = 0.0
+            if stage["done"] > 1 and now > stage["first"]:
+                stage_rate = (stage["done"] - 1) / (now - stage["first"])
+            line += " | {}: {}/{} ETA {}  robustness {}".format(
+                stage["label"], stage["done"], stage["samples"],
+                _eta(stage["samples"] - stage["done"], stage_rate),
+                " ".join("{} {:.3f}".format(name, robust / stage["done"])
+                         for name, robust in zip(stage["variants"],
+                                                 stage["robust"])))
+        return line
+
+    def clear(self):
+        """Erase the status line from a terminal, before printing
+        something else.
+        """
+        if self.tty and self._width:
+            self.stream.write("\r" + " " * self._width + "\r")
+            self.stream.flush()
+            self._width = 0
+
+    def close(self):
+        """Print a last status line, if any sample was run."""
+        if self.done:
+            self._print(self.status())
+            if self.tty:
+                self.stream.write("\n")
+                self.stream.flush()
+                self._width = 0
+
+    def _print(self, line):
+        if self.tty:
+            self.stream.write("\r" + line.ljust(self._width))
+            self._width = len(line)
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
+
+
+def _eta(remaining, rate) -> str:
+    """Format the time left to run remaining samples at a rate."""
+    if remaining <= 0:
+        return "0s"
+    if rate <= 0:
+        return "?"
+    seconds = int(round(remaining / rate))
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if hours:
+        return "{}h{:02d}m".format(hours, minutes)
+    if minutes:
+        return "{}m{:02d}s".format(minutes, seconds)
+    return "{}s".format(seconds)
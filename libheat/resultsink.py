@@ -0,0 +1,365 @@
+"""Streaming results sinks, for writing simulation results as they finish.
+
+A sink stores two tables: "stages", with one summary row per variant of every
+finished stage, and "samples", with one detail row per variant of every
+sample. Rows are handed to a background thread, which writes them out in
+batches, so the simulation never waits for the disk. Several runs may write
+to the same output at once.
+
+The format is picked from the output path:
+
+* ".db", ".sqlite" or ".sqlite3": a SQLite database in WAL mode, with one
+  table per kind of row.
+* ".parquet": a directory holding a "stages" and a "samples" directory of
+  Parquet files. Each batch is written to a new file, so that concurrent
+  runs never write to the same file. Needs pyarrow.
+* Anything else: CSV. The stage rows go to the path itself, and the sample
+  rows to a ".samples" file next to it. For example, "rover.csv" and
+  "rover.samples.csv".
+"""
+
+import csv
+import fcntl
+import os
+import os.path
+import queue
+import sqlite3
+import threading
+import uuid
+
+from . import printers as pr
+
+
+TABLES = ("stages", "samples")
+"""The tables every sink stores."""
+
+DEFAULT_BUFFER_ROWS = 1000
+"""Number of buffered rows at which the writer thread writes them out."""
+
+SQLITE_TIMEOUT = 60.0
+"""Seconds a SQLite writer waits for another writer to finish."""
+
+
+def open_sink(path, buffer_rows=DEFAULT_BUFFER_ROWS):
+    """Open the results sink for an output path.
+
+    Args:
+        path (str): Output path. Its extension selects the format.
+        buffer_rows (int, optional): Number of rows to buffer before writing.
+
+    Returns:
+        A BufferedSink.
+    """
+    path = os.path.abspath(os.path.expanduser(path))
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".db", ".sqlite", ".sqlite3"):
+        backend = SQLiteSink(path)
+    elif extension == ".parquet":
+        backend = ParquetSink(path)
+    else:
+        backend = CSVSink(path)
+    return BufferedSink(backend, buffer_rows=buffer_rows)
+
+
+class CSVSink(object):
+    """Appends rows to CSV files. A file is locked while it is written to,
+    so concurrent runs neither interleave rows nor both write a header.
+    Rows may leave columns of an existing file blank, but cannot add any.
+
+    Args:
+        path (str): Path of the stages file.
+    """
+
+    def __init__(self, path):
+        root, extension = os.path.splitext(path)
+        self.paths = {"stages": path,
+                      "samples": root + ".samples" + (extension or ".csv")}
+
+    def check(self, table, rows):
+        """Check that rows fit the columns of a table.
+
+        Raises:
+            ValueError: If the rows have columns the table's file lacks.
+        """
+        path = self.paths[table]
+        if os.path.exists(path):
+            with open(path, newline="", encoding="utf-8") as f:
+                _check_columns(path, next(csv.reader(f), None), rows)
+
+    def write(self, table, rows):
+        """Append rows to a table. Every row must have the same keys.
+
+        Raises:
+            ValueError: If the rows have columns the table's file lacks.
+        """
+        with open(self.paths[table], "a+", newline="", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                header = next(csv.reader(f), None)
+                _check_columns(self.paths[table], header, rows)
+                f.seek(0, os.SEEK_END)
+                fields = header if header else list(rows[0].keys())
+                writer = csv.DictWriter(f, fieldnames=fields)
+                if not header:
+                    writer.writeheader()
+                writer.writerows(rows)
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def close(self):
+        pass
+
+
+class SQLiteSink(object):
+    """Inserts rows into a SQLite database in WAL mode, which lets readers
+    and one writer work at once. Concurrent writers wait for each other.
+    Columns are added to a table when rows with new keys arrive.
+
+    Args:
+        path (str): Path of the database file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+        self._columns = {}
+
+    def _connect(self):
+        # Made, used and closed by the writer thread only, since a
+        # connection may only be used by the thread that made it.
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path,
+                                               timeout=SQLITE_TIMEOUT)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        return self._connection
+
+    def _add_columns(self, connection, table, keys):
+        known = self._columns.get(table)
+        if known is None or not set(keys) <= known:
+            connection.execute('CREATE TABLE IF NOT EXISTS "{}" ({})'.format(
+                table, ", ".join(_quote(k) for k in keys)))
+            known = {r[1] for r in connection.execute(
+                'PRAGMA table_info("{}")'.format(table))}
+            for key in keys:
+                if key not in known:
+                    try:
+                        connection.execute(
+                            'ALTER TABLE "{}" ADD COLUMN {}'.format(
+                                table, _quote(key)))
+                    except sqlite3.OperationalError:
+                        # Added by a concurrent writer in the meantime.
+                        pass
+                    known.add(key)
+            self._columns[table] = known
+
+    def check(self, table, rows):
+        """Rows always fit, since missing columns are added."""
+
+    def write(self, table, rows):
+        """Insert rows into a table, in one transaction."""
+        connection = self._connect()
+        keys = list(rows[0].keys())
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            self._add_columns(connection, table, keys)
+            connection.executemany(
+                'INSERT INTO "{}" ({}) VALUES ({})'.format(
+                    table, ", ".join(_quote(k) for k in keys),
+                    ", ".join("?" for k in keys)),
+                [[_to_sql(row[k]) for k in keys] for row in rows])
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class ParquetSink(object):
+    """Writes every batch of rows to a new Parquet file, named after the
+    process and a random ID, so concurrent writers never collide. Read a
+    table back with pandas.read_parquet() on its directory.
+
+    Args:
+        path (str): Path of the directory to write the tables in.
+    """
+
+    def __init__(self, path):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("Writing Parquet output needs pyarrow; use a "
+                              "CSV or SQLite output instead") from e
+        self._pyarrow = pyarrow
+        self.path = path
+        for table in TABLES:
+            os.makedirs(os.path.join(path, table), exist_ok=True)
+
+    def check(self, table, rows):
+        """Rows always fit, since every file has its own columns."""
+
+    def write(self, table, rows):
+        """Write rows to a new file of a table."""
+        pa = self._pyarrow
+        columns = {k: [row[k] for row in rows] for k in rows[0].keys()}
+        name = "part-{}-{}.parquet".format(os.getpid(), uuid.uuid4().hex)
+        pa.parquet.write_table(pa.table(columns),
+                               os.path.join(self.path, table, name))
+
+    def close(self):
+        pass
+
+
+class BufferedSink(object):
+    """Buffers rows for a sink, and writes them out from a background
+    thread.
+
+    Stages are written in the order they are given. A stage counts as
+    written once all of its rows, stage and sample, are out.
+
+    Args:
+        backend: The CSVSink, SQLiteSink or ParquetSink to write to.
+        buffer_rows (int, optional): Number of rows to buffer before writing.
+
+    Examples:
+        >>> with open_sink("out.csv") as sink:
+        ...     sink.write(stage_rows, sample_rows, token="stage 1")
+        ...     print(sink.written())
+    """
+
+    def __init__(self, backend, buffer_rows=DEFAULT_BUFFER_ROWS):
+        self.backend = backend
+        self.buffer_rows = buffer_rows
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._written = []
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, stage_rows, sample_rows=(), token=None):
+        """Queue the rows of a finished stage for writing.
+
+        Args:
+            stage_rows (list): Summary rows of the stage.
+            sample_rows (list, optional): Detail rows of its samples.
+            token (optional): Returned by written() once every row of the
+                stage was written out.
+        """
+        self._raise()
+        self._queue.put((list(stage_rows), list(sample_rows), token))
+
+    def flush(self):
+        """Write out every queued row, and wait until it is done."""
+        self._raise()
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+        self._raise()
+
+    def written(self) -> list:
+        """Returns the tokens of the stages written out since the last
+        call, in the order they were given.
+        """
+        with self._lock:
+            written, self._written = self._written, []
+        return written
+
+    def close(self):
+        """Write out every queued row, and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self._raise()
+
+    def _raise(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _run(self):
+        buffers = {table: [] for table in TABLES}
+        tokens = []
+        while True:
+            item = self._queue.get()
+            if item is None or isinstance(item, threading.Event):
+                self._write_out(buffers, tokens)
+                if item is None:
+                    self.backend.close()
+                    return
+                item.set()
+                continue
+            stage_rows, sample_rows, token = item
+            buffers["stages"] += stage_rows
+            buffers["samples"] += sample_rows
+            if token is not None:
+                tokens.append(token)
+            if sum(len(b) for b in buffers.values()) >= self.buffer_rows:
+                self._write_out(buffers, tokens)
+
+    def _write_out(self, buffers, tokens):
+        try:
+            # Nothing is written unless every row fits, so that the rows of
+            # a stage are never written in part.
+            for table in TABLES:
+                for rows in _same_keys(buffers[table]):
+                    self.backend.check(table, rows)
+            for table in TABLES:
+                for rows in _same_keys(buffers[table]):
+                    self.backend.write(table, rows)
+        except Exception as e:
+            # Reported to the main thread; the rows are lost, and their
+            # stages are not reported as written.
+            pr.warning("Could not write results: {}".format(e))
+            self._error = e
+        else:
+            with self._lock:
+                self._written += tokens
+        for table in TABLES:
+            buffers[table].clear()
+        tokens.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _same_keys(rows):
+    """Split rows into runs of consecutive rows with the same keys."""
+    run = []
+    for row in rows:
+        if run and row.keys() != run[0].keys():
+            yield run
+            run = []
+        run.append(row)
+    if run:
+        yield run
+
+
+def _check_columns(path, header, rows):
+    """Raise a ValueError if rows have keys missing from a CSV header."""
+    if not header:
+        return
+    extra = [k for k in rows[0].keys() if k not in header]
+    if extra:
+        raise ValueError("{} has no {} column(s); write to a new output "
+                         "file instead".format(path, ", ".join(extra)))
+
+
+def _quote(name):
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def _to_sql(value):
+    """Convert numpy scalars, which sqlite3 cannot store, to Python ones."""
+    try:
+        return value.item()
+    except AttributeError:
+        return value
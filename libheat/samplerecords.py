@@ -0,0 +1,192 @@
+"""Compact per-sample records, stored as a NumPy structured array.
+
+Each record is one variant run on one sample, packed into RECORD_DTYPE (40
+bytes), so a run of millions of samples stays small enough to load in one go
+with numpy.load(). Records refer to their stage by a number. The stages are
+described in a JSON Lines file next to the records, for example
+"rover.samples.npy" and "rover.samples.stages.jsonl".
+
+The records file is a standard .npy file. Records are appended to it as
+stages finish, and the array length in its header is kept up to date, so a
+file left by an interrupted run is still valid.
+
+Examples:
+    >>> records = numpy.load("rover.samples.npy")
+    >>> failed = records[~records["robust"] & ~records["prescreened"]]
+    >>> numpy.bincount(failed["failure_vertex"])
+"""
+
+import json
+import os
+import os.path
+
+import numpy as np
+
+from . import fileio
+from . import printers as pr
+
+
+RECORD_DTYPE = np.dtype([("stage", "<u4"),
+                         ("variant", "<u2"),
+                         ("sample", "<u4"),
+                         ("seed", "<u4"),
+                         ("robust", "?"),
+                         ("prescreened", "?"),
+                         ("reschedules", "<u4"),
+                         ("sent_schedules", "<u4"),
+                         ("skipped_propagations", "<u4"),
+                         ("failure_step", "<i4"),
+                         ("failure_vertex", "<i4"),
+                         ("sim_time", "<f4")])
+"""Type of a single record. failure_step and failure_vertex are -1 if the
+simulation did not fail."""
+
+_MAX_SHAPE = (2 ** 63 - 1,)
+"""Shape with the longest header, so that the header never needs to grow."""
+
+
+class SampleRecords(object):
+    """Appends per-sample records to a .npy file. Only one process may
+    write to a file at a time.
+
+    Args:
+        path (str): Path of the .npy file. Records are appended if it
+            already exists.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.stages_path = os.path.splitext(self.path)[0] + ".stages.jsonl"
+        self.count = 0
+        self.stage_count = 0
+        if os.path.isfile(self.path):
+            with open(self.path, "rb") as f:
+                version = np.lib.format.read_magic(f)
+                shape, fortran, dtype = _read_header(f, version)
+            if dtype != RECORD_DTYPE:
+                raise ValueError("{} does not hold sample records"
+                                 .format(self.path))
+            self.count = shape[0]
+            self._file = open(self.path, "r+b")
+            self._header_len = _header_len()
+            # Drop any partly written record.
+            self._file.truncate(self._header_len
+                                + self.count * RECORD_DTYPE.itemsize)
+        else:
+            self._file = open(self.path, "w+b")
+            self._header_len = _header_len()
+            self._write_header()
+        if os.path.isfile(self.stages_path):
+            with open(self.stages_path, "r", encoding="utf-8") as f:
+                self.stage_count = sum(1 for line in f)
+        self._stages = open(self.stages_path, "a", encoding="utf-8")
+
+    def _write_header(self):
+        header = {"descr": np.lib.format.dtype_to_descr(RECORD_DTYPE),
+                  "fortran_order": False,
+                  "shape": (self.count,)}
+        self._file.seek(0)
+        self._file.write(_pad_header(header, self._header_len))
+
+    def append(self, stage, responses):
+        """Append the records of a finished stage.
+
+        Args:
+            stage (dict): Description of the stage, written to the stages
+                file with its number added as "stage". Must be JSON
+                serializable.
+            responses (list): The response dictionary of every variant (see
+                libheat.stages.multiple_variant_simulations()).
+
+        Returns:
+            The number of the stage in the records.
+        """
+        stage_id = self.stage_count
+        records = to_records(stage_id, responses)
+        self._file.seek(self._header_len
+                        + self.count * RECORD_DTYPE.itemsize)
+        self._file.write(records.tobytes())
+        self._file.flush()
+        self.count += len(records)
+        self._write_header()
+        self._file.flush()
+        description = dict(stage)
+        description["stage"] = stage_id
+        self._stages.write(json.dumps(description, default=fileio.to_json)
+                           + "\n")
+        self._stages.flush()
+        self.stage_count += 1
+        pr.vverbose("Wrote {} sample records of stage {}".format(
+            len(records), stage_id))
+        return stage_id
+
+    def close(self):
+        self._file.close()
+        self._stages.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def to_records(stage_id, responses) -> np.ndarray:
+    """Pack the response dictionaries of a stage into records.
+
+    Args:
+        stage_id (int): Number of the stage.
+        responses (list): The response dictionary of every variant.
+
+    Returns:
+        A numpy array of RECORD_DTYPE, with one record per variant and
+        sample, ordered by variant then sample.
+    """
+    size = sum(len(r["sample_results"]) for r in responses)
+    records = np.zeros(size, dtype=RECORD_DTYPE)
+    start = 0
+    for v, response in enumerate(responses):
+        end = start + len(response["sample_results"])
+        block = records[start:end]
+        block["stage"] = stage_id
+        block["variant"] = v
+        block["sample"] = np.arange(end - start)
+        block["seed"] = response["seeds"]
+        block["robust"] = response["sample_results"]
+        block["prescreened"] = response["prescreened"]
+        block["reschedules"] = response["reschedules"]
+        block["sent_schedules"] = response["sent_schedules"]
+        block["skipped_propagations"] = response["skipped_propagations"]
+        block["failure_step"] = response["failure_steps"]
+        block["failure_vertex"] = response["failure_vertices"]
+        block["sim_time"] = response["sim_times"]
+        start = end
+    return records
+
+
+def _read_header(f, version):
+    if version == (1, 0):
+        return np.lib.format.read_array_header_1_0(f)
+    return np.lib.format.read_array_header_2_0(f)
+
+
+def _header_len():
+    """Length of the fixed size header, magic string included."""
+    header = {"descr": np.lib.format.dtype_to_descr(RECORD_DTYPE),
+              "fortran_order": False,
+              "shape": _MAX_SHAPE}
+    return len(_pad_header(header))
+
+
+def _pad_header(header, length=None) -> bytes:
+    """Format a version 1.0 .npy header, padded with spaces to length (or to
+    the next multiple of 64 bytes).
+    """
+    text = repr(header).encode("latin1")
+    prefix = len(np.lib.format.MAGIC_PREFIX) + 2 + 2
+    if length is None:
+        length = prefix + len(text) + 1
+        length += -length % 64
+    text += b" " * (length - prefix - len(text) - 1) + b"\n"
+    return (np.lib.format.magic(1, 0)
+            + len(text).to_bytes(2, "little") + text)
@@ -0,0 +1,86 @@
+"""Global scheduling of simulation tasks across stages.
+
+A run is made of many stages (one per STN and setting), each with many
+independent sample tasks. Running the stages one after another leaves workers
+idle while each stage waits for its slowest sample. StageScheduler puts the
+tasks of every stage into one queue instead, longest stages first, and
+reports each stage as soon as its last task finishes.
+"""
+
+from . import printers as pr
+
+
+def _call(tup):
+    """Run a single scheduled task, and tag the result with its stage."""
+    func, stage_key, task = tup
+    return stage_key, func(task)
+
+
+class StageScheduler(object):
+    """Schedules the tasks of several stages on one worker pool.
+
+    Args:
+        pool (WorkerPool): The pool to run the tasks on.
+        func (function): Module level function run on every task.
+
+    Examples:
+        >>> scheduler = StageScheduler(pool, func)
+        >>> scheduler.add_stage("a", tasks_a, cost=10.0)
+        >>> scheduler.add_stage("b", tasks_b, cost=1.0)
+        >>> for key, results in scheduler.run():
+        ...     print(key, results)
+    """
+
+    def __init__(self, pool, func):
+        self.pool = pool
+        self.func = func
+        self._stages = []
+
+    def add_stage(self, key, tasks, cost=1.0):
+        """Add the tasks of a stage to the schedule.
+
+        Args:
+            key: Hashable ID of the stage, returned by run().
+            tasks (list): Tasks to run func on.
+            cost (float, optional): Estimated cost of a single task of this
+                stage. Only the relative order of the costs matters.
+        """
+        self._stages.append((key, list(tasks), cost))
+
+    def run(self, on_result=None):
+        """Run every task, longest stages first.
+
+        Stages with no tasks are finished straight away.
+
+        Args:
+            on_result (function, optional): Called with the stage key and the
+                result of every task, as soon as it finishes.
+
+        Yields:
+            A (key, results) tuple for each stage, as soon as all of its
+            tasks are done. The results are in the order they finished, not
+            the order of the tasks.
+        """
+        # Longest processing time first: the expensive stages start early,
+        # and the cheap ones fill in the gaps at the end of the run.
+        order = sorted(self._stages, key=lambda s: -s[2])
+        remaining = {}
+        results = {}
+        queue = []
+        for key, tasks, cost in order:
+            if not tasks:
+                yield key, []
+                continue
+            remaining[key] = len(tasks)
+            results[key] = []
+            queue += [(self.func, key, task) for task in tasks]
+        pr.verbose("Scheduled {} tasks across {} stages".format(
+            len(queue), len(order)))
+        for key, result in self.pool.imap_unordered(_call, queue):
+            if on_result is not None:
+                on_result(key, result)
+            results[key].append(result)
+            remaining[key] -= 1
+            if remaining[key] == 0:
+                yield key, results.pop(key)
+        self._stages = []
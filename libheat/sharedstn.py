@@ -0,0 +1,254 @@
+"""STNs in shared memory, for use by worker processes.
+
+A pickled STN is a large graph of Python objects, and every worker process
+that receives one keeps its own copy. SharedSTN instead packs the array form
+of an STN (its edge table and its dense distance matrix) into a single
+multiprocessing.shared_memory block, made once by the parent. Only a small
+handle, holding the block's name and the per-vertex metadata, is sent to the
+workers. They attach read-only numpy views to the block, and build an STN
+object from it when they first simulate on it. Each process keeps at most
+CACHE_SIZE STNs (and objects derived from them, such as initial guides)
+built, the ones it used most recently, so that workers moved between STNs by
+the task queue rarely rebuild one, while their memory does not grow with the
+number of STNs in a run.
+"""
+
+import collections
+import sys
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .stntools import STN, Edge
+from . import counters
+from . import prescreen
+
+
+_EDGE_COLUMNS = (("i", np.int64), ("j", np.int64), ("Cij", np.float64),
+                 ("Cji", np.float64), ("distribution", np.int64),
+                 ("sampled", np.float64))
+"""Name and type of every column of the shared edge table."""
+
+_NO_DISTRIBUTION = -1
+"""Distribution index of requirement edges."""
+
+_attached = {}
+"""Shared memory blocks this process has attached to, by name."""
+
+CACHE_SIZE = 8
+"""Most STNs, and objects derived from them (see SharedSTN.derived()), each
+process keeps at once."""
+
+_cache = collections.OrderedDict()
+"""The STNs built by this process, and what was derived from them, by
+(block name, key). Least recently used first."""
+
+
+class SharedSTN(object):
+    """A handle to an STN stored in shared memory.
+
+    The handle is small, and can be pickled and sent to other processes.
+    Only the process that created it may call unlink().
+
+    Args:
+        stn (STN): The STN to share.
+
+    Attributes:
+        name (str): Name of the shared memory block.
+        layout (dict): Maps each array name to its (offset, shape, dtype)
+            within the block.
+    """
+
+    def __init__(self, stn):
+        self.stn_name = stn.name
+        self.makespan = stn.makespan
+        self.agents = list(stn.agents)
+        self.verts = [(v.nodeID, v.ownerID, v.location, v.executed)
+                      for v in stn.get_all_verts()]
+        self.distributions = sorted({e.distribution
+                                     for e in stn.get_all_edges()
+                                     if e.distribution is not None})
+        codes = {d: n for n, d in enumerate(self.distributions)}
+
+        edges = list(stn.get_all_edges())
+        arrays = {}
+        for column, dtype in _EDGE_COLUMNS:
+            arrays[column] = np.empty(len(edges), dtype=dtype)
+        for n, e in enumerate(edges):
+            arrays["i"][n] = e.i
+            arrays["j"][n] = e.j
+            arrays["Cij"][n] = e.Cij
+            arrays["Cji"][n] = e.Cji
+            arrays["distribution"][n] = codes.get(e.distribution,
+                                                  _NO_DISTRIBUTION)
+            arrays["sampled"][n] = e.sampled_time()
+        arrays["distances"] = prescreen.distance_matrix(stn)[1]
+
+        self.layout = {}
+        size = 0
+        for key, array in arrays.items():
+            self.layout[key] = (size, array.shape, array.dtype.str)
+            size += array.nbytes
+        self._shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.name = self._shm.name
+        _attached[self.name] = self._shm
+        for key, array in arrays.items():
+            self._view(self._shm, key, writeable=True)[...] = array
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_shm"] = None
+        return state
+
+    def _view(self, shm, key, writeable=False):
+        offset, shape, dtype = self.layout[key]
+        view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf,
+                          offset=offset)
+        view.flags.writeable = writeable
+        return view
+
+    def arrays(self) -> dict:
+        """Attach to the shared block, if needed, and return read-only views
+        of its arrays.
+
+        Returns:
+            A dictionary of numpy arrays. "distances" is the dense distance
+            matrix (see prescreen.distance_matrix()); every other entry is a
+            column of the edge table.
+        """
+        shm = _attached.get(self.name)
+        if shm is None:
+            shm = _attach(self.name)
+            _attached[self.name] = shm
+        return {key: self._view(shm, key) for key in self.layout}
+
+    def distances(self) -> tuple:
+        """Returns the (index, matrix) pair of prescreen.distance_matrix(),
+        with matrix a read-only view of shared memory.
+        """
+        index = {v: n for n, v in enumerate(sorted(v[0] for v in self.verts))}
+        return index, self.arrays()["distances"]
+
+    def to_stn(self) -> STN:
+        """Build a new STN object equal to the shared STN."""
+        arrays = self.arrays()
+        stn = STN()
+        for node_id, owner_id, location, executed in self.verts:
+            stn.add_vertex(node_id, owner_id, location)
+            stn.verts[node_id].executed = executed
+        for n in range(len(arrays["i"])):
+            code = int(arrays["distribution"][n])
+            distribution = (None if code == _NO_DISTRIBUTION
+                            else self.distributions[code])
+            edge = Edge(int(arrays["i"][n]), int(arrays["j"][n]),
+                        -float(arrays["Cji"][n]), float(arrays["Cij"][n]),
+                        distribution)
+            edge.set_sampled_time(float(arrays["sampled"][n]))
+            stn.add_created_edge(edge)
+        stn.agents = list(self.agents)
+        stn.makespan = self.makespan
+        stn.name = self.stn_name
+        return stn
+
+    def stn(self) -> STN:
+        """Returns the STN, building it only if this process has not kept it
+        built. See CACHE_SIZE.
+
+        The STN returned must not be changed.
+        """
+        return _cached((self.name, "stn"), self.to_stn)
+
+    def derived(self, key, build):
+        """Returns build(stn) of the STN, calling build only if this process
+        has not kept its result. Results are kept like the STN itself.
+
+        Args:
+            key (str): Name of what build makes, unique per build.
+            build (function): Function of the STN, which must not change
+                it.
+        """
+        return _cached((self.name, key), lambda: build(self.stn()))
+
+    def unlink(self):
+        """Free the shared memory block. Call once, from the creating
+        process, after every worker is done with it.
+        """
+        for key in list(_cache):
+            if key[0] == self.name:
+                del _cache[key]
+        shm = _attached.pop(self.name, None)
+        if shm is not None:
+            shm.close()
+        if self._shm is not None:
+            self._shm.unlink()
+            self._shm = None
+
+
+class LocalSTN(object):
+    """A handle to an STN held in this process, with the same interface as
+    SharedSTN. Used when the workers are on other machines, and so cannot
+    attach to this machine's shared memory. The STN is pickled with the
+    handle.
+
+    Args:
+        stn (STN): The STN to hold.
+    """
+
+    def __init__(self, stn):
+        self._stn = stn
+        self._distances = None
+        self._derived = {}
+
+    def distances(self) -> tuple:
+        """Returns the result of prescreen.distance_matrix() for the STN."""
+        if self._distances is None:
+            self._distances = prescreen.distance_matrix(self._stn)
+        return self._distances
+
+    def to_stn(self) -> STN:
+        """Returns a copy of the STN."""
+        return counters.copy_stn(self._stn)
+
+    def stn(self) -> STN:
+        """Returns the STN, which must not be changed."""
+        return self._stn
+
+    def derived(self, key, build):
+        """Returns build(stn) of the STN, calling build only once. See
+        SharedSTN.derived().
+        """
+        if key not in self._derived:
+            self._derived[key] = build(self._stn)
+        return self._derived[key]
+
+    def unlink(self):
+        """Does nothing; there is no shared memory to free."""
+        pass
+
+
+def _cached(key, make):
+    """Returns the object kept under key, calling make() to make it if it is
+    not kept. Only the CACHE_SIZE objects used last are kept.
+    """
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+    value = make()
+    _cache[key] = value
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return value
+
+
+def _attach(name):
+    """Attach to an existing shared memory block without taking ownership
+    of it.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    # Before Python 3.13, attaching registers the block with the resource
+    # tracker, which would then unlink it when this worker exits.
+    from multiprocessing import resource_tracker
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
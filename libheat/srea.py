@@ -9,7 +9,14 @@ from math import floor, ceil
 import pulp
 
 from .stntools import STN
-from .stntools.distempirical import invcdf_norm, invcdf_uniform
+from .stntools import distempirical
+from .stntools.distempirical import invcdf_uniform
+from . import profiling
+from . import counters
+from . import lpcapture
+
+invcdf_norm = profiling.profiled("invcdf_norm")(distempirical.invcdf_norm)
+"""distempirical.invcdf_norm(), profiled as the "invcdf_norm" span."""
 
 # \file SREA.py
 #
@@ -99,6 +106,7 @@ def setUpLP(stn, decouple):
 #
 # @returns a tuple (alpha, outputstn) if there is a solution, or None if there
 #     is no solution
+@profiling.profiled("srea")
 def srea(inputstn,
          debug=False,
          debugLP=False,
@@ -106,7 +114,8 @@ def srea(inputstn,
          decouple=False,
          lb=0.0,
          ub=0.999):
-    inputstn = inputstn.copy()
+    counters.count("srea_calls")
+    inputstn = counters.copy_stn(inputstn)
     # dictionary of alphas for binary search
     alphas = {i: i / 1000.0 for i in range(1001)}
 
@@ -119,22 +128,26 @@ def srea(inputstn,
     # set up LP
     if not decouple:
         # TODO: Change to faster algorithm?
-        inputstn.floyd_warshall()
-    bounds, deltas, probBase = setUpLP(inputstn, decouple)
+        with counters.timed("floyd_warshall"):
+            inputstn.floyd_warshall()
+    with counters.timed("lp_builds"):
+        bounds, deltas, probBase = setUpLP(inputstn, decouple)
 
     # First run binary search on alpha
     while upper - lower > 1:
         alpha = alphas[(upper + lower) // 2]
+        counters.count("alpha_probes")
         if debug:
             print('trying alpha = {}'.format(alpha))
 
         # run the LP
         probContainer = (bounds, deltas, probBase.copy())
-        LPbounds = srea_LP(inputstn.copy(),
-                           alpha,
-                           decouple,
-                           debug=debugLP,
-                           probContainer=probContainer)
+        with profiling.span("alpha_probe", {"alpha": alpha}):
+            LPbounds = srea_LP(counters.copy_stn(inputstn),
+                               alpha,
+                               decouple,
+                               debug=debugLP,
+                               probContainer=probContainer)
 
         # LP was feasible, try lower alpha
         if LPbounds is not None:
@@ -204,7 +217,8 @@ def srea_LP(inputstn,
     if probContainer is None:
         if debug:
             print('No saved LP variables, generating all LP variables from current STN')
-        bounds, deltas, prob = setUpLP(inputstn, decouple)
+        with counters.timed("lp_builds"):
+            bounds, deltas, prob = setUpLP(inputstn, decouple)
     else:
         bounds, deltas, prob = probContainer
 
@@ -255,7 +269,8 @@ def srea_LP(inputstn,
     # stack overflow suggested I put in this fix so I did.
     # https://stackoverflow.com/questions/27406858/pulp-solver-error
     # try:
-    prob.solve()
+    with counters.timed("lp_solves"):
+        lpcapture.solve(prob, "srea", alpha=alpha)
     # except Exception:
     # return None
 
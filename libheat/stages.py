@@ -0,0 +1,957 @@
+"""Running the stages of a simulation run on a worker pool.
+
+A stage is one STN simulated with one or more variants (a strategy and its
+options) against the same contingent samples. Each sample of a stage is an
+independent task: stn_pool() shares the STNs with the workers once, the
+tasks only carry an STN's key and the sample's seed, and each worker draws
+the sample and simulates every variant on it. schedule_stages() runs the
+tasks of every stage of a fixed-count run from one global queue (see
+libheat.scheduler), while sequential_stages() runs sequentially stopped
+stages one after another. Both build the results dictionaries of each stage
+as soon as it finishes.
+
+Examples:
+    >>> with stn_pool({0: stn}, threads=4) as pool:
+    ...     results, responses = run_stage(("rover.json", stn),
+    ...                                    [("drea", options)], 100, 4, 42,
+    ...                                    pool=pool, stn_id=0)
+"""
+
+import contextlib
+import os
+import time
+
+import numpy as np
+
+from . import confidence
+from . import coordinator
+from . import counters
+from . import hotspots
+from . import memory
+from . import prescreen as prescreening
+from . import printers as pr
+from . import profiling
+from . import scheduler
+from . import sharedstn
+from . import srea
+from . import timeline as libtimeline
+from . import trace as libtrace
+from . import workerpool
+from .dmontsim import DecoupledSimulator
+from .montsim import Simulator, draw_samples, NO_FAILURE
+from .sweepsim import SweepSimulator
+
+
+MAX_SEED = 2 ** 31 - 1
+"""The maximum number a random seed can be."""
+
+DEFAULT_DECOUPLE = "srea"
+"""The default decoupling type for DecoupledSimulator"""
+
+DEFAULT_CHUNK_SIZE = 20
+"""The default number of samples per chunk when sequentially stopping"""
+
+TRACE_KEY = "trace"
+"""Key of the tracing settings shared with the worker pool"""
+
+TIMELINE_KEY = "timeline"
+"""Key of the timeline settings shared with the worker pool"""
+
+PROFILE_KEY = "profile"
+"""Key of the profiling switch shared with the worker pool"""
+
+HOTSPOTS_KEY = "hotspots"
+"""Key of the number of tasks of each strategy that each worker runs under
+cProfile"""
+
+MEMORY_KEY = "memory"
+"""Key of the memory tracking mode shared with the worker pool"""
+
+
+@contextlib.contextmanager
+def stn_pool(stns, threads, serve=None, authkey=None, trace=None,
+             timeline=None, profile_tasks=0, memory_mode=None):
+    """Start a worker pool sharing several STNs.
+
+    The STNs are put in shared memory, and the workers only receive
+    SharedSTN handles to them. The shared memory is freed once the pool is
+    closed. If serving tasks to remote workers, the STNs are sent to each
+    worker instead. Workers solve the initial guide of an STN themselves,
+    once, when they first need it (see _simulate_sample()).
+
+    Args:
+        stns (dict): The STNs to share, keyed by the ID tasks will use.
+        threads (int): Number of worker processes to use.
+        serve (str, optional): Address to serve the tasks on (see
+            coordinator.parse_address()), instead of running them on local
+            worker processes.
+        authkey (bytes, optional): Key remote workers must present. See
+            coordinator.CoordinatorPool.
+        trace (dict, optional): Tracing settings of the workers: the "dir"
+            to write traces to, whether to trace "all" simulations or only
+            failed ones, "mitparse", and the "sources" (absolute path,
+            instance) of every STN ID. Default is no tracing.
+        timeline (dict, optional): Timeline settings of the workers: the
+            "dir" to write timelines to, the indices of the "samples" to
+            write timelines of, and the "sources" of every STN ID. Default
+            is no timelines.
+        profile_tasks (int, optional): Number of tasks of each strategy
+            that each worker runs under cProfile.
+        memory_mode (str, optional): Memory tracking mode of the workers
+            (see libheat.memory). Default is no tracking.
+    """
+    share = sharedstn.SharedSTN if serve is None else sharedstn.LocalSTN
+    shared = {}
+    try:
+        for stn_id, stn in stns.items():
+            shared[stn_id] = share(stn)
+        pool_shared = dict(shared)
+        pool_shared[TRACE_KEY] = trace
+        pool_shared[TIMELINE_KEY] = timeline
+        pool_shared[HOTSPOTS_KEY] = profile_tasks
+        pool_shared[PROFILE_KEY] = profiling.is_enabled()
+        pool_shared[MEMORY_KEY] = memory_mode
+        if serve is None:
+            pool = workerpool.WorkerPool(pool_shared, threads)
+        else:
+            pool = coordinator.CoordinatorPool(pool_shared, serve,
+                                               authkey=authkey)
+        with pool:
+            yield pool
+    finally:
+        for stn_handle in shared.values():
+            stn_handle.unlink()
+
+
+def schedule_stages(stn_pairs, work, stages, sim_count, threads,
+                    random_seed, sampling, pool, progress=None):
+    """Run every stage of a fixed-count run from one global task queue.
+
+    The sample tasks of every (STN, stage) pair are flattened into a single
+    queue, so that no worker waits for the slowest sample of a stage before
+    it can start on the next. The most expensive stages are queued first.
+
+    Args:
+        stn_pairs (list): List of (path, STN) tuples.
+        work (list): The (pair index, stage index, checkpoint) tuple of every
+            stage to run. Each STN must have been shared with the pool under
+            its pair index. The checkpoint may be None.
+        stages (list): List of the variant lists to run on each STN.
+        pool (WorkerPool): The pool to run the tasks on.
+        progress (ProgressReporter, optional): Reporter to tell of every
+            stage and finished sample.
+
+    Yields:
+        A tuple of the checkpoint, the list of results dictionaries and the
+        list of response dictionaries (see run_stage()), for each stage, as
+        soon as the stage finishes. The "runtime" of a stage is the time
+        from the start of its first task until its last result came in (0
+        when all its samples were journaled), and its "elapsed" time is the
+        time from the start of the whole queue until then.
+    """
+    start_time = time.time()
+    print("Random seed is: {}".format(random_seed))
+    queue = scheduler.StageScheduler(pool, _multisim_thread_helper)
+    pending = {}
+    checkpoints = {}
+    on_sample = {}
+    for i, s, checkpoint in work:
+        stn = stn_pairs[i][1]
+        tasks, response = _make_tasks(stn, stages[s], sim_count,
+                                      random_seed=random_seed,
+                                      prescreen=sampling["prescreen"],
+                                      stn_id=i, checkpoint=checkpoint,
+                                      shard=sampling.get("shard"))
+        pending[(i, s)] = response
+        checkpoints[(i, s)] = checkpoint
+        queue.add_stage((i, s), tasks, cost=_estimate_cost(stn, stages[s]))
+        if progress is not None:
+            on_sample[(i, s)] = progress.add_stage(
+                (i, s), len(tasks), _stage_label(stn_pairs[i]),
+                [v[0] for v in stages[s]])
+
+    def record(key, result):
+        if checkpoints[key] is not None:
+            checkpoints[key].record(result[0], result[1])
+        if progress is not None:
+            on_sample[key](result[1])
+
+    for (i, s), results in queue.run(on_result=record):
+        if progress is not None:
+            progress.stage_done((i, s))
+        response = pending.pop((i, s))
+        finished = time.time()
+        report = stage_report(sampling.get("memory"))
+        started = finished
+        for index, answers, task_report in results:
+            response[index] = answers
+            merge_task_report(task_report, report)
+            started = min(started, task_report.get("started", finished))
+        if None in response:
+            # Samples left to other shards; there is nothing to report.
+            yield checkpoints[(i, s)], [], []
+            continue
+        responses = _collect_responses(response, stages[s])
+        results = _stage_results(stn_pairs[i], stages[s], responses,
+                                 sim_count, threads, random_seed,
+                                 sampling["ci_confidence"],
+                                 finished - started, report=report,
+                                 elapsed=finished - start_time)
+        yield checkpoints[(i, s)], results, responses
+
+
+def sequential_stages(stn_pairs, work, stages, sim_count, threads,
+                      random_seed, sampling, pool, progress=None):
+    """Run the stages of a sequentially stopped run one at a time, since the
+    number of samples each needs is only known as it goes. See
+    schedule_stages().
+    """
+    start_time = time.time()
+    for i, s, checkpoint in work:
+        on_sample = None
+        if progress is not None:
+            on_sample = progress.add_stage((i, s), sim_count,
+                                           _stage_label(stn_pairs[i]),
+                                           [v[0] for v in stages[s]])
+        results, responses = run_stage(stn_pairs[i], stages[s], sim_count,
+                                       threads, random_seed, sampling,
+                                       pool=pool, stn_id=i,
+                                       checkpoint=checkpoint,
+                                       progress=on_sample)
+        for results_dict in results:
+            results_dict["elapsed"] = time.time() - start_time
+        if progress is not None:
+            progress.stage_done((i, s))
+        yield checkpoint, results, responses
+
+
+def run_stage(pair, variants, sim_count, threads, random_seed,
+              sampling=None, pool=None, stn_id=None, checkpoint=None,
+              progress=None):
+    """Run a single stage of the multiple simulation set up.
+
+    Every variant of the stage runs against the same contingent samples. If
+    sampling["ci_tolerance"] is set, samples are run in chunks of
+    sampling["chunk_size"] until the robustness interval of every variant is
+    narrow enough, or sim_count samples have been run. If a pool is given,
+    the STN must have been shared with it under stn_id. Samples held by the
+    checkpoint are not simulated again, and new ones are recorded in it.
+    If given, progress is called with the answers of every sample.
+
+    Returns:
+        A tuple of the list of results dictionaries, one per variant, and
+        the list of response dictionaries they were built from.
+    """
+
+    path, stn = pair
+    if sampling is None:
+        sampling = {"ci_tolerance": None,
+                    "chunk_size": DEFAULT_CHUNK_SIZE,
+                    "ci_confidence": confidence.DEFAULT_CONFIDENCE}
+    ci_confidence = sampling["ci_confidence"]
+    prescreen = sampling.get("prescreen")
+
+    report = stage_report(sampling.get("memory"))
+    start_time = time.time()
+    if sampling["ci_tolerance"] is None:
+        responses = multiple_variant_simulations(stn, variants, sim_count,
+                                                 threads=threads,
+                                                 random_seed=random_seed,
+                                                 prescreen=prescreen,
+                                                 pool=pool, stn_id=stn_id,
+                                                 checkpoint=checkpoint,
+                                                 report=report,
+                                                 progress=progress)
+    else:
+        responses = sequential_variant_simulations(
+            stn, variants, sim_count, sampling["ci_tolerance"],
+            chunk_size=sampling["chunk_size"],
+            threads=threads,
+            random_seed=random_seed,
+            ci_confidence=ci_confidence,
+            prescreen=prescreen,
+            pool=pool, stn_id=stn_id,
+            checkpoint=checkpoint,
+            report=report,
+            progress=progress)
+    runtime = time.time() - start_time
+    results = _stage_results(pair, variants, responses, sim_count, threads,
+                             random_seed, ci_confidence, runtime,
+                             report=report)
+    return results, responses
+
+
+def multiple_variant_simulations(starting_stn, variants, count, threads=1,
+                                 random_seed=None, first_sample=0,
+                                 prescreen=None, pool=None, stn_id=None,
+                                 checkpoint=None, report=None,
+                                 progress=None):
+    """Run multiple simulations of several strategies on a single STN.
+
+    Each sample draws its contingent durations once, and every variant is
+    simulated against those same draws within a single task (common random
+    numbers). The initial SREA guide is solved once per worker, and shared
+    by all samples and variants. Differences in robustness between variants are
+    therefore paired, and have lower variance than separate runs.
+
+    Args:
+        starting_stn (STN): STN to simulate on.
+        variants (list): List of (execution_strat, sim_options) tuples.
+        count (int): Number of simulations to run.
+        threads (int, optional): Number of threads to use. Ignored if a pool
+            is given.
+        random_seed (int, optional): The random seed to use. Generates new
+            seeds from this instance. None indicates a random random-seed.
+        first_sample (int, optional): Index of the first sample to run.
+        prescreen (str, optional): If "sample", each task first checks that
+            the STN with its sampled durations is consistent, and marks the
+            sample as a failure without simulating it if not. If "batch",
+            all samples are checked together before any task runs. Default
+            is None, which simulates every sample.
+        pool (WorkerPool, optional): Worker pool to run the tasks on. By
+            default, a pool is made for this call only.
+        stn_id (optional): Key that starting_stn was shared with the pool
+            under (see stn_pool()).
+        checkpoint (Checkpoint, optional): Journal checkpoint of the stage.
+            Samples it holds are not simulated again, and the answers of
+            every new sample are recorded in it.
+        report (dict, optional): Report of the stage, from stage_report().
+            The profiling totals and memory use of every task are added to
+            it. Profiling totals and cProfile statistics are added to this
+            process' totals either way.
+        progress (function, optional): Called with the answers of every
+            sample as soon as it finishes, e.g. from
+            ProgressReporter.add_stage() (see libheat.progress).
+
+    Returns:
+        A list of response dictionaries, one per variant, in the same order
+        as variants.
+
+    The response dictionary contains the following keys:
+
+    * "sample_results": A list of bools of how the simulations went.
+    * "reschedules": A list of ints counting how many reschedules a sim took.
+    * "sent_schedules": A list of ints counting how many schedules were sent
+      for each sim.
+    * "sim_times": A list of floats of how many seconds each sim took.
+    * "skipped_propagations": A list of ints counting how many full
+      propagations each sim skipped with lazy propagation.
+    * "prescreened": A list of bools of which samples were marked as failures
+      by pre-screening, without being simulated.
+    * "seeds": A list of the random seed each sample was drawn from.
+    * "failure_steps": A list of the dispatch step at which each sim failed,
+      or montsim.NO_FAILURE.
+    * "failure_vertices": A list of the timepoint each sim failed to place,
+      or montsim.NO_FAILURE.
+    * "counters": A list of the operation counts of each sim, of the form
+      {"<hook>/<counter>": (count, seconds)} (see libheat.counters).
+    """
+    if pool is None:
+        with stn_pool({0: starting_stn}, threads) as pool:
+            return multiple_variant_simulations(starting_stn, variants, count,
+                                                random_seed=random_seed,
+                                                first_sample=first_sample,
+                                                prescreen=prescreen,
+                                                pool=pool, stn_id=0,
+                                                checkpoint=checkpoint,
+                                                report=report,
+                                                progress=progress)
+
+    print("Random seed is: {}".format(random_seed))
+    tasks, response = _make_tasks(starting_stn, variants, count,
+                                  random_seed=random_seed,
+                                  first_sample=first_sample,
+                                  prescreen=prescreen, stn_id=stn_id,
+                                  checkpoint=checkpoint)
+    for i, answers, task_report in pool.imap_unordered(
+            _multisim_thread_helper, tasks):
+        response[i - first_sample] = answers
+        if checkpoint is not None:
+            checkpoint.record(i, answers)
+        merge_task_report(task_report, report)
+        if progress is not None:
+            progress(answers)
+    return _collect_responses(response, variants)
+
+
+def sequential_variant_simulations(starting_stn, variants, cap, tolerance,
+                                   chunk_size=DEFAULT_CHUNK_SIZE, threads=1,
+                                   random_seed=None,
+                                   ci_confidence=confidence.DEFAULT_CONFIDENCE,
+                                   prescreen=None, pool=None, stn_id=None,
+                                   checkpoint=None, report=None,
+                                   progress=None):
+    """Run several variants in chunks until every robustness estimate is
+    tight.
+
+    Sampling stops when the Wilson interval half-width of the robustness of
+    every variant is at most tolerance, or when cap samples have been run.
+    Sample i always uses the same seed as sample i of a fixed-count run with
+    the same random_seed. See multiple_variant_simulations() for the other
+    arguments.
+
+    Args:
+        cap (int): Maximum number of simulations to run.
+        tolerance (float): Target half-width of the robustness intervals.
+        chunk_size (int, optional): Number of simulations per chunk.
+        ci_confidence (float, optional): Confidence level of the intervals.
+
+    Returns:
+        A list of response dictionaries, one per variant.
+
+    Raises:
+        ValueError: If chunk_size is less than 1.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1, not {}"
+                         .format(chunk_size))
+    if pool is None:
+        with stn_pool({0: starting_stn}, threads) as pool:
+            return sequential_variant_simulations(
+                starting_stn, variants, cap, tolerance, chunk_size=chunk_size,
+                random_seed=random_seed, ci_confidence=ci_confidence,
+                prescreen=prescreen, pool=pool, stn_id=0,
+                checkpoint=checkpoint, report=report, progress=progress)
+
+    responses = [_empty_response() for v in variants]
+    done = 0
+    while not all(confidence.should_stop(r["sample_results"].count(True),
+                                         done, tolerance, cap,
+                                         confidence=ci_confidence)
+                  for r in responses):
+        count = min(chunk_size, cap - done)
+        chunks = multiple_variant_simulations(starting_stn, variants, count,
+                                              random_seed=random_seed,
+                                              first_sample=done,
+                                              prescreen=prescreen,
+                                              pool=pool, stn_id=stn_id,
+                                              checkpoint=checkpoint,
+                                              report=report,
+                                              progress=progress)
+        for response_dict, chunk in zip(responses, chunks):
+            for k in response_dict:
+                response_dict[k] += chunk[k]
+        done += count
+        pr.verbose("Ran {} samples, widest CI half-width: {}".format(
+            done, max(confidence.half_width(r["sample_results"].count(True),
+                                            done, confidence=ci_confidence)
+                      for r in responses)))
+    return responses
+
+
+def stage_report(memory_mode=None) -> dict:
+    """Start the report of a stage: the profiling totals of its tasks, and
+    their memory use, which is None if memory_mode is None.
+    """
+    return {"profile": {},
+            "memory": None if memory_mode is None else {}}
+
+
+def merge_task_report(task_report, report=None):
+    """Add the report of a task (see _multisim_thread_helper()) to that of
+    its stage, if given, and to this process' totals.
+    """
+    if report is not None:
+        profiling.merge(task_report.get("profile"), into=report["profile"])
+        memory.merge(task_report.get("memory"), into=report["memory"])
+    profiling.merge(task_report.get("profile"))
+    hotspots.merge(task_report.get("hotspots"))
+
+
+def _make_tasks(starting_stn, variants, count, random_seed=None,
+                first_sample=0, prescreen=None, stn_id=None,
+                checkpoint=None, shard=None) -> tuple:
+    """Build the sample tasks of multiple_variant_simulations().
+
+    Each task is identified by the index of its sample within the stage,
+    first_sample included.
+
+    Returns:
+        A tuple of (tasks, response). response has one entry per sample,
+        which is None until the answers of its task are filled in. Samples
+        screened out in a batch, or already held by the checkpoint, hold
+        their answers already, and have no task. Samples of other shards
+        have no task, and stay None.
+    """
+    if random_seed is not None:
+        seed_gen = np.random.RandomState(random_seed)
+        seeds = [seed_gen.randint(MAX_SEED)
+                 for i in range(first_sample + count)][first_sample:]
+    else:
+        # Without a base seed, the samples still need fixed seeds so that
+        # they can be redrawn in the workers after batch pre-screening.
+        seeds = list(np.random.randint(MAX_SEED, size=count))
+
+    response = [None] * count
+    if checkpoint is not None:
+        for i in range(count):
+            response[i] = checkpoint.samples.get(first_sample + i)
+    todo = [i for i in range(count) if response[i] is None]
+    if shard is not None:
+        k, n = shard
+        todo = [i for i in todo if (first_sample + i) % n == k]
+
+    if prescreen == "batch":
+        samples = [draw_samples(starting_stn, np.random.RandomState(seeds[i]))
+                   for i in todo]
+        passed = prescreening.batch_consistent(starting_stn, samples)
+        for i, ok in zip(todo, passed):
+            if not ok:
+                response[i] = _screened_answers(variants, seeds[i])
+                if checkpoint is not None:
+                    checkpoint.record(first_sample + i, response[i])
+        pr.verbose("Pre-screened {} of {} samples".format(
+            len(todo) - int(passed.sum()), len(todo)))
+        todo = [i for i in todo if response[i] is None]
+
+    # Tasks only carry the STN's key; the workers redraw each sample from its
+    # seed rather than receiving it.
+    tasks = [(stn_id, variants, seeds[i], first_sample + i,
+              prescreen == "sample") for i in todo]
+    return tasks, response
+
+
+def _collect_responses(response, variants) -> list:
+    """Unzip the answers of every sample into one response dictionary per
+    variant.
+    """
+    responses = []
+    for v in range(len(variants)):
+        response_dict = _empty_response()
+        for r in response:
+            ans, reschedule_count, sent_count, sim_time, skipped, \
+                was_screened, seed, failure_step, failure_vertex, \
+                counts = r[v]
+            response_dict["sample_results"].append(ans)
+            response_dict["reschedules"].append(reschedule_count)
+            response_dict["sent_schedules"].append(sent_count)
+            response_dict["sim_times"].append(sim_time)
+            response_dict["skipped_propagations"].append(skipped)
+            response_dict["prescreened"].append(was_screened)
+            response_dict["seeds"].append(seed)
+            response_dict["failure_steps"].append(failure_step)
+            response_dict["failure_vertices"].append(failure_vertex)
+            response_dict["counters"].append(counts)
+        responses.append(response_dict)
+    return responses
+
+
+def _screened_answers(variants, seed) -> list:
+    """Returns the answers of a task whose sample failed pre-screening."""
+    return [(False, 0, 0, 0.0, 0, True, seed, NO_FAILURE, NO_FAILURE, {})
+            for v in variants]
+
+
+def _empty_response() -> dict:
+    """Returns a response dictionary with no samples in it."""
+    return {"sample_results": [], "reschedules": [], "sent_schedules": [],
+            "sim_times": [], "skipped_propagations": [], "prescreened": [],
+            "seeds": [], "failure_steps": [], "failure_vertices": [],
+            "counters": []}
+
+
+def _stage_results(pair, variants, responses, sim_count, threads,
+                   random_seed, ci_confidence, runtime, report=None,
+                   elapsed=None) -> list:
+    """Build the results dictionaries of a finished stage.
+
+    runtime is the time the stage took, and elapsed the time from the start
+    of the run until the stage finished (runtime, by default).
+
+    If profiling is on, the profile of the stage, the profiling totals of
+    all of its tasks, is added to every row (see profiling.columns()). So is
+    the memory use of the stage, if it was tracked (see memory.columns()).
+
+    Returns:
+        A list of results dictionaries, one per variant.
+    """
+    path, stn = pair
+    vert_count = len(stn.verts)
+    max_verts_on_agent = max_agent_verts(stn)
+    mean_verts_on_agent = (len(stn.verts) - 1)/len(stn.agents)
+    cont_dens = len(stn.contingent_edges)/len(stn.edges)
+    synchrony = len(stn.interagent_edges)/len(stn.edges)
+
+    total_sd = 0
+    for e in stn.contingent_edges.values():
+        try:
+            total_sd += e.sigma
+        except ValueError:
+            continue
+    sd_avg = total_sd / len(stn.contingent_edges)
+
+    baseline = responses[0]["sample_results"]
+    timestamp = time.time()
+    results_list = []
+    for (execution, sim_options), response_dict in zip(variants, responses):
+        results = response_dict["sample_results"]
+        reschedules = response_dict["reschedules"]
+        sent_schedules = response_dict["sent_schedules"]
+
+        robustness = results.count(True)/len(results)
+        ci_low, ci_high = confidence.wilson_interval(results.count(True),
+                                                     len(results),
+                                                     confidence=ci_confidence)
+        delta, delta_se = confidence.paired_difference(results, baseline)
+
+        results_dict = {}
+        results_dict["execution"] = execution
+        results_dict["robustness"] = robustness
+        results_dict["threads"] = threads
+        results_dict["random_seed"] = random_seed
+        results_dict["runtime"] = runtime
+        results_dict["elapsed"] = runtime if elapsed is None else elapsed
+        results_dict["samples"] = len(results)
+        results_dict["timestamp"] = timestamp
+        results_dict["stn_path"] = path
+        results_dict["stn_name"] = stn.name
+        results_dict["ar_threshold"] = sim_options["ar_threshold"]
+        results_dict["si_threshold"] = sim_options["si_threshold"]
+        results_dict["synchronous_density"] = synchrony
+        results_dict["sd_avg"] = sd_avg
+        results_dict["vert_count"] = vert_count
+        results_dict["agents"] = len(stn.agents)
+        results_dict["mean_verts_agent"] = mean_verts_on_agent
+        results_dict["max_verts_agent"] = max_verts_on_agent
+        results_dict["contingent_density"] = cont_dens
+        # Pre-screened samples were never simulated, so they are left out of
+        # the per-simulation averages.
+        simulated = [i for i, screened
+                     in enumerate(response_dict["prescreened"])
+                     if not screened]
+        results_dict["reschedule_freq"] = _mean(reschedules, simulated)
+        results_dict["send_freq"] = _mean(sent_schedules, simulated)
+        results_dict["lazy_propagation"] = bool(
+            sim_options.get("lazy_propagation", False))
+        results_dict["fast_forward"] = bool(
+            sim_options.get("fast_forward", False))
+        results_dict["skipped_propagation_freq"] = (
+            _mean(response_dict["skipped_propagations"], simulated))
+        results_dict["prescreened_fraction"] = (
+            response_dict["prescreened"].count(True) / len(results))
+        results_dict["sample_cap"] = sim_count
+        results_dict["ci_confidence"] = ci_confidence
+        results_dict["robustness_ci_low"] = ci_low
+        results_dict["robustness_ci_high"] = ci_high
+        results_dict["ci_half_width"] = (ci_high - ci_low) / 2.0
+        results_dict["sim_time"] = sum(response_dict["sim_times"])
+        results_dict["paired_baseline"] = variants[0][0]
+        results_dict["paired_delta"] = delta
+        results_dict["paired_delta_se"] = delta_se
+        results_dict.update(counters.columns(
+            [response_dict["counters"][i] for i in simulated]))
+        if report is None:
+            report = stage_report()
+        if profiling.is_enabled():
+            results_dict.update(profiling.columns(report["profile"]))
+        if report["memory"] is not None:
+            results_dict.update(memory.columns(report["memory"]))
+        results_list.append(results_dict)
+
+    return results_list
+
+
+def _mean(values, indices) -> float:
+    """Returns the mean of values at the given indices, or 0 if there are
+    none.
+    """
+    if not indices:
+        return 0.0
+    return sum(values[i] for i in indices) / len(indices)
+
+
+def _estimate_cost(stn, variants) -> float:
+    """Roughly estimate the time one sample of a stage takes.
+
+    Each dispatch step propagates over the whole STN, and the strategies
+    which solve SREA may do so again after every contingent event. Only the
+    order of the estimates matters.
+    """
+    steps = len(stn.verts) ** 3
+    cost = 0.0
+    for execution_strat, sim_options in variants:
+        if execution_strat == "early":
+            cost += steps
+        else:
+            cost += steps * (1 + len(stn.contingent_edges))
+    return cost
+
+
+def _stage_label(pair) -> str:
+    """Name the stages of an STN in progress reports."""
+    path, stn = pair
+    name = os.path.basename(path)
+    if stn.name != name:
+        name += ":" + str(stn.name)
+    return name
+
+
+def max_agent_verts(stn):
+    """Returns the maximum amount of vertices belonging to any one agent"""
+    return max([get_agent_verts(stn, a) for a in stn.agents])
+
+
+def mean_agent_verts(stn):
+    counts = [get_agent_verts(stn, a) for a in stn.agents]
+    return sum(counts)/len(counts)
+
+
+def get_agent_verts(stn, agent):
+    """Returns the number of vertices owned by the provided agent in the given
+        STN.
+
+    Args:
+        stn (STN): STN to use.
+        agent (int): Agent ID to get verts of.
+
+    Returns:
+        The number of vertices owned by the provided agent.
+    """
+    count = 0
+    for vert in stn.verts.values():
+        if vert.ownerID == agent:
+            count += 1
+    return count
+
+
+def initial_guide(stn, variants):
+    """Solve SREA once for the starting STN, if any variant needs it.
+
+    The first guide of every SREA-based strategy only depends on the STN,
+    never on the sampled durations, so it can be shared across samples.
+    """
+    if not _needs_initial_guide(variants):
+        return None
+    return srea.srea(stn)
+
+
+def _shared_initial_guide(stn_handle, variants):
+    """Returns the initial guide (see initial_guide()) of a shared STN,
+    solving it only the first time this process needs it. The solve is
+    profiled and counted in no sample, as it is shared by all of them.
+    """
+    if not _needs_initial_guide(variants):
+        return None
+    kept = profiling.collect()
+    try:
+        return stn_handle.derived("initial_guide", srea.srea)
+    finally:
+        profiling.collect()
+        profiling.merge(kept)
+
+
+def _needs_initial_guide(variants) -> bool:
+    """Whether any of the variants starts from the SREA guide."""
+    return not all(v[0] in ("early", "da") for v in variants)
+
+
+def _multisim_thread_helper(tup):
+    """ Helper function to allow passing multiple arguments to the simulator.
+
+    Looks up the STN shared with this worker, draws the sample's contingent
+    durations once, then simulates every variant against them.
+
+    Returns:
+        A tuple of the sample's index within the stage, its answers, and the
+        report of the task. The report is a dictionary with the time.time()
+        the task "started" at, which may also hold the "profile" (profiling
+        totals) of the task if profiling is on, its
+        "hotspots" (cProfile statistics, see libheat.hotspots) if it was run
+        under cProfile, and its "memory" use (see libheat.memory) if memory
+        is tracked.
+    """
+    started = time.time()
+    stn_id, variants, seed, index, screen = tup
+    stn_handle = workerpool.get_shared(stn_id)
+    tracing = workerpool.get_shared(TRACE_KEY)
+    timeline = workerpool.get_shared(TIMELINE_KEY)
+    if timeline is not None and index not in timeline["samples"]:
+        timeline = None
+    profiling.enable(workerpool.get_shared(PROFILE_KEY))
+    # A single thread pool runs tasks in the parent, whose own totals must
+    # not be handed back as the task's.
+    outside = profiling.collect()
+    stats = None
+    profile_tasks = workerpool.get_shared(HOTSPOTS_KEY)
+    if profile_tasks and hotspots.should_profile(
+            profile_tasks, key=tuple(v[0] for v in variants)):
+        stats = []
+    memory_mode = workerpool.get_shared(MEMORY_KEY)
+    task_memory = None
+    if memory_mode is not None:
+        task_memory = memory.TaskMemory(memory_mode)
+    answers = _simulate_sample(stn_handle, tracing, timeline, stn_id,
+                               variants, seed, index, screen, stats=stats,
+                               task_memory=task_memory)
+    report = {"started": started}
+    if profiling.is_enabled():
+        report["profile"] = profiling.collect()
+    profiling.merge(outside)
+    if stats is not None:
+        report["hotspots"] = stats
+    if task_memory is not None:
+        # Screened samples have no counts, and take no dispatch steps.
+        steps = sum(counters.totals(a[-1])["dispatch_steps"][0]
+                    for a in answers)
+        report["memory"] = task_memory.finish(steps)
+    return index, answers, report
+
+
+def _simulate_sample(stn_handle, tracing, timeline, stn_id, variants, seed,
+                     index, screen, stats=None, task_memory=None) -> list:
+    """Simulate every variant on one sample. See _multisim_thread_helper().
+    If timeline is given, the timeline of every variant is written. If stats
+    is given, every variant is run under cProfile, and a (strategy, raw
+    statistics) tuple is appended to it for each run. If task_memory is
+    given, its allocation sites are sampled at the end of every simulation.
+
+    Returns:
+        The answers of every variant on the sample.
+    """
+    stn = stn_handle.stn()
+    samples = draw_samples(stn, np.random.RandomState(seed))
+    if screen and not prescreening.is_consistent(
+            stn, samples, distances=stn_handle.distances()):
+        pr.verbose("Sample: {} failed pre-screening".format(index))
+        return _screened_answers(variants, seed)
+    # Every simulation copies the guide before changing it, so it is kept
+    # between tasks like the STN.
+    initial_guide = _shared_initial_guide(stn_handle, variants)
+    answers = [None] * len(variants)
+
+    # ARSI variants only differ in their thresholds, so they can share one
+    # prefix-sharing sweep instead of running from scratch each time. Traced
+    # variants are run one at a time, so that each has its own trace (and
+    # timeline).
+    sweep = [i for i, (strat, opts) in enumerate(variants)
+             if strat == "arsi" and "ar_threshold" in opts
+             and "si_threshold" in opts]
+    if len(sweep) > 1 and tracing is None and timeline is None:
+        settings = [(variants[i][1]["ar_threshold"],
+                     variants[i][1]["si_threshold"]) for i in sweep]
+        counters.collect()
+        start_time = time.time()
+        simulator = SweepSimulator(seed)
+        swept = _profiled(stats, "arsi", simulator.simulate_sweep, stn,
+                          settings, sim_options=variants[sweep[0]][1],
+                          samples=samples, initial_guide=initial_guide)
+        # The sweep time cannot be split per setting; share it evenly.
+        sim_time = (time.time() - start_time) / len(sweep)
+        counts = counters.scale(counters.collect(), 1.0 / len(sweep))
+        if task_memory is not None:
+            task_memory.sample_sites()
+        pr.verbose("Sample: {}".format(index))
+        pr.verbose("Swept {} ARSI settings with {} forks".format(
+            len(sweep), simulator.num_forks))
+        for k, (i, (ans, reschedules, sent)) in enumerate(zip(sweep, swept)):
+            answers[i] = (ans, reschedules, sent, sim_time,
+                          simulator.skipped_propagations[k], False, seed,
+                          *simulator.failures[k], counts)
+
+    for v, (execution_strat, sim_options) in enumerate(variants):
+        if answers[v] is not None:
+            continue
+        counters.collect()
+        if timeline is not None:
+            profiling.record_events()
+        start_time = time.time()
+        simulator, ans = _profiled(stats, execution_strat, simulate_one, stn,
+                                   execution_strat, sim_options, seed,
+                                   samples, initial_guide,
+                                   tracing=tracing is not None)
+        sim_time = time.time() - start_time
+        counts = counters.collect()
+        if task_memory is not None:
+            task_memory.sample_sites()
+        if timeline is not None:
+            _write_timeline(timeline, stn_id, v, execution_strat,
+                            sim_options, seed, index, simulator, ans)
+        if tracing is not None and (tracing["all"] or not ans):
+            _write_trace(tracing, stn_id, execution_strat, sim_options, seed,
+                         samples, initial_guide is not None, simulator, ans)
+        pr.verbose("Sample: {}".format(index))
+        pr.verbose("Execution: {}".format(execution_strat))
+        pr.verbose("Assigned Times: {}".format(
+            simulator.get_assigned_times()))
+        pr.verbose("Successful?: {}".format(ans))
+        answers[v] = (ans, simulator.num_reschedules,
+                      simulator.num_sent_schedules, sim_time,
+                      simulator.num_skipped_propagations, False, seed,
+                      simulator.failure_step, simulator.failure_vertex,
+                      counts)
+    return answers
+
+
+def _profiled(stats, key, func, *args, **kwargs):
+    """Call func, under cProfile if stats is not None. The raw statistics
+    are appended to stats under key.
+    """
+    if stats is None:
+        return func(*args, **kwargs)
+    result, raw = hotspots.run(func, *args, **kwargs)
+    stats.append((key, raw))
+    return result
+
+
+def simulate_one(stn, execution_strat, sim_options, seed, samples,
+                 initial_guide, tracing=False) -> tuple:
+    """Simulate one strategy on one sample.
+
+    Returns:
+        A tuple of the simulator, and whether the simulation succeeded.
+    """
+    if execution_strat == "da":
+        simulator = DecoupledSimulator(seed)
+        simulator.tracing = tracing
+        ans = simulator.simulate(stn, sim_options=sim_options,
+                                 decouple_type=DEFAULT_DECOUPLE,
+                                 samples=samples)
+    else:
+        simulator = Simulator(seed)
+        simulator.tracing = tracing
+        ans = simulator.simulate(stn, execution_strat,
+                                 sim_options=sim_options,
+                                 samples=samples,
+                                 initial_guide=initial_guide)
+    return simulator, ans
+
+
+def _write_trace(tracing, stn_id, execution_strat, sim_options, seed,
+                 samples, guided, simulator, ans):
+    """Write the trace of a finished simulation (see libheat.trace)."""
+    path, instance = tracing["sources"][stn_id]
+    meta = {"stn_path": path,
+            "instance": instance,
+            "mitparse": tracing["mitparse"],
+            "execution": execution_strat,
+            "sim_options": sim_options,
+            "seed": seed,
+            "initial_guide": guided,
+            "success": ans,
+            "failure_step": simulator.failure_step,
+            "failure_vertex": simulator.failure_vertex}
+    name = libtrace.trace_name(path, instance, execution_strat, sim_options,
+                               seed)
+    libtrace.save(os.path.join(tracing["dir"], name), meta, samples,
+                  simulator.trace)
+
+
+def _write_timeline(timeline, stn_id, variant, execution_strat, sim_options,
+                    seed, index, simulator, ans):
+    """Write the timeline of a finished simulation, from the events recorded
+    during it (see libheat.timeline).
+    """
+    events = libtimeline.trace_events(
+        profiling.take_events(), pid=index, tid=variant,
+        thread_name="{} ar{} si{}".format(
+            execution_strat, sim_options.get("ar_threshold"),
+            sim_options.get("si_threshold")))
+    path, instance = timeline["sources"][stn_id]
+    meta = {"stn_path": path, "instance": instance,
+            "execution": execution_strat, "sim_options": sim_options,
+            "sample": index, "seed": seed, "success": ans,
+            "reschedules": simulator.num_reschedules,
+            "sent_schedules": simulator.num_sent_schedules}
+    name = libtimeline.timeline_name(path, instance, execution_strat,
+                                     sim_options, index)
+    libtimeline.save(os.path.join(timeline["dir"], name), events, meta)
@@ -3,6 +3,7 @@ from .stnjsontools import (load_stn_from_json,
                            load_stn_from_json_obj,
                            load_stn_from_json_file)
 from .mitparser import mit2stn
+from .generator import generate_json, generate_stn
 
 __all__ = [
     "Vertex",
@@ -11,4 +12,6 @@ __all__ = [
     "load_stn_from_json",
     "load_stn_from_json_file",
     "load_stn_from_json_obj",
-    "mit2stn"]
+    "mit2stn",
+    "generate_json",
+    "generate_stn"]
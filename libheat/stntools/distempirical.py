@@ -2,8 +2,6 @@ import random
 import numpy as np
 from scipy.stats import norm
 
-import libheat.functiontimer as functiontimer
-
 # These variables should never be imported from this file.
 _samples = {}
 """Stores a dictionary of the form {key: list of distribution samples}"""
@@ -154,11 +152,8 @@ def invcdf_norm(val: float, mu: float, sigma: float, res=1000, neg=False):
         res (int, optional): resolution of the normal curve.
         neg (bool, optional): Should include negative values in the cdf.
     """
-    functiontimer.start("invcdf_norm")
     curve = invcdf_norm_curve(mu, sigma, res=res, neg=neg)
-    ans = curve[1][binary_search_lookup(val, curve[0])]
-    functiontimer.stop("invcdf_norm")
-    return ans
+    return curve[1][binary_search_lookup(val, curve[0])]
 
 
 def uniform_sample(lb: float, ub: float, random_state=None) -> float:
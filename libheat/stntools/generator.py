@@ -0,0 +1,184 @@
+"""Random PSTNs of any size, for scaling experiments.
+
+Every agent has a chain of tasks, each a pair of start and end timepoints,
+with a wait of any length between consecutive tasks. A task's duration is
+either contingent, following a Gaussian or uniform distribution, or a
+requirement edge. Synchronization constraints join timepoints of different
+agents. Each one is centred on the difference between the two timepoints'
+nominal times (every duration at its mean), so a generated STN is always
+consistent, and is widened by the standard deviation of that difference, so
+that late timepoints are not much harder to synchronize than early ones.
+
+Durations and windows are in milliseconds, and distributions in seconds, as
+in the files of test_data.
+
+Examples:
+    >>> stn = generate_stn(agents=10, timepoints=30, seed=4)
+    >>> write_json("big.json", generate_json(agents=10, timepoints=30, seed=4))
+"""
+
+import json
+import math
+
+import numpy as np
+
+from .stnjsontools import load_stn_from_json_obj
+
+
+MEAN_RANGE = (2.0, 10.0)
+"""Range of the mean task duration, in seconds."""
+
+SPREAD_RANGE = (0.1, 0.4)
+"""Range of the standard deviation (or half width, for uniform
+distributions) of a contingent duration, as a fraction of its mean."""
+
+REQUIREMENT_SLACK = 0.5
+"""Half width of a requirement duration, as a fraction of its mean."""
+
+SYNC_WINDOW = (1000, 3000)
+"""Range of the half width of a synchronization window, in milliseconds,
+before it is widened by the uncertainty of the timepoints."""
+
+HORIZON_SLACK = 1.5
+"""Latest time of any timepoint, as a multiple of the latest nominal time."""
+
+
+def generate_json(agents=2, timepoints=8, contingent_density=0.5,
+                  synchrony_density=0.1, gaussian_fraction=1.0,
+                  seed=None) -> dict:
+    """Generate a random PSTN, as a JSON object for load_stn_from_json_obj().
+
+    Args:
+        agents (int, optional): Number of agents.
+        timepoints (int, optional): Number of timepoints of each agent. If
+            odd, each agent's last timepoint has no task of its own.
+        contingent_density (float, optional): Probability that a task's
+            duration is contingent.
+        synchrony_density (float, optional): Number of synchronization
+            constraints per timepoint. There are none with a single agent.
+        gaussian_fraction (float, optional): Probability that a contingent
+            duration is Gaussian, rather than uniform.
+        seed (int, optional): Random seed. Default is a random one.
+
+    Returns:
+        A dictionary with the "nodes", "constraints" and "num_agents" of the
+        PSTN, and its "name".
+    """
+    if agents < 1 or timepoints < 1:
+        raise ValueError("Need at least one agent and one timepoint")
+    random_state = np.random.RandomState(seed)
+    constraints = []
+    # Nominal time of every timepoint, and its variance, in milliseconds.
+    nominal = {}
+    variance = {}
+    for agent in range(agents):
+        first = agent * timepoints + 1
+        time = 0.0
+        time_variance = 0.0
+        for k in range(timepoints):
+            node_id = first + k
+            if k % 2 == 1:
+                duration, duration_variance, constraint = _task(
+                    node_id - 1, node_id, contingent_density,
+                    gaussian_fraction, random_state)
+                time += duration
+                time_variance += duration_variance
+                constraints.append(constraint)
+            elif k > 0:
+                constraints.append({"first_node": node_id - 1,
+                                    "second_node": node_id,
+                                    "min_duration": 0,
+                                    "max_duration": "inf"})
+            nominal[node_id] = time
+            variance[node_id] = time_variance
+
+    if agents > 1:
+        constraints += _synchronizations(
+            agents, timepoints, int(round(synchrony_density
+                                          * agents * timepoints)),
+            nominal, variance, random_state)
+
+    horizon = int(math.ceil(max(nominal.values()) * HORIZON_SLACK)) \
+        + SYNC_WINDOW[1]
+    nodes = [{"node_id": node_id, "owner_id": (node_id - 1) // timepoints,
+              "min_domain": 0, "max_domain": horizon}
+             for node_id in sorted(nominal)]
+    name = "synthetic-a{}-t{}-c{}-s{}-g{}-seed{}".format(
+        agents, timepoints, contingent_density, synchrony_density,
+        gaussian_fraction, seed)
+    return {"name": name, "nodes": nodes, "constraints": constraints,
+            "num_agents": agents}
+
+
+def _task(start, end, contingent_density, gaussian_fraction,
+          random_state) -> tuple:
+    """Make the duration constraint of a task.
+
+    Returns:
+        A tuple of the task's nominal duration and its variance, in
+        milliseconds, and its constraint.
+    """
+    mean = random_state.uniform(*MEAN_RANGE)
+    constraint = {"first_node": start, "second_node": end}
+    if random_state.random_sample() >= contingent_density:
+        constraint.update(
+            min_duration=int(mean * 1000 * (1 - REQUIREMENT_SLACK)),
+            max_duration=int(mean * 1000 * (1 + REQUIREMENT_SLACK)))
+        return mean * 1000, 0.0, constraint
+    spread = mean * random_state.uniform(*SPREAD_RANGE)
+    if random_state.random_sample() < gaussian_fraction:
+        name = "N_{:.3f}_{:.3f}".format(mean, spread)
+        variance = spread ** 2
+    else:
+        name = "U_{:.3f}_{:.3f}".format(mean - spread, mean + spread)
+        variance = spread ** 2 / 3.0
+    constraint.update(min_duration=0, max_duration="inf",
+                      distribution={"type": "Empirical", "name": name})
+    return mean * 1000, variance * 1e6, constraint
+
+
+def _synchronizations(agents, timepoints, count, nominal, variance,
+                      random_state) -> list:
+    """Make count synchronization constraints between random timepoints of
+    different agents, at most one per pair of timepoints.
+    """
+    constraints = []
+    pairs = set()
+    # Give up on pairs once most have been tried; small STNs have few.
+    for attempt in range(count * 10):
+        if len(constraints) == count:
+            break
+        first_agent, second_agent = random_state.choice(agents, 2,
+                                                        replace=False)
+        i = first_agent * timepoints + 1 + random_state.randint(timepoints)
+        j = second_agent * timepoints + 1 + random_state.randint(timepoints)
+        if (i, j) in pairs or (j, i) in pairs:
+            continue
+        pairs.add((i, j))
+        delta = nominal[j] - nominal[i]
+        window = random_state.uniform(*SYNC_WINDOW) \
+            + math.sqrt(variance[i] + variance[j])
+        constraints.append({"first_node": int(i), "second_node": int(j),
+                            "min_duration": int(math.floor(delta - window)),
+                            "max_duration": int(math.ceil(delta + window))})
+    return constraints
+
+
+def generate_stn(**kwargs):
+    """Generate a random PSTN. Takes the arguments of generate_json().
+
+    Returns:
+        The STN, named after its parameters.
+    """
+    jsonstn = generate_json(**kwargs)
+    stn = load_stn_from_json_obj(jsonstn)["stn"]
+    stn.name = jsonstn["name"]
+    return stn
+
+
+def write_json(path, jsonstn):
+    """Write a PSTN from generate_json() to a file, which
+    load_stn_from_json_file() and run_simulator.py can read.
+    """
+    with open(path, "w") as f:
+        json.dump(jsonstn, f, indent=1)
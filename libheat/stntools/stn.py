@@ -178,6 +178,12 @@ class Edge(object):
         """
         return self._sampled_time
 
+    def set_sampled_time(self, sample):
+        """Sets the sampled time for this contingent edge, as if it had been
+        drawn by resample().
+        """
+        self._sampled_time = sample
+
     def copy(self):
         new_edge = Edge(self.i, self.j, -self.Cji, self.Cij, self.distribution)
         new_edge._sampled_time = self._sampled_time
@@ -0,0 +1,145 @@
+"""Prefix-sharing simulation of ARSI (DREAM) threshold sweeps.
+
+When several AR/SC threshold settings are run on the same sample, their
+trajectories are identical until the first step at which their send decisions
+differ. SweepSimulator advances a single trajectory for all settings, and
+only forks it when the settings disagree on which guide to follow. SREA
+solves and constraint propagation done before a fork are shared.
+"""
+
+from .montsim import Simulator
+from . import profiling
+from . import printers as pr
+
+
+_UNSOLVED = object()
+"""Marks that SREA has not yet been run for the current step."""
+
+
+class SweepSimulator(Simulator):
+
+    def __init__(self, random_seed=None):
+        super().__init__(random_seed)
+        self._step_srea = _UNSOLVED
+        self.num_forks = 0
+        self.skipped_propagations = []
+        self.failures = []
+
+    def simulate_sweep(self, starting_stn, settings, sim_options=None,
+                       samples=None, initial_guide=None) -> list:
+        """Run one ARSI simulation for each threshold setting.
+
+        The results are exactly those of calling simulate() with the "arsi"
+        strategy once per setting, on the same samples.
+
+        Args:
+            starting_stn (STN): The STN used to run in the simulation.
+            settings (list): List of (ar_threshold, si_threshold) tuples.
+            sim_options (dict, optional): Other options to pass into the
+                simulator.
+            samples (dict, optional): Contingent edge durations to use instead
+                of resampling, as returned by montsim.draw_samples().
+            initial_guide (tuple, optional): The (alpha, guide) tuple SREA
+                returns for starting_stn.
+
+        Returns:
+            A list with one (success, reschedules, sent_schedules) tuple for
+            each setting, in the same order as settings. The number of full
+            propagations each setting skipped is left in
+            skipped_propagations, and the (failure_step, failure_vertex) of
+            each setting in failures.
+        """
+        self.setup(starting_stn, sim_options=sim_options, samples=samples,
+                   initial_guide=initial_guide)
+        self.num_forks = 0
+        reschedules = [0] * len(settings)
+        sent = [0] * len(settings)
+        successes = [None] * len(settings)
+        self.skipped_propagations = [0] * len(settings)
+        self.failures = [None] * len(settings)
+
+        # Each trajectory is a simulator, the contingent event counters of
+        # the settings following it, and whether its guide for the next step
+        # has already been decided.
+        trajectories = [(self, {k: 0 for k in range(len(settings))}, False)]
+        while trajectories:
+            sim, counters, decided = trajectories.pop()
+            while True:
+                if not decided:
+                    if sim.all_assigned():
+                        ans = sim.finish()
+                        break
+                    groups = sim._sweep_guides(settings, counters,
+                                               reschedules, sent)
+                    for alpha, guide, group_counters in groups[1:]:
+                        self.num_forks += 1
+                        forked = sim.fork()
+                        if guide is not sim._guide_stn:
+                            forked._guide_stn = guide
+                        forked._current_alpha = alpha
+                        trajectories.append((forked, group_counters, True))
+                    sim._current_alpha, sim._guide_stn, counters = groups[0]
+                decided = False
+                if sim._fast_forward:
+                    ans = sim.fast_forward()
+                    if ans is not None:
+                        break
+                if not sim.dispatch_next():
+                    ans = False
+                    break
+            for k in counters:
+                successes[k] = ans
+                self.skipped_propagations[k] = sim.num_skipped_propagations
+                self.failures[k] = (sim.failure_step, sim.failure_vertex)
+        pr.verbose("Sweep used {} forks for {} settings"
+                   .format(self.num_forks, len(settings)))
+        return list(zip(successes, reschedules, sent))
+
+    def _sweep_guides(self, settings, counters, reschedules, sent) -> list:
+        """Make the ARSI guide decision of every setting on this trajectory.
+
+        Settings which end up following the same guide are grouped together.
+        At most one SREA solve is done, and shared by every setting.
+
+        Returns:
+            A list of (alpha, guide, counters) tuples, one per distinct
+            guide. The first tuple is for the guide this trajectory follows
+            if no setting sends a new schedule.
+        """
+        first_run = self._first_run
+        executed_contingent = self._options["executed_contingent"]
+        self._options["first_run"] = first_run
+        self._first_run = False
+        self._step_srea = _UNSOLVED
+
+        with profiling.span("get_guide"):
+            groups = {id(self._guide_stn): (self._current_alpha,
+                                            self._guide_stn, {})}
+            for k, counter in counters.items():
+                ar_threshold, si_threshold = settings[k]
+                if executed_contingent:
+                    counter += 1
+                before = (self.num_reschedules, self.num_sent_schedules)
+                alpha, guide, counter = self._arsi_algorithm(
+                    self._current_alpha,
+                    self._guide_stn,
+                    first_run,
+                    executed_contingent,
+                    counter,
+                    ar_threshold=ar_threshold,
+                    si_threshold=si_threshold)
+                reschedules[k] += self.num_reschedules - before[0]
+                sent[k] += self.num_sent_schedules - before[1]
+                groups.setdefault(id(guide),
+                                  (alpha, guide, {}))[2][k] = counter
+        self._initial_guide = None
+        self._step_srea = _UNSOLVED
+        return [g for g in groups.values() if g[2]]
+
+    def _run_srea(self):
+        """Run SREA at most once per step, and share the result across every
+        setting on this trajectory.
+        """
+        if self._step_srea is _UNSOLVED:
+            self._step_srea = super()._run_srea()
+        return self._step_srea
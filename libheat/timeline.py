@@ -0,0 +1,83 @@
+"""Timelines of single simulations, in the Chrome trace event format.
+
+A timeline holds the profiling spans of one simulation (getting the guide,
+each SREA alpha probe, selection, propagation, ...) as complete events, and
+its contingent executions and sent schedules as instant events. It can be
+opened in chrome://tracing or https://ui.perfetto.dev, to see where the time
+between a contingent execution and the next sent schedule goes.
+
+Examples:
+    >>> profiling.record_events()
+    >>> simulator.simulate(stn, "drea")
+    >>> timeline.save("rover.json", timeline.trace_events(
+    ...     profiling.take_events(), thread_name="drea"), {"seed": 4})
+"""
+
+import json
+import os.path
+
+from . import fileio
+
+
+def timeline_name(stn_path, instance, execution, sim_options,
+                  sample) -> str:
+    """Build the file name of the timeline of a sample.
+
+    Examples:
+        >>> timeline_name("data/rover.json", 0, "drea", {"ar_threshold": 0.5,
+        ...               "si_threshold": 0.0}, 3)
+        'rover.json.0.drea-ar0.5-si0.0.sample3.json'
+    """
+    return "{}.{}.{}-ar{}-si{}.sample{}.json".format(
+        os.path.basename(stn_path), instance, execution,
+        sim_options.get("ar_threshold"), sim_options.get("si_threshold"),
+        sample)
+
+
+def trace_events(events, pid=0, tid=0, thread_name=None) -> list:
+    """Convert recorded events to trace events.
+
+    Args:
+        events (list): Events from profiling.take_events().
+        pid (int, optional): Process ID to show the events under.
+        tid (int, optional): Thread ID to show the events under.
+        thread_name (str, optional): Name to show for the thread.
+
+    Returns:
+        A list of trace event dictionaries. Times are in microseconds from
+        the first event.
+    """
+    origin = min((e[2] for e in events), default=0)
+    trace = []
+    if thread_name is not None:
+        trace.append({"name": "thread_name", "ph": "M", "pid": pid,
+                      "tid": tid, "args": {"name": thread_name}})
+    for name, phase, start, duration, args in events:
+        event = {"name": name, "ph": phase, "pid": pid, "tid": tid,
+                 "ts": (start - origin) / 1000.0}
+        if phase == "X":
+            event["dur"] = duration / 1000.0
+        else:
+            # Instants are drawn across their thread only.
+            event["s"] = "t"
+        if args:
+            event["args"] = args
+        trace.append(event)
+    # Viewers nest spans best when they arrive in order of start, outermost
+    # first.
+    trace.sort(key=lambda e: (e.get("ts", -1.0), -e.get("dur", 0.0)))
+    return trace
+
+
+def save(path, events, meta):
+    """Write a timeline.
+
+    Args:
+        path (str): Path of the JSON file to write.
+        events (list): Trace events from trace_events().
+        meta (dict): Description of the simulation. Must be JSON
+            serializable.
+    """
+    with fileio.atomic_write(path) as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+                   "otherData": meta}, f, default=fileio.to_json)
@@ -0,0 +1,106 @@
+"""Execution traces of single simulations, for replaying them.
+
+A trace is a compressed .npz file holding everything needed to re-run one
+strategy on one sample, and to check that the re-run took the same path:
+
+* "meta": A JSON string with the STN's path and instance, the strategy and
+  its options, the sample's seed, and the outcome of the simulation.
+* "samples": The sampled duration of every contingent edge.
+* "dispatches": Every dispatched timepoint in order, with its time, and the
+  Z-bounds and alpha of the guide it was dispatched from.
+
+Traces are a few kilobytes each, so a run can trace all of its failures.
+"""
+
+import json
+import os.path
+
+import numpy as np
+
+from . import fileio
+
+
+SAMPLE_DTYPE = np.dtype([("i", "<i4"), ("j", "<i4"), ("duration", "<f8")])
+"""Type of the sampled duration of a contingent edge."""
+
+DISPATCH_DTYPE = np.dtype([("vertex", "<i4"),
+                           ("time", "<f8"),
+                           ("guide_min", "<f8"),
+                           ("guide_max", "<f8"),
+                           ("contingent", "?"),
+                           ("alpha", "<f8")])
+"""Type of a single dispatch step."""
+
+
+def trace_name(stn_path, instance, execution, sim_options, seed) -> str:
+    """Build the file name of a trace, unique within a run.
+
+    Examples:
+        >>> trace_name("data/rover.json", 0, "drea", {"ar_threshold": 0.5,
+        ...            "si_threshold": 0.0}, 42)
+        'rover.json.0.drea-ar0.5-si0.0.seed42.npz'
+    """
+    return "{}.{}.{}-ar{}-si{}.seed{}.npz".format(
+        os.path.basename(stn_path), instance, execution,
+        sim_options.get("ar_threshold"), sim_options.get("si_threshold"),
+        seed)
+
+
+def save(path, meta, samples, dispatches):
+    """Write a trace.
+
+    Args:
+        path (str): Path of the .npz file to write.
+        meta (dict): Description of the simulation. Must be JSON
+            serializable.
+        samples (dict): The sampled durations, of the form
+            {(i, j): duration}.
+        dispatches (list): List of (vertex, time, guide_min, guide_max,
+            contingent, alpha) tuples, in dispatch order.
+    """
+    sample_array = np.array([(i, j, d) for (i, j), d in samples.items()],
+                            dtype=SAMPLE_DTYPE)
+    dispatch_array = np.array(dispatches, dtype=DISPATCH_DTYPE)
+    meta_json = json.dumps(meta, default=fileio.to_json)
+    # Never leave a partly written trace behind.
+    with fileio.atomic_write(path, "wb") as f:
+        np.savez_compressed(f, meta=np.array(meta_json),
+                            samples=sample_array, dispatches=dispatch_array)
+
+
+def load(path) -> tuple:
+    """Read a trace written by save().
+
+    Returns:
+        A tuple of the meta dictionary, the samples dictionary, and the
+        dispatches as an array of DISPATCH_DTYPE.
+    """
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        samples = {(int(s["i"]), int(s["j"])): float(s["duration"])
+                   for s in data["samples"]}
+        dispatches = data["dispatches"]
+    return meta, samples, dispatches
+
+
+def first_difference(recorded, replayed):
+    """Find the first dispatch step at which two traces differ.
+
+    Args:
+        recorded (ndarray): Dispatches of the recorded trace.
+        replayed (ndarray): Dispatches of the replay.
+
+    Returns:
+        The index of the first differing step, or None if the traces are
+        the same.
+    """
+    for step in range(min(len(recorded), len(replayed))):
+        a, b = recorded[step], replayed[step]
+        if a["vertex"] != b["vertex"] or a["contingent"] != b["contingent"]:
+            return step
+        for field in ("time", "guide_min", "guide_max", "alpha"):
+            if not np.isclose(a[field], b[field], equal_nan=True):
+                return step
+    if len(recorded) != len(replayed):
+        return min(len(recorded), len(replayed))
+    return None
@@ -0,0 +1,133 @@
+"""A long-lived pool of simulation workers.
+
+Creating a multiprocessing.Pool for every STN, and pickling the whole STN into
+every task, costs more than many of the simulations themselves. A WorkerPool
+is created once per run instead. The objects the tasks need (such as the
+STNs) are handed to each worker once, when it starts, and tasks only refer to
+them by key.
+"""
+
+import multiprocessing
+import time
+
+from . import printers as pr
+
+
+POOL_RETRIES = 3
+"""Number of times to retry creating the worker processes."""
+
+RETRY_DELAY = 3.0
+"""Seconds to wait before retrying to create the worker processes."""
+
+CHUNKS_PER_WORKER = 4
+"""Default number of task chunks handed to each worker."""
+
+
+_shared = {}
+"""Objects shared with this process by its pool, keyed by ID."""
+
+
+def _init_worker(shared):
+    """Worker initializer, which stores the shared objects once."""
+    global _shared
+    _shared = shared
+
+
+def set_shared(shared):
+    """Hold objects in this process as if they were shared by a pool.
+
+    Used by workers which do not belong to a WorkerPool.
+
+    Args:
+        shared (dict): The shared objects, keyed by ID.
+    """
+    _init_worker(shared)
+
+
+def get_shared(key):
+    """Look up an object that was shared with the worker pool.
+
+    Args:
+        key: The ID the object was registered under.
+
+    Returns:
+        The shared object.
+    """
+    return _shared[key]
+
+
+class WorkerPool(object):
+    """A pool of worker processes, all holding the same shared objects.
+
+    With a single thread no processes are made, and tasks run in this
+    process instead.
+
+    Args:
+        shared (dict): Objects to send to every worker, keyed by ID.
+        threads (int, optional): Number of worker processes to use.
+
+    Examples:
+        >>> with WorkerPool({0: stn}, threads=4) as pool:
+        ...     results = list(pool.imap_unordered(func, tasks))
+    """
+
+    def __init__(self, shared, threads=1):
+        self.shared = shared
+        self.threads = threads
+        self._pool = None
+        if threads > 1:
+            print("Using multithreading; threads = {}".format(threads))
+            self._pool = self._make_pool()
+        else:
+            print("Using single thread; threads = {}".format(threads))
+            _init_worker(shared)
+
+    def _make_pool(self):
+        """Start the worker processes, retrying if the system refuses."""
+        for attempt in range(POOL_RETRIES + 1):
+            try:
+                return multiprocessing.Pool(self.threads,
+                                            initializer=_init_worker,
+                                            initargs=(self.shared,))
+            except BlockingIOError:
+                if attempt == POOL_RETRIES:
+                    raise
+                pr.warning("Got BlockingIOError; attempting to remake threads")
+                pr.warning("Retrying in {} seconds...".format(RETRY_DELAY))
+                time.sleep(RETRY_DELAY)
+                pr.warning("Retrying now")
+
+    def imap_unordered(self, func, tasks, chunksize=None):
+        """Run func on every task, yielding results as they finish.
+
+        Args:
+            func (function): Module level function to run on each task.
+            tasks (list): The tasks to run.
+            chunksize (int, optional): Number of tasks sent to a worker at a
+                time. Defaults to splitting the tasks into CHUNKS_PER_WORKER
+                chunks per worker.
+
+        Returns:
+            An iterator over the results, in the order they finish.
+        """
+        if self._pool is None:
+            return map(func, tasks)
+        if chunksize is None:
+            chunksize = max(1, -(-len(tasks)
+                                 // (self.threads * CHUNKS_PER_WORKER)))
+        return self._pool.imap_unordered(func, tasks, chunksize=chunksize)
+
+    def close(self):
+        """Stop the worker processes."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None and self._pool is not None:
+            self._pool.terminate()
+        self.close()
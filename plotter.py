@@ -27,6 +27,7 @@ from libheat.plotting.plot_ara import plot_ara
 from libheat.plotting.plot_syncvrobust import plot_syncvrobust
 from libheat.plotting.plot_scatters import communication as com_scatter
 from libheat.plotting.plot_scatters import reschedules as res_scatter
+from libheat.plotting.plot_memory import plot_memory_scaling
 import libheat.plotting.dream_details as dream_details
 
 
@@ -95,6 +96,8 @@ def main():
         com_scatter(full_df)
     elif args.res_scatter:
         res_scatter(full_df)
+    elif args.memory_scaling:
+        plot_memory_scaling(full_df, ax=ax)
 
     if args.output is None:
         plt.show()
@@ -355,6 +358,10 @@ def parse_args():
     parser.add_argument("--com-scatter", action="store_true",
                         help="Generates a communication rate v.s. robustness"
                             +" scatter plot, as shown in Abrahams et al.")
+    parser.add_argument("--memory-scaling", action="store_true",
+                        help="Plots the peak RSS and runtime per sample of "
+                        "each strategy against the number of vertices. "
+                        "Needs results written with --memory.")
     parser.add_argument("-o", "--output", type=str, default=None,
                         help="Output file name")
     return parser.parse_args()
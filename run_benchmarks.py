@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+"""
+Runs the benchmarks of the benchmarks package, and compares them with a
+saved baseline.
+
+Save a baseline on the commit to compare against, then compare later commits
+with it. The exit status is 1 if any benchmark slowed down by more than the
+threshold.
+
+    $ python3 run_benchmarks.py --save baseline.json
+    $ python3 run_benchmarks.py --compare baseline.json --threshold 15
+
+With --throughput, the end-to-end throughput of every execution strategy is
+measured instead of the micro-benchmarks (see benchmarks.throughput).
+
+    $ python3 run_benchmarks.py --throughput --save throughput.json
+
+With --lp, the LPs solved by simulations are captured to a file, if it does
+not exist yet, and replayed against every LP backend available (see
+benchmarks.lp).
+
+    $ python3 run_benchmarks.py --lp lps.jsonl --save lp.json
+"""
+
+import argparse
+import importlib
+import os.path
+import pkgutil
+import sys
+
+import benchmarks
+from benchmarks import lp
+from benchmarks import throughput
+from libheat import benchmark
+
+
+def main():
+    args = parse_args()
+    load_benchmarks()
+    if args.lp is not None:
+        if not os.path.exists(args.lp):
+            _capture_lps(args)
+        results = lp.run(args.lp, pattern=args.filter, repeat=args.repeat,
+                         progress=_print_progress)
+    elif args.throughput:
+        results = throughput.run(pattern=args.filter, samples=args.samples,
+                                 seed=args.seed, threads=args.threads,
+                                 synthetic=args.synthetic,
+                                 max_size=args.max_size,
+                                 progress=_print_progress)
+    else:
+        results = benchmark.run(pattern=args.filter, max_size=args.max_size,
+                                repeat=args.repeat, min_time=args.min_time,
+                                progress=_print_progress)
+    comparison = None
+    if args.compare is not None:
+        comparison = benchmark.compare(results,
+                                       benchmark.load(args.compare),
+                                       threshold=args.threshold)
+    print(benchmark.report(results, comparison))
+    if args.lp is not None:
+        print(lp.report(results))
+    elif args.throughput:
+        print(throughput.report(results))
+    if args.save is not None:
+        benchmark.save(args.save, results)
+        print("Wrote baseline to {}".format(args.save))
+    regressed = [c["key"] for c in comparison or [] if c["regressed"]]
+    if regressed:
+        print("{} benchmarks slowed down by more than {}%: {}".format(
+            len(regressed), args.threshold, ", ".join(regressed)))
+        sys.exit(1)
+
+
+def load_benchmarks():
+    """Import every module of the benchmarks package, registering their
+    benchmarks.
+    """
+    for module in pkgutil.iter_modules(benchmarks.__path__):
+        importlib.import_module("benchmarks." + module.name)
+
+
+def _capture_lps(args):
+    """Capture the LPs of simulations on the throughput benchmark's STNs to
+    args.lp.
+    """
+    stns = throughput.instances(synthetic=[
+        (a, t) for a, t in args.synthetic
+        if args.max_size is None or a * t <= args.max_size])
+    counts = lp.capture(args.lp, stns, samples=args.samples, seed=args.seed,
+                        sim_options=throughput.SIM_OPTIONS)
+    print("Captured {} to {}".format(
+        ", ".join("{} {} LPs".format(n, kind)
+                  for kind, n in sorted(counts.items())), args.lp),
+          file=sys.stderr)
+
+
+def _print_progress(key, result):
+    if "calls" in result:
+        print("Ran {} ({} calls per round)".format(key, result["calls"]),
+              file=sys.stderr)
+    elif "instances" in result:
+        print("Ran {} ({} LPs)".format(key, result["instances"]),
+              file=sys.stderr)
+    else:
+        print("Ran {} ({} samples)".format(key, result["samples"]),
+              file=sys.stderr)
+
+
+def parse_args():
+    """Parse arguments provided."""
+    parser = argparse.ArgumentParser(prog="Benchmarks")
+    parser.add_argument("-k", "--filter", type=str, default=None,
+                        metavar="PATTERN",
+                        help="Only run benchmarks whose name matches this "
+                        "shell-style pattern, e.g. 'stn.*'.")
+    parser.add_argument("--max-size", type=int, default=None, metavar="N",
+                        help="Skip benchmark sizes above N.")
+    parser.add_argument("--repeat", type=int, default=benchmark.REPEAT,
+                        help="Timed rounds per benchmark. Default {}."
+                        .format(benchmark.REPEAT))
+    parser.add_argument("--min-time", type=float, default=benchmark.MIN_TIME,
+                        metavar="SECONDS",
+                        help="Seconds to time each benchmark for, at least. "
+                        "Default {}.".format(benchmark.MIN_TIME))
+    parser.add_argument("--throughput", action="store_true",
+                        help="Measure the samples per second, LP solves per "
+                        "sample and time per phase of every execution "
+                        "strategy, on test_data and synthetic STNs, instead "
+                        "of running the micro-benchmarks. Baselines compare "
+                        "the median time of a single simulation.")
+    parser.add_argument("--lp", type=str, default=None, metavar="PATH",
+                        help="Replay the LPs captured in PATH against every "
+                        "LP backend available, instead of running the "
+                        "micro-benchmarks, and report their solve times, "
+                        "build times, and agreement with the simulator's "
+                        "solver. If PATH does not exist, the LPs of "
+                        "simulations on the --throughput STNs are captured "
+                        "to it first. Baselines compare the median solve "
+                        "time.")
+    parser.add_argument("-s", "--samples", type=int,
+                        default=throughput.SAMPLES,
+                        help="Samples per strategy and STN with --throughput, "
+                        "or to capture LPs with --lp. "
+                        "Default {}.".format(throughput.SAMPLES))
+    parser.add_argument("--seed", type=int, default=throughput.SEED,
+                        help="Random seed of --throughput and --lp. "
+                        "Default {}.".format(throughput.SEED))
+    parser.add_argument("-t", "--threads", type=int, default=1,
+                        help="Worker processes of --throughput. Default 1.")
+    parser.add_argument("--synthetic", type=parse_synthetic,
+                        default=throughput.SYNTHETIC, metavar="AxT,...",
+                        help="Synthetic STNs of --throughput, as a comma "
+                        "separated list of agents x timepoints per agent, "
+                        "e.g. '2x10,10x10,50x10' for a sweep of agent "
+                        "counts. Default '{}'.".format(",".join(
+                            "{}x{}".format(*s) for s in throughput.SYNTHETIC)))
+    parser.add_argument("--save", type=str, default=None, metavar="PATH",
+                        help="Write the results as a JSON baseline.")
+    parser.add_argument("--compare", type=str, default=None, metavar="PATH",
+                        help="Compare the results with a JSON baseline.")
+    parser.add_argument("--threshold", type=float,
+                        default=benchmark.DEFAULT_THRESHOLD, metavar="PCT",
+                        help="Percentage by which a benchmark's median may "
+                        "grow over the baseline before it is flagged. "
+                        "Default {}.".format(benchmark.DEFAULT_THRESHOLD))
+    return parser.parse_args()
+
+
+def parse_synthetic(arg) -> tuple:
+    """Parse a comma separated list of AxT synthetic STN sizes.
+
+    Examples:
+        >>> parse_synthetic("2x10, 4x20")
+        ((2, 10), (4, 20))
+    """
+    try:
+        sizes = tuple(tuple(int(n) for n in size.split("x"))
+                      for size in arg.split(",") if size.strip())
+    except ValueError:
+        sizes = ()
+    if not sizes or any(len(s) != 2 or min(s) < 1 for s in sizes):
+        raise argparse.ArgumentTypeError(
+            "Expected sizes like '2x10,4x10', got '{}'".format(arg))
+    return sizes
+
+
+if __name__ == "__main__":
+    main()
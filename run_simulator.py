@@ -10,8 +10,8 @@ strategy.
 This file is the primary running access point for the new RobotBrunch
 simulator. Thus, it holds the main() function.
 
-This file also holds the multithreading code, allowing large scale
-simulation runs to take place.
+The multiprocessing code, allowing large scale simulation runs to take
+place, lives in libheat.stages.
 """
 
 import sys
@@ -23,44 +23,84 @@ except AssertionError:
 
 import os
 import os.path
-import time
 import multiprocessing
 import argparse
+import cProfile
+import pstats
 import numpy as np
 
 
-from libheat import functiontimer
 from libheat.stntools import load_stn_from_json_file, mitparser
-from libheat.montsim import Simulator
-from libheat.dmontsim import DecoupledSimulator
+from libheat.montsim import draw_samples
+from libheat.stages import (MAX_SEED, DEFAULT_CHUNK_SIZE,
+                            multiple_variant_simulations,
+                            sequential_variant_simulations)
 import libheat.printers as pr
 import libheat.parseindefinite
-from libheat import sim2csv
-
-MAX_SEED = 2 ** 31 - 1
-"""The maximum number a random seed can be."""
-DEFAULT_DECOUPLE = "srea"
-"""The default decoupling type for DecoupledSimulator"""
+from libheat import resultsink
+from libheat import samplerecords
+from libheat import trace as libtrace
+from libheat import confidence
+from libheat import stages as libstages
+from libheat import journal as libjournal
+from libheat import coordinator
+from libheat import workerpool
+from libheat import profiling
+from libheat import counters
+from libheat import hotspots
+from libheat import memory
+from libheat import progress as libprogress
+
+SAMPLE_ROW_KEYS = ("execution", "stn_path", "stn_name", "ar_threshold",
+                   "si_threshold", "random_seed", "timestamp")
+"""Keys of a stage's results row copied into each of its sample rows"""
+HOTSPOT_LINES = 30
+"""Number of functions listed per strategy in the hotspot summary"""
+REPLAY_PROFILE_LINES = 30
+"""Number of functions listed in the profile of a replay"""
 
 
 def main():
     args = parse_args()
 
+    if args.verbose:
+        pr.set_verbosity(1)
+        pr.verbose("Verbosity set to: 1")
+
+    if args.worker is not None:
+        run_workers(args.worker, args.threads, args.authkey.encode())
+        return
+
+    if args.replay is not None:
+        replay(args.replay)
+        return
+
+    journal_path = args.journal
+    if journal_path is None and args.output is not None:
+        journal_path = args.output + ".journal"
+    journal = None
+    if journal_path is not None:
+        journal = libjournal.Journal(journal_path, resume=args.resume)
+        for shard_path in args.merge or []:
+            journal.load(shard_path)
+
     # Set the random seed
     if args.seed is not None:
         random_seed = int(args.seed)
+    elif (args.resume or args.merge) and journal.random_seed is not None:
+        random_seed = journal.random_seed
     else:
         random_seed = np.random.randint(MAX_SEED)
-
-    if args.verbose:
-        pr.set_verbosity(1)
-        pr.verbose("Verbosity set to: 1")
+    if journal is not None:
+        journal.start_run(random_seed)
 
     sim_count = args.samples
 
     sim_options = {"ar_threshold": args.ar_threshold,
                    "alp_threshold": args.si_threshold,
-                   "si_threshold": args.si_threshold}
+                   "si_threshold": args.si_threshold,
+                   "lazy_propagation": args.lazy_propagation,
+                   "fast_forward": args.fast_forward}
     
     # Check to see if we need to create the ordering pairs from the parsed
     # user input.
@@ -71,6 +111,8 @@ def main():
     else:
         ordering_pairs = None
 
+    profiling.enable(args.profile_spans)
+
     # simulate across multiple paths.
     stn_paths = folder_harvest(args.stns, recurse=True, only_json=True)
     across_paths(stn_paths, args.execution, args.threads, sim_count,
@@ -81,29 +123,147 @@ def main():
                  mitparse=args.mit_parse,
                  start_index=args.start_point,
                  stop_index=args.stop_point,
-                 ordering_pairs=ordering_pairs)
+                 ordering_pairs=ordering_pairs,
+                 ci_tolerance=args.ci_tolerance,
+                 chunk_size=args.chunk_size,
+                 ci_confidence=args.confidence,
+                 one_pass=args.one_pass,
+                 prescreen=args.prescreen,
+                 journal=journal,
+                 shard=args.shard,
+                 merge=bool(args.merge),
+                 serve=args.serve,
+                 authkey=(None if args.authkey is None
+                          else args.authkey.encode()),
+                 sample_records=args.sample_records,
+                 trace=args.trace,
+                 trace_all=args.trace_all,
+                 timeline=args.timeline,
+                 timeline_samples=args.timeline_samples,
+                 profile_tasks=args.profile,
+                 memory_mode=args.memory)
+    if journal is not None:
+        journal.close()
+    if args.profile:
+        print(hotspots.report(lines=HOTSPOT_LINES))
+        for path in hotspots.dump(args.profile_output):
+            print("Wrote profile to {}".format(path))
+    if args.profile_spans:
+        print("Time spent per span:")
+        print(profiling.report())
+
+
+def run_workers(address, threads, authkey):
+    """Run worker processes for a coordinator until it has no more work.
+
+    Args:
+        address (str): Address of the coordinator.
+        threads (int): Number of worker processes to run.
+        authkey (bytes): Key of the coordinator.
+    """
+    print("Working for {} with {} processes".format(address, threads))
+    workers = [multiprocessing.Process(target=coordinator.run_worker,
+                                       args=(address, authkey))
+               for i in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
 
 
 def across_paths(stn_paths, execution, threads, sim_count, sim_options,
                  output=None, live_updates=True, random_seed=None,
                  mitparse=False, start_index=0, stop_index=None,
-                 ordering_pairs=None):
+                 ordering_pairs=None, ci_tolerance=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE,
+                 ci_confidence=confidence.DEFAULT_CONFIDENCE,
+                 one_pass=False, prescreen=None, journal=None, shard=None,
+                 merge=False, serve=None,
+                 authkey=None, sample_records=None,
+                 trace=None, trace_all=False, timeline=None,
+                 timeline_samples=(0,), profile_tasks=0, memory_mode=None):
     """Runs multiple simulations for each STN in the provided iterable.
 
     Args:
         stn_paths (iterable): iterable (like a List) of strings.
-        execution (str): Execution strategy to use on each STN.
+        execution (str): Execution strategy to use on each STN. May be a
+            comma separated list of strategies, e.g. "early,srea,arsi".
         threads (int): Number of threads to use.
         sim_count (int): Number of simulations (samples) to use.
         sim_options (dict): Dictionary of simulation options to use.
-        output (str, optional): Output file path. Default no output.
-        live_updates (boolean, optional): Whether to provide live updates.
+        output (str, optional): Output path. Its extension selects the
+            results sink; see libheat.resultsink. Default no output.
+        live_updates (boolean, optional): Whether to provide live updates:
+            the results of every stage as it finishes, and a status line of
+            the progress of the samples (see libheat.progress).
         random_seed (int, optional): The random seed to start out with,
             defaults to a random... random seed.
         mitparse (boolean, optional): Parse STN JSON files as MIT format.
         ordering_pairs (list, optional): List of tuples of AR and SC settings.
             Each STN will be run with a separate simulation for each tuple.
+        ci_tolerance (float, optional): If set, run samples in chunks and
+            stop once the robustness interval half-width drops below this
+            value. sim_count is then the cap on the number of samples.
+        chunk_size (int, optional): Samples per chunk when sequentially
+            stopping.
+        ci_confidence (float, optional): Confidence level of the robustness
+            interval.
+        one_pass (boolean, optional): Run every strategy and ordering pair of
+            an STN in a single pass, against the same contingent samples.
+        prescreen (str, optional): Mark samples whose instantiated STN is
+            inconsistent as failures without simulating them. Either
+            "sample" (checked in each task) or "batch" (checked together
+            before the tasks are run). Default is no pre-screening.
+        journal (Journal, optional): Journal to record finished samples and
+            stages in. Stages it holds as finished are skipped, and the
+            samples it holds are not simulated again.
+        shard (tuple, optional): A (K, N) tuple. Only run the samples whose
+            index is K modulo N, and record them in the journal without
+            writing any results. Sample seeds do not depend on the shard.
+        merge (boolean, optional): Write the results of a sharded run, from
+            a journal holding the samples of every shard. No sample is
+            simulated.
+        serve (str, optional): Serve the sample tasks on this address to
+            workers started with --worker, instead of running them on local
+            worker processes. See libheat.coordinator.
+        authkey (bytes, optional): Key the workers must present. Default is
+            a random key, which is printed, and is only allowed when serving
+            on a Unix socket or a loopback address.
+        sample_records (str, optional): Path of a .npy file to append a
+            compact record of every sample to. See libheat.samplerecords.
+        trace (str, optional): Directory to write an execution trace of
+            every failed simulation to, for replay(). See libheat.trace.
+        trace_all (boolean, optional): Trace every simulation, not only the
+            failed ones.
+        timeline (str, optional): Directory to write a timeline of the
+            selected samples of every stage to. See libheat.timeline.
+        timeline_samples (iterable, optional): Indices of the samples to
+            write timelines of. Default is the first sample only.
+        profile_tasks (int, optional): Number of tasks of each strategy
+            that each worker runs under cProfile. Their statistics are
+            merged in this process; see libheat.hotspots. Default is none.
+        memory_mode (str, optional): Track the memory use of the workers,
+            and add it to every results row. One of memory.MODES; see
+            libheat.memory. Default is no tracking.
+
+    Raises:
+        ValueError: If merging, and the journal is missing samples, or if
+            chunk_size is less than 1.
     """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1, not {}"
+                         .format(chunk_size))
+    sampling = {"ci_tolerance": ci_tolerance,
+                "chunk_size": chunk_size,
+                "ci_confidence": ci_confidence,
+                "prescreen": prescreen,
+                "shard": shard,
+                "memory": memory_mode}
+    variants = make_variants(execution, sim_options, ordering_pairs)
+    if one_pass:
+        stages = [variants]
+    else:
+        stages = [[v] for v in variants]
     stn_pairs = []
     # Collect the STNs from all the passed in paths
     # Make sure we keep the path around though, and keep them in the pair.
@@ -117,93 +277,198 @@ def across_paths(stn_paths, execution, threads, sim_count, sim_options,
 
     # We must separate these for loops because MIT stns can hold several
     # instances in a single file.
-    for i, pair in enumerate(stn_pairs):
-        if i < start_index:
-            continue
-        if stop_index is not None:
-            if i >= stop_index:
-                break
-        if ordering_pairs is not None:
-            for j, execution_setting in enumerate(ordering_pairs):
-                sim_option_instance = sim_options.copy()
-                sim_option_instance["ar_threshold"] = execution_setting[0]
-                sim_option_instance["si_threshold"] = execution_setting[1]
-                results_dict = _run_stage(pair, execution, sim_count, threads,
-                                      random_seed, sim_option_instance)
-                if live_updates:
-                    _print_results(results_dict,
-                                   j + len(ordering_pairs)*i + 1,
-                                   len(stn_pairs)*len(ordering_pairs))
-                
-                if output is not None:
-                    sim2csv.save_csv_row(results_dict, output)
-    
-        
-        else:
-            results_dict = _run_stage(pair, execution, sim_count, threads,
-                                      random_seed, sim_options)
-            if live_updates:
-                _print_results(results_dict, i + 1, len(stn_pairs))
-            
-            if output is not None:
-                sim2csv.save_csv_row(results_dict, output)
+    selected = [i for i in range(len(stn_pairs)) if i >= start_index
+                and (stop_index is None or i < stop_index)]
+
+    # Work out which stages are left to run, and which samples of them were
+    # already checkpointed.
+    rows_done = 0
+    work = []
+    sources = {}
+    for i in selected:
+        instance = [p[0] for p in stn_pairs[:i]].count(stn_pairs[i][0])
+        sources[i] = (os.path.abspath(stn_pairs[i][0]), instance)
+        for s, stage_variants in enumerate(stages):
+            checkpoint = None
+            if journal is not None:
+                key = libjournal.stage_key(stn_pairs[i][0], instance,
+                                           stage_variants, random_seed,
+                                           sim_count)
+                if journal.is_finished(key):
+                    rows_done += len(stage_variants)
+                    continue
+                checkpoint = journal.checkpoint(key)
+                if merge and len(checkpoint.samples) < sim_count:
+                    raise ValueError("Journal is missing {} samples of stage "
+                                     "{}".format(sim_count
+                                                 - len(checkpoint.samples),
+                                                 key))
+            work.append((i, s, checkpoint))
+    if journal is not None:
+        pr.verbose("{} stages left to run".format(len(work)))
+    # Every worker receives a handle to each STN with stages left to run
+    # once, when the pool starts, instead of the STN once per task.
+    stns = {i: stn_pairs[i][1] for i in sorted({w[0] for w in work})}
+
+    tracing = None
+    if trace is not None:
+        tracing = {"dir": os.path.abspath(os.path.expanduser(trace)),
+                   "all": trace_all, "mitparse": mitparse,
+                   "sources": sources}
+        os.makedirs(tracing["dir"], exist_ok=True)
+    timelines = None
+    if timeline is not None:
+        timelines = {"dir": os.path.abspath(os.path.expanduser(timeline)),
+                     "samples": frozenset(timeline_samples),
+                     "sources": sources}
+        os.makedirs(timelines["dir"], exist_ok=True)
+    reporter = None
+    if live_updates:
+        reporter = libprogress.ProgressReporter(
+            workers=None if serve is not None else threads)
+    sink = None
+    records = None
+    if shard is None:
+        if output is not None:
+            sink = resultsink.open_sink(output)
+        if sample_records is not None:
+            records = samplerecords.SampleRecords(sample_records)
+    if merge:
+        # Every sample is in the journal already, so no task is run, and
+        # neither workers nor the STNs' initial guides are needed.
+        stn_pool = workerpool.WorkerPool({})
+    else:
+        stn_pool = libstages.stn_pool(stns, threads, serve=serve,
+                                      authkey=authkey, trace=tracing,
+                                      timeline=timelines,
+                                      profile_tasks=profile_tasks,
+                                      memory_mode=memory_mode)
+    try:
+        with stn_pool as pool:
+            if ci_tolerance is None:
+                finished = libstages.schedule_stages(
+                    stn_pairs, work, stages, sim_count, threads, random_seed,
+                    sampling, pool, progress=reporter)
+            else:
+                finished = libstages.sequential_stages(
+                    stn_pairs, work, stages, sim_count, threads, random_seed,
+                    sampling, pool, progress=reporter)
+            for checkpoint, results, responses in finished:
+                if shard is not None:
+                    # The rows are written when the shards are merged.
+                    continue
+                for results_dict in results:
+                    rows_done += 1
+                    if live_updates:
+                        reporter.clear()
+                        _print_results(results_dict, rows_done,
+                                       len(stn_pairs)*len(variants))
+                if records is not None:
+                    records.append(_record_stage(results), responses)
+                stage = None if checkpoint is None else checkpoint.stage
+                if sink is not None:
+                    sink.write(results, _sample_rows(results, responses),
+                               token=stage)
+                    # A stage is only finished once its rows are written.
+                    _finish_stages(journal, sink.written())
+                elif stage is not None:
+                    journal.finish_stage(stage)
+    finally:
+        if reporter is not None:
+            reporter.close()
+        if records is not None:
+            records.close()
+        if sink is not None:
+            sink.close()
+            _finish_stages(journal, sink.written())
+
+
+def _finish_stages(journal, stages):
+    """Record stages whose results were written out in the journal."""
+    for stage in stages:
+        if stage is not None:
+            journal.finish_stage(stage)
+
+
+def make_variants(execution, sim_options, ordering_pairs=None) -> list:
+    """Build the list of (execution_strat, sim_options) variants to run.
 
+    Args:
+        execution (str or list): Execution strategy, a comma separated string
+            of strategies, or a list of strategies.
+        sim_options (dict): Dictionary of simulation options to use.
+        ordering_pairs (list, optional): List of tuples of AR and SC settings.
+            Every strategy is run once for each tuple.
 
-def _run_stage(pair, execution, sim_count, threads, random_seed, sim_options):
-    """Run a single stage of the multiple simulation set up."""
+    Returns:
+        A list of (execution_strat, sim_options) tuples.
 
-    path, stn = pair
-    
-    start_time = time.time()
-    response_dict = multiple_simulations(stn, execution, sim_count,
-                                         threads=threads,
-                                         random_seed=random_seed,
-                                         sim_options=sim_options)
-    runtime = time.time() - start_time
-
-    results = response_dict["sample_results"]
-    reschedules = response_dict["reschedules"]
-    sent_schedules = response_dict["sent_schedules"]
-
-    robustness = results.count(True)/len(results)
-    vert_count = len(stn.verts)
-    max_verts_on_agent = max_agent_verts(stn)
-    mean_verts_on_agent = (len(stn.verts) - 1)/len(stn.agents)
-    cont_dens = len(stn.contingent_edges)/len(stn.edges)
-    synchrony = len(stn.interagent_edges)/len(stn.edges)
-
-    total_sd = 0
-    for e in stn.contingent_edges.values():
-        try:
-            total_sd += e.sigma
-        except ValueError:
+    Examples:
+        >>> make_variants("early,srea", {"ar_threshold": 0.0})
+        [('early', {'ar_threshold': 0.0}), ('srea', {'ar_threshold': 0.0})]
+    """
+    if isinstance(execution, str):
+        executions = [e.strip() for e in execution.split(",") if e.strip()]
+    else:
+        executions = list(execution)
+    variants = []
+    for execution_strat in executions:
+        if ordering_pairs is None:
+            variants.append((execution_strat, sim_options))
             continue
-    sd_avg = total_sd / len(stn.contingent_edges)
-
-    results_dict = {}
-    results_dict["execution"] = execution
-    results_dict["robustness"] = robustness
-    results_dict["threads"] = threads
-    results_dict["random_seed"] = random_seed
-    results_dict["runtime"] = runtime
-    results_dict["samples"] = sim_count
-    results_dict["timestamp"] = time.time()
-    results_dict["stn_path"] = path
-    results_dict["stn_name"] = stn.name
-    results_dict["ar_threshold"] = sim_options["ar_threshold"]
-    results_dict["si_threshold"] = sim_options["si_threshold"]
-    results_dict["synchronous_density"] = synchrony
-    results_dict["sd_avg"] = sd_avg
-    results_dict["vert_count"] = vert_count
-    results_dict["agents"] = len(stn.agents)
-    results_dict["mean_verts_agent"] = mean_verts_on_agent
-    results_dict["max_verts_agent"] = max_verts_on_agent
-    results_dict["contingent_density"] = cont_dens
-    results_dict["reschedule_freq"] = sum(reschedules)/len(reschedules)
-    results_dict["send_freq"] = sum(sent_schedules)/len(sent_schedules)
-
-    return results_dict
+        for execution_setting in ordering_pairs:
+            sim_option_instance = sim_options.copy()
+            sim_option_instance["ar_threshold"] = execution_setting[0]
+            sim_option_instance["si_threshold"] = execution_setting[1]
+            variants.append((execution_strat, sim_option_instance))
+    return variants
+
 
+def _record_stage(results) -> dict:
+    """Describe a finished stage for its sample records. The variant field
+    of each record indexes the stage's "variants" list.
+    """
+    stage = {k: results[0][k] for k in ("stn_path", "stn_name",
+                                        "random_seed", "timestamp")}
+    stage["variants"] = [[r["execution"], r["ar_threshold"],
+                          r["si_threshold"]] for r in results]
+    return stage
+
+
+def _sample_rows(results, responses) -> list:
+    """Build the detail rows of every sample of a finished stage.
+
+    Args:
+        results (list): The results dictionaries of the stage, one per
+            variant (see _stage_results()).
+        responses (list): The response dictionaries they were built from.
+
+    Returns:
+        A list of dictionaries, one per variant and sample. Each holds the
+        keys that identify its stage row, the index of the sample, and how
+        the variant did on it.
+    """
+    rows = []
+    for results_dict, response_dict in zip(results, responses):
+        stage = {k: results_dict[k] for k in SAMPLE_ROW_KEYS}
+        for index in range(len(response_dict["sample_results"])):
+            row = dict(stage)
+            row["sample"] = index
+            row["robust"] = response_dict["sample_results"][index]
+            row["reschedules"] = response_dict["reschedules"][index]
+            row["sent_schedules"] = response_dict["sent_schedules"][index]
+            row["sim_time"] = response_dict["sim_times"][index]
+            row["skipped_propagations"] = (
+                response_dict["skipped_propagations"][index])
+            row["prescreened"] = response_dict["prescreened"][index]
+            row["seed"] = response_dict["seeds"][index]
+            row["failure_step"] = response_dict["failure_steps"][index]
+            row["failure_vertex"] = response_dict["failure_vertices"][index]
+            counts = counters.totals(response_dict["counters"][index])
+            for name in counters.COUNTERS:
+                row[name] = counts[name][0]
+            rows.append(row)
+    return rows
 
 
 def _print_results(results_dict, i, stn_count):
@@ -218,8 +483,14 @@ def _print_results(results_dict, i, stn_count):
     print("    AR Threshold: {}".format(results_dict["ar_threshold"]))
     print("    SI Threshold: {}".format(results_dict["si_threshold"]))
     print("    Robustness: {}".format(results_dict["robustness"]))
+    print("    Robustness CI: [{}, {}]".format(
+        results_dict["robustness_ci_low"], results_dict["robustness_ci_high"]))
+    print("    Paired Delta vs {}: {} (SE {})".format(
+        results_dict["paired_baseline"], results_dict["paired_delta"],
+        results_dict["paired_delta_se"]))
     print("    Seed: {}".format(results_dict["random_seed"]))
     print("    Runtime: {}".format(results_dict["runtime"]))
+    print("    Elapsed: {}".format(results_dict["elapsed"]))
     print("    Vert Count: {}".format(results_dict["vert_count"]))
     print("    Agents: {}".format(results_dict["agents"]))
     print("    Max verts on Agent: {}".format(results_dict["max_verts_agent"]))
@@ -228,15 +499,62 @@ def _print_results(results_dict, i, stn_count):
     print("    Cont Edge Dens: {}".format(results_dict["contingent_density"]))
     print("    Cont SD Avg: {}".format(results_dict["sd_avg"]))
     print("    Sync Density: {}".format(results_dict["synchronous_density"]))
+    if results_dict["prescreened_fraction"] > 0.0:
+        print("    Pre-screened: {}".format(
+            results_dict["prescreened_fraction"]))
     print("    Resc Freq: {}".format(results_dict["reschedule_freq"]))
     print("    Send Freq: {}".format(results_dict["send_freq"]))
+    if results_dict["lazy_propagation"]:
+        print("    Skipped Propagations Freq: {}".format(
+            results_dict["skipped_propagation_freq"]))
     print("    Total Progress: {}/{}".format(i, stn_count))
     print("-"*79)
 
 
+def sequential_simulations(starting_stn, execution_strat, cap, tolerance,
+                           chunk_size=DEFAULT_CHUNK_SIZE, threads=1,
+                           random_seed=None, sim_options={},
+                           ci_confidence=confidence.DEFAULT_CONFIDENCE,
+                           prescreen=None):
+    """Run simulations in chunks until the robustness estimate is tight.
+
+    Sampling stops when the Wilson interval half-width of the robustness is
+    at most tolerance, or when cap samples have been run. Sample i always
+    uses the same seed as sample i of a fixed-count run with the same
+    random_seed.
+
+    Args:
+        starting_stn (STN): STN to simulate on.
+        execution_strat (str): Execution strategy to simulate with.
+        cap (int): Maximum number of simulations to run.
+        tolerance (float): Target half-width of the robustness interval.
+        chunk_size (int, optional): Number of simulations per chunk.
+        threads (int, optional): Number of threads to use.
+        random_seed (int, optional): The random seed to use.
+        sim_options (dict): A set of options for the simulator.
+        ci_confidence (float, optional): Confidence level of the interval.
+        prescreen (str, optional): See multiple_simulations().
+
+    Returns:
+        A response dictionary in the same format as multiple_simulations.
+
+    Raises:
+        ValueError: If chunk_size is less than 1.
+    """
+    return sequential_variant_simulations(starting_stn,
+                                          [(execution_strat, sim_options)],
+                                          cap, tolerance,
+                                          chunk_size=chunk_size,
+                                          threads=threads,
+                                          random_seed=random_seed,
+                                          ci_confidence=ci_confidence,
+                                          prescreen=prescreen)[0]
+
+
 def multiple_simulations(starting_stn, execution_strat,
                          count, threads=1, random_seed=None,
-                         sim_options={}):
+                         sim_options={}, first_sample=0, prescreen=None,
+                         report=None, progress=None):
     """Run multiple simulations on a single STN.
 
     Args:
@@ -248,100 +566,89 @@ def multiple_simulations(starting_stn, execution_strat,
             seeds from this instance. None indicates a random random-seed.
         sim_options (dict): A set of options (usually thresholds) for the
             simulator.
+        first_sample (int, optional): Index of the first sample to run.
+            Seeds are derived as if samples 0 to first_sample - 1 had already
+            been run, so chunked runs reproduce a single run.
+        prescreen (str, optional): "sample", "batch" or None. See
+            libheat.stages.multiple_variant_simulations().
+        report (dict, optional): Report to add the profiling totals and
+            memory use of every task to. See
+            libheat.stages.multiple_variant_simulations().
+        progress (function, optional): Called with the answers of every
+            sample as soon as it finishes, e.g. from
+            ProgressReporter.add_stage() (see libheat.progress).
 
     Returns:
-        A response dictionary with three entries in it.
+        A response dictionary with ten entries in it. See
+        libheat.stages.multiple_variant_simulations().
+    """
+    return multiple_variant_simulations(starting_stn,
+                                        [(execution_strat, sim_options)],
+                                        count,
+                                        threads=threads,
+                                        random_seed=random_seed,
+                                        first_sample=first_sample,
+                                        prescreen=prescreen,
+                                        report=report,
+                                        progress=progress)[0]
 
-    The response dictionary contains the following keys:
 
-    * "sample_results": A list of bools of how the simulations went.
-    * "reschedules": A list of ints counting how many reschedules a sim took.
-    * "sent_schedules": A list of ints counting how many schedules were sent
-      for each sim.
-    """
-    # Each thread needs its own simulator, otherwise the progress of one thread
-    # can overwrite the progress of another
-    print("Random seed is: {}".format(random_seed))
-    if random_seed is not None:
-        seed_gen = np.random.RandomState(random_seed)
-        seeds = [seed_gen.randint(MAX_SEED) for i in range(count)]
-        tasks = _make_simulator_tasks(seeds, starting_stn,
-                                      execution_strat, sim_options,
-                                      count)
-    else:
-        tasks = _make_simulator_tasks(None, starting_stn,
-                                      execution_strat, sim_options,
-                                      count)
-
-    if threads > 1:
-        print("Using multithreading; threads = {}".format(threads))
-        try_count = 0
-        while try_count <= 3:
-            try_count += 1
-            response = None
-            try:
-                with multiprocessing.Pool(threads) as pool:
-                    response = pool.map(_multisim_thread_helper, tasks)
-                break
-            except BlockingIOError:
-                pr.warning("Got BlockingIOError; attempting to remake threads")
-                pr.warning("Retrying in 3 seconds...")
-                time.sleep(3.0)
-                pr.warning("Retrying now")
-    else:
-        print("Using single thread; threads = {}".format(threads))
-        response = list(map(_multisim_thread_helper, tasks))
-
-    # Unzip each of the response values.
-    sample_results = [r[0] for r in response]
-    reschedules = [r[1] for r in response]
-    sent_schedules = [r[2] for r in response]
-    # Package the response into a nice dict to send back.
-    response_dict = {"sample_results": sample_results, "reschedules":
-                     reschedules, "sent_schedules": sent_schedules}
-    return response_dict
-
-
-def _make_simulator_tasks(seeds, stn, execution_strat, sim_options, count):
-    """Helper function to generate a list of tasks for the thread pool"""
-    if seeds is not None:
-        if execution_strat == "da":
-            tasks = [(DecoupledSimulator(seeds[i]), stn,
-                      execution_strat,
-                      sim_options, i)
-                     for i in range(count)]
-        else:
-            tasks = [(Simulator(seeds[i]), stn, execution_strat,
-                      sim_options, i)
-                     for i in range(count)]
-    else:
-        if execution_strat == "da":
-            tasks = [(DecoupledSimulator(None), stn,
-                      execution_strat,
-                      sim_options, i)
-                     for i in range(count)]
-        else:
-            tasks = [(Simulator(None), stn, execution_strat,
-                      sim_options, i)
-                     for i in range(count)]
-    return tasks
+def replay(trace_path) -> bool:
+    """Re-run the single simulation recorded in a trace.
 
+    The simulation runs in this process, with the most verbose printing and
+    under cProfile, using the recorded samples. The replayed dispatches are
+    compared to the recorded ones.
 
-def _multisim_thread_helper(tup):
-    """ Helper function to allow passing multiple arguments to the simulator.
+    Args:
+        trace_path (str): Path of a trace written with --trace.
+
+    Returns:
+        Whether the replay took exactly the recorded path.
     """
-    simulator = tup[0]
-    if tup[2] == "da":
-        ans = simulator.simulate(tup[1], sim_options=tup[3],
-                                 decouple_type=DEFAULT_DECOUPLE)
+    meta, samples, recorded = libtrace.load(trace_path)
+    if meta["mitparse"]:
+        stn = mitparser.mit2stn(meta["stn_path"], add_z=True,
+                                connect_origin=True)[meta["instance"]]
     else:
-        ans = simulator.simulate(tup[1], tup[2], sim_options=tup[3])
-    reschedule_count = simulator.num_reschedules
-    sent_count = simulator.num_sent_schedules
-    pr.verbose("Task: {}".format(tup[4]))
-    pr.verbose("Assigned Times: {}".format(simulator.get_assigned_times()))
-    pr.verbose("Successful?: {}".format(ans))
-    return ans, reschedule_count, sent_count
+        stn = load_stn_from_json_file(meta["stn_path"])["stn"]
+    if draw_samples(stn, np.random.RandomState(meta["seed"])) != samples:
+        pr.warning("The seed no longer draws the recorded samples; the STN "
+                   "may have changed. Replaying the recorded samples.")
+    execution_strat = meta["execution"]
+    sim_options = meta["sim_options"]
+    initial_guide = None
+    if meta["initial_guide"]:
+        initial_guide = libstages.initial_guide(
+            stn, [(execution_strat, sim_options)])
+
+    print("Replaying {} on sample {} of {} (instance {})".format(
+        execution_strat, meta["seed"], meta["stn_path"], meta["instance"]))
+    pr.set_verbosity(2)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    simulator, ans = libstages.simulate_one(stn, execution_strat,
+                                            sim_options, meta["seed"],
+                                            samples, initial_guide,
+                                            tracing=True)
+    profiler.disable()
+    pr.set_verbosity(0)
+
+    replayed = np.array(simulator.trace, dtype=libtrace.DISPATCH_DTYPE)
+    difference = libtrace.first_difference(recorded, replayed)
+    print("Recorded: success {}, failure step {}, failure vertex {}".format(
+        meta["success"], meta["failure_step"], meta["failure_vertex"]))
+    print("Replayed: success {}, failure step {}, failure vertex {}".format(
+        ans, simulator.failure_step, simulator.failure_vertex))
+    if difference is None:
+        print("Replay matches all {} recorded dispatches".format(
+            len(recorded)))
+    else:
+        print("Replay differs from the recording at dispatch {}".format(
+            difference))
+    pstats.Stats(profiler).sort_stats("cumulative").print_stats(
+        REPLAY_PROFILE_LINES)
+    return difference is None and ans == meta["success"]
 
 
 def folder_harvest(folder_paths: list, recurse=True, only_json=True) -> list:
@@ -393,34 +700,6 @@ def folder_harvest(folder_paths: list, recurse=True, only_json=True) -> list:
     return stn_files
 
 
-def max_agent_verts(stn):
-    """Returns the maximum amount of vertices belonging to any one agent"""
-    return max([get_agent_verts(stn, a) for a in stn.agents])
-
-
-def mean_agent_verts(stn):
-    counts = [get_agent_verts(stn, a) for a in stn.agents]
-    return sum(counts)/len(counts)
-
-
-def get_agent_verts(stn, agent):
-    """Returns the number of vertices owned by the provided agent in the given
-        STN.
-
-    Args:
-        stn (STN): STN to use.
-        agent (int): Agent ID to get verts of.
-
-    Returns:
-        The number of vertices owned by the provided agent.
-    """
-    count = 0
-    for vert in stn.verts.values():
-        if vert.ownerID == agent:
-            count += 1
-    return count
-
-
 def parse_args():
     """Parse the program arguments."""
     parser = argparse.ArgumentParser(description="")
@@ -433,9 +712,13 @@ def parse_args():
                         " is 100")
     parser.add_argument("-e", "--execution", type=str, default="early",
                         help="Set the execution strategy to use. Default is"
-                        " 'early'")
+                        " 'early'. Several strategies may be given as a "
+                        "comma separated list, e.g. 'early,srea,arsi'.")
     parser.add_argument("-o", "--output", type=str,
-                        help="Write the simulation results to a CSV")
+                        help="Write the simulation results to this path. A "
+                        ".db or .sqlite path writes a SQLite database, a "
+                        ".parquet path a directory of Parquet files, and "
+                        "any other path CSV files.")
     parser.add_argument("--ar-threshold", type=float, default=0.0,
                         help="AR Threshold to use for AR and ARSI")
     parser.add_argument("--si-threshold", type=float, default=0.0,
@@ -459,13 +742,176 @@ def parse_args():
                         "the entire data set. Not thoroughly tested, be "
                         "warned.")
     parser.add_argument("--no-live", action="store_true",
-                        help="Turn off live update printing")
+                        help="Turn off live update printing: the results "
+                        "of every stage, and the progress line with the "
+                        "samples per second, ETA, worker utilization and "
+                        "running robustness.")
+    parser.add_argument("--journal", type=str,
+                        help="Journal file to record finished samples and "
+                        "stages in. Default is the output path with "
+                        "'.journal' appended.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Resume an interrupted run from its journal, "
+                        "skipping finished stages and samples. Uses the "
+                        "journal's random seed unless --seed is given.")
+    parser.add_argument("--one-pass", action="store_true",
+                        help="Run every strategy and ordering pair of an STN "
+                        "in a single pass, sharing the contingent samples, "
+                        "the loaded STN and the initial SREA guide.")
+    parser.add_argument("--lazy-propagation", action="store_true",
+                        help="Only fully propagate constraints when a "
+                        "contingent timepoint executes or a guide needs it. "
+                        "Results are unchanged.")
+    parser.add_argument("--prescreen", choices=["sample", "batch"],
+                        help="Count samples whose STN is inconsistent with "
+                        "the sampled durations as failures without "
+                        "simulating them. 'sample' checks each sample in its "
+                        "task, 'batch' checks all samples at once with numpy.")
+    parser.add_argument("--fast-forward", action="store_true",
+                        help="Once the last contingent timepoint executes, "
+                        "dispatch the remaining timepoints in one pass and "
+                        "check consistency once.")
+    parser.add_argument("--ci-tolerance", type=float,
+                        help="Stop sampling an STN once the robustness "
+                        "confidence interval half-width is at most this "
+                        "value. SAMPLES then becomes the sample cap.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Samples run between stopping checks when "
+                        "using --ci-tolerance. Default is {}."
+                        .format(DEFAULT_CHUNK_SIZE))
+    parser.add_argument("--confidence", type=float,
+                        default=confidence.DEFAULT_CONFIDENCE,
+                        help="Confidence level of the robustness interval. "
+                        "Default is {}.".format(confidence.DEFAULT_CONFIDENCE))
     parser.add_argument("stns", help="The STN JSON files to run on",
-                        nargs="+")
-    return parser.parse_args()
+                        nargs="*")
+    parser.add_argument("--shard", type=parse_shard,
+                        help="Only run the samples of shard K of N, given as "
+                        "'K/N' with 0 <= K < N, and record them in the "
+                        "journal. Every shard must be given the same --seed. "
+                        "Combine the shards with --merge.")
+    parser.add_argument("--merge", action="append", metavar="JOURNAL",
+                        help="Journal of a shard to merge. Give once for "
+                        "each shard, with the same options as the shard "
+                        "runs, to write the rows of the full run.")
+    parser.add_argument("--sample-records", type=str, metavar="PATH",
+                        help="Append a compact record of every sample (seed, "
+                        "success, reschedules, sends, failure step and "
+                        "vertex) to this .npy file.")
+    parser.add_argument("--trace", type=str, metavar="DIR",
+                        help="Write a compact execution trace of every "
+                        "failed simulation to this directory, to be re-run "
+                        "with --replay.")
+    parser.add_argument("--trace-all", action="store_true",
+                        help="With --trace, trace every simulation, not only "
+                        "the failed ones.")
+    parser.add_argument("--replay", type=str, metavar="TRACE",
+                        help="Re-run the single simulation recorded in a "
+                        "trace, verbosely and under cProfile, and check that "
+                        "it takes the recorded path. No STNs are needed.")
+    parser.add_argument("--timeline", type=str, metavar="DIR",
+                        help="Write a Chrome trace event timeline (for "
+                        "chrome://tracing or Perfetto) of the selected "
+                        "samples of every stage to this directory.")
+    parser.add_argument("--timeline-samples", type=parse_samples,
+                        default=(0,), metavar="LIST",
+                        help="Comma separated indices of the samples to write "
+                        "timelines of. Default is 0, the first sample.")
+    parser.add_argument("--profile", type=int, default=0, metavar="N",
+                        help="Run the first N tasks of each strategy in every "
+                        "worker under cProfile. Prints the hotspots of each "
+                        "strategy, and writes the merged statistics to "
+                        "--profile-output.")
+    parser.add_argument("--profile-output", type=str,
+                        default="profile.pstats", metavar="PATH",
+                        help="Where --profile writes the merged .pstats of "
+                        "all strategies. Each strategy's is written next to "
+                        "it, e.g. profile.drea.pstats. Default "
+                        "profile.pstats.")
+    parser.add_argument("--profile-spans", action="store_true",
+                        help="Time the main steps of every simulation, in "
+                        "every worker. Adds profile_* columns to the output "
+                        "and prints the nested totals at the end.")
+    parser.add_argument("--memory", choices=memory.MODES, default=None,
+                        help="Track the memory use of the workers. 'rss' adds "
+                        "the peak RSS of every worker per stage to the "
+                        "output; 'tracemalloc' also traces allocations, for "
+                        "the bytes allocated per dispatch step and the top "
+                        "allocation sites, at a large cost in speed.")
+    parser.add_argument("--serve", type=str, metavar="ADDRESS",
+                        help="Serve the sample tasks to workers started with "
+                        "--worker, on 'host:port' or a Unix socket path, "
+                        "instead of running them here.")
+    parser.add_argument("--worker", type=str, metavar="ADDRESS",
+                        help="Run -t worker processes pulling tasks from the "
+                        "coordinator at ADDRESS, until it has no more work. "
+                        "No STNs are needed.")
+    parser.add_argument("--authkey", type=str, default=None,
+                        help="Secret key shared by the coordinator and its "
+                        "workers. Needed with --worker, and with --serve on "
+                        "an address other machines can reach. Without it, "
+                        "--serve makes a random key and prints it.")
+    args = parser.parse_args()
+    if not args.stns and args.worker is None and args.replay is None:
+        parser.error("the following arguments are required: stns")
+    if args.worker is not None and args.authkey is None:
+        parser.error("--worker needs the --authkey of the coordinator")
+    if (args.serve is not None and args.authkey is None
+            and not coordinator.is_local(args.serve)):
+        parser.error("--serve on an address other machines can reach needs "
+                     "an --authkey")
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    has_journal = args.journal is not None or args.output is not None
+    if (args.resume or args.shard or args.merge) and not has_journal:
+        parser.error("--resume, --shard and --merge need a journal; set "
+                     "--journal or --output")
+    if args.shard is not None and args.seed is None and not args.resume:
+        parser.error("--shard needs a --seed, the same for every shard, so "
+                     "that the shards can be merged")
+    if args.shard is not None and args.merge:
+        parser.error("--shard and --merge cannot be used together")
+    if (args.shard or args.merge) and args.ci_tolerance is not None:
+        parser.error("--ci-tolerance cannot be sharded, since it decides "
+                     "the number of samples from all of them")
+    return args
+
+
+def parse_shard(arg) -> tuple:
+    """Parse a --shard argument of the form 'K/N'.
+
+    Returns:
+        A (K, N) tuple of ints.
+
+    Examples:
+        >>> parse_shard("1/4")
+        (1, 4)
+    """
+    try:
+        k, n = (int(x) for x in arg.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("shard must be of the form 'K/N'")
+    if not 0 <= k < n:
+        raise argparse.ArgumentTypeError("shard K/N needs 0 <= K < N")
+    return k, n
+
+
+def parse_samples(arg) -> tuple:
+    """Parse a comma separated list of sample indices.
+
+    Examples:
+        >>> parse_samples("0,4, 9")
+        (0, 4, 9)
+    """
+    try:
+        samples = tuple(int(s) for s in arg.split(",") if s.strip())
+    except ValueError:
+        raise argparse.ArgumentTypeError("samples must be integers")
+    if not samples or min(samples) < 0:
+        raise argparse.ArgumentTypeError(
+            "samples must be non-negative integers")
+    return samples
 
 
 if __name__ == "__main__":
     main()
-    print("Time spent per function:")
-    print(functiontimer.get_times())
@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+
+from libheat import benchmark
+import benchmarks.stntools
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_measure(self):
+        calls = []
+        result = benchmark.measure(lambda s: calls.append(s),
+                                   prepare=lambda: 1, repeat=3,
+                                   min_time=0.001)
+        self.assertEqual(result["rounds"], 3)
+        self.assertLessEqual(result["min_s"], result["median_s"])
+        self.assertEqual(set(calls), {1})
+
+    def test_compare_flags_regressions(self):
+        baseline = {"a": {"median_s": 1.0}, "b": {"median_s": 1.0}}
+        results = {"a": {"median_s": 1.05}, "b": {"median_s": 1.5},
+                   "c": {"median_s": 9.0}}
+        comparison = benchmark.compare(results, baseline, threshold=10)
+        self.assertEqual([(c["key"], c["regressed"]) for c in comparison],
+                         [("a", False), ("b", True)])
+        self.assertAlmostEqual(comparison[1]["change"], 50.0)
+
+    def test_stntools_cases_save_and_load(self):
+        self.assertIn("stn.floyd_warshall", benchmark.CASES)
+        results = benchmark.run(pattern="st*", max_size=10, repeat=1,
+                                min_time=0.0)
+        self.assertIn("stntools.mit2stn[10]", results)
+        self.assertNotIn("stn.copy[50]", results)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "baseline.json")
+            benchmark.save(path, results)
+            self.assertEqual(benchmark.load(path), results)
+        self.assertIn("stn.copy[10]", benchmark.report(results))
+
+    def test_fixture_sizes(self):
+        stn = benchmarks.stntools.make_stn(50)
+        self.assertEqual(len(stn.verts), 51)
+        self.assertEqual(len(stn.agents), benchmarks.stntools.AGENTS)
+        self.assertTrue(stn.contingent_edges)
+        self.assertTrue(stn.interagent_edges)
+
+
+if __name__ == "__main__":
+    unittest.main()
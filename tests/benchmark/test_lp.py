@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+
+from benchmarks import lp
+from benchmarks import throughput
+
+
+class TestLp(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.tmp.name, "lps.jsonl")
+        stns = [s for s in throughput.instances(synthetic=())
+                if s[0] == "two_agent_stretch.json"]
+        cls.counts = lp.capture(cls.path, stns, strategies=("drea",),
+                                samples=2, seed=3, limit=5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_capture(self):
+        self.assertEqual(self.counts, {"srea": 5, "interagent_flex": 5})
+
+    def test_backends(self):
+        found = lp.backends()
+        self.assertIn("pulp.PULP_CBC_CMD", found)
+        self.assertTrue(any(name.startswith("linprog.") for name in found))
+
+    def test_run(self):
+        results = lp.run(self.path, pattern="lp.pulp.PULP_CBC_CMD")
+        self.assertEqual(set(results),
+                         {"lp.pulp.PULP_CBC_CMD[interagent_flex]",
+                          "lp.pulp.PULP_CBC_CMD[srea]"})
+        for result in results.values():
+            self.assertEqual(result["instances"], 5)
+            self.assertEqual(result["status_agreement"], 1.0)
+            self.assertEqual(result["objective_agreement"], 1.0)
+            self.assertLessEqual(result["min_s"], result["median_s"])
+            self.assertLessEqual(result["p90_s"], result["max_s"])
+            self.assertLess(0, result["build_fraction"])
+            self.assertLess(result["build_fraction"], 1)
+        self.assertIn("interagent_flex", lp.report(results))
+
+    def test_agrees(self):
+        self.assertTrue(lp.agrees(100.0, 100.0001))
+        self.assertFalse(lp.agrees(100.0, 100.01))
+        self.assertTrue(lp.agrees(None, None))
+        self.assertFalse(lp.agrees(None, 0.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from benchmarks import throughput
+
+
+class TestThroughput(unittest.TestCase):
+
+    def test_instances(self):
+        names = [name for name, stn
+                 in throughput.instances(synthetic=((2, 5),))]
+        self.assertIn("stp_picard.json", names)
+        self.assertIn("two_agent_stretch.json", names)
+        self.assertEqual(names[-1], "synthetic-2x5")
+
+    def test_measure(self):
+        instances = dict(throughput.instances(synthetic=()))
+        stn = instances["two_agent_stretch.json"]
+        result = throughput.measure(stn, "drea", samples=3)
+        self.assertEqual(result["samples"], 3)
+        self.assertGreater(result["samples_per_s"], 0)
+        self.assertGreater(result["lp_solves_per_sample"], 0)
+        self.assertLessEqual(result["min_s"], result["median_s"])
+        self.assertEqual(set(result["phases"]), set(throughput.PHASES))
+        self.assertGreater(result["phases"]["propagation & check"], 0)
+        self.assertLessEqual(result["phases"]["srea"],
+                             result["phases"]["get_guide"])
+        again = throughput.measure(stn, "drea", samples=3)
+        self.assertEqual(again["robustness"], result["robustness"])
+        self.assertEqual(again["lp_solves_per_sample"],
+                         result["lp_solves_per_sample"])
+
+    def test_run_filters_strategies(self):
+        results = throughput.run(pattern="throughput.early", samples=2,
+                                 max_size=0)
+        self.assertEqual({r["name"] for r in results.values()},
+                         {"throughput.early"})
+        self.assertIn("throughput.early[two_contingent.json]", results)
+        self.assertIn("two_contingent.json", throughput.report(results))
+
+
+if __name__ == "__main__":
+    unittest.main()
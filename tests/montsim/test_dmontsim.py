@@ -0,0 +1,29 @@
+import unittest
+
+import libheat.stntools as stntools
+from libheat.dmontsim import DecoupledSimulator
+
+
+STN1 = "test_data/trailing_tasks.json"
+
+
+class _RejectingSimulator(DecoupledSimulator):
+    """Finds the full assignment to be no solution."""
+
+    def propagate_constraints(self, stn_to_prop):
+        if stn_to_prop is self.assignment_stn:
+            return False
+        return super().propagate_constraints(stn_to_prop)
+
+
+class TestDecoupledSimulator(unittest.TestCase):
+
+    def test_false_positive_is_a_failure(self):
+        stn = stntools.load_stn_from_json_file(STN1)["stn"]
+        sim = _RejectingSimulator(2)
+        self.assertFalse(sim.simulate(stn, decouple_type="srea"))
+        self.assertEqual(sim.failure_step, sim.num_steps)
+
+
+if __name__ == "__main__":
+    unittest.main()
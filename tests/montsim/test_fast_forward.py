@@ -0,0 +1,58 @@
+import unittest
+
+import libheat.stntools as stntools
+from libheat.montsim import Simulator
+from libheat.dmontsim import DecoupledSimulator
+
+
+STN1 = "test_data/trailing_tasks.json"
+OPTIONS = {"ar_threshold": 0.3, "si_threshold": 0.05}
+
+
+class TestFastForward(unittest.TestCase):
+
+    def test_matches_step_by_step(self):
+        stn = stntools.load_stn_from_json_file(STN1)["stn"]
+        forwarded = 0
+        for strat in ("early", "drea", "arsi"):
+            for seed in (2, 4, 5):
+                for lazy in (False, True):
+                    options = dict(OPTIONS, lazy_propagation=lazy)
+                    stepped = Simulator(seed)
+                    ans = stepped.simulate(stn, strat, sim_options=options)
+                    sim = Simulator(seed)
+                    options["fast_forward"] = True
+                    self.assertEqual(sim.simulate(stn, strat,
+                                                  sim_options=options), ans)
+                    self.assertEqual(sim.get_assigned_times(),
+                                     stepped.get_assigned_times())
+                    self.assertEqual(sim.num_reschedules,
+                                     stepped.num_reschedules)
+                    forwarded += sim.num_fast_forwarded
+        self.assertGreater(forwarded, 0)
+
+    def test_decoupled_matches_step_by_step(self):
+        stn = stntools.load_stn_from_json_file(STN1)["stn"]
+        forwarded = 0
+        for seed in (2, 5):
+            stepped = DecoupledSimulator(seed)
+            ans = stepped.simulate(stn, decouple_type="srea")
+            sim = DecoupledSimulator(seed)
+            self.assertEqual(sim.simulate(stn, decouple_type="srea",
+                                          sim_options={"fast_forward": True}),
+                             ans)
+            self.assertEqual(sim.get_assigned_times(),
+                             stepped.get_assigned_times())
+            forwarded += sim.num_fast_forwarded
+        self.assertGreater(forwarded, 0)
+
+    def test_not_before_last_contingent(self):
+        stn = stntools.load_stn_from_json_file(STN1)["stn"]
+        sim = Simulator(0)
+        sim.setup(stn, sim_options={"fast_forward": True})
+        sim.update_guide("early")
+        self.assertIsNone(sim.fast_forward())
+
+
+if __name__ == "__main__":
+    unittest.main()
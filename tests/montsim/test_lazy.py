@@ -0,0 +1,57 @@
+import unittest
+
+import libheat.stntools as stntools
+from libheat.montsim import Simulator, Z_NODE_ID
+
+
+STN1 = "test_data/two_agent_stretch.json"
+OPTIONS = {"ar_threshold": 0.3, "si_threshold": 0.05}
+
+
+class TestLazyPropagation(unittest.TestCase):
+
+    def _run(self, stn, strat, seed, lazy):
+        options = dict(OPTIONS, lazy_propagation=lazy)
+        sim = Simulator(seed)
+        ans = sim.simulate(stn, strat, sim_options=options)
+        return sim, (ans, sim.num_reschedules, sim.num_sent_schedules,
+                     sim.get_assigned_times())
+
+    def test_lazy_matches_eager(self):
+        stn = stntools.load_stn_from_json_file(STN1)["stn"]
+        skipped = 0
+        for strat in ("early", "drea", "arsi"):
+            for seed in range(4):
+                _, eager = self._run(stn, strat, seed, False)
+                sim, lazy = self._run(stn, strat, seed, True)
+                self.assertEqual(eager, lazy)
+                skipped += sim.num_skipped_propagations
+        self.assertGreater(skipped, 0)
+
+    def test_eager_skips_nothing(self):
+        stn = stntools.load_stn_from_json_file(STN1)["stn"]
+        sim, _ = self._run(stn, "drea", 0, False)
+        self.assertEqual(sim.num_skipped_propagations, 0)
+
+    def test_tighten_z_bounds_matches_floyd_warshall(self):
+        stn = stntools.load_stn_from_json_file(STN1)["stn"]
+        sim = Simulator(0)
+        self.assertTrue(stn.floyd_warshall())
+        vert_id = next(v for v in stn.verts if v != Z_NODE_ID
+                       and stn.get_incoming_contingent(v) is None)
+        time = -stn.get_edge_weight(vert_id, Z_NODE_ID)
+        lazy = stn.copy()
+        sim._assign_timepoint(lazy, vert_id, time)
+        sim._tighten_z_bounds(lazy, vert_id)
+        eager = stn.copy()
+        sim._assign_timepoint(eager, vert_id, time)
+        self.assertTrue(eager.floyd_warshall())
+        for v in stn.verts:
+            self.assertAlmostEqual(lazy.get_edge_weight(Z_NODE_ID, v),
+                                   eager.get_edge_weight(Z_NODE_ID, v))
+            self.assertAlmostEqual(lazy.get_edge_weight(v, Z_NODE_ID),
+                                   eager.get_edge_weight(v, Z_NODE_ID))
+
+
+if __name__ == "__main__":
+    unittest.main()
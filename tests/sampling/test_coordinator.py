@@ -0,0 +1,135 @@
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+
+import libheat.stntools as stntools
+from libheat import coordinator, stages, workerpool
+import run_simulator
+
+
+STN = "test_data/two_agent_stretch.json"
+OPTIONS = {"ar_threshold": 0.5, "si_threshold": 0.0, "alp_threshold": 0.0}
+
+
+def _offset(x):
+    return x + workerpool.get_shared("offset")
+
+
+def _fail_on_three(x):
+    if x == 3:
+        raise ValueError("three")
+    return x
+
+
+class TestCoordinator(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.address = os.path.join(self.tmp.name, "dream.sock")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _workers(self, count, authkey):
+        workers = [multiprocessing.Process(target=coordinator.run_worker,
+                                           args=(self.address, authkey))
+                   for i in range(count)]
+        for w in workers:
+            w.start()
+        return workers
+
+    def test_parse_address(self):
+        self.assertEqual(coordinator.parse_address("localhost:5000"),
+                         ("localhost", 5000))
+        self.assertEqual(coordinator.parse_address("/tmp/a.sock"),
+                         "/tmp/a.sock")
+
+    def test_keys(self):
+        self.assertTrue(coordinator.is_local(self.address))
+        self.assertTrue(coordinator.is_local("127.0.0.1:5000"))
+        self.assertFalse(coordinator.is_local("0.0.0.0:5000"))
+        self.assertFalse(coordinator.is_local(":5000"))
+        self.assertNotEqual(coordinator.new_authkey(),
+                            coordinator.new_authkey())
+        with self.assertRaises(ValueError):
+            coordinator.CoordinatorPool({}, "0.0.0.0:0")
+
+    def test_workers_run_every_task(self):
+        with coordinator.CoordinatorPool({"offset": 1}, self.address) as pool:
+            workers = self._workers(3, pool.authkey)
+            self.assertEqual(
+                sorted(pool.imap_unordered(_offset, list(range(20)))),
+                list(range(1, 21)))
+            # The same workers take the tasks of later calls.
+            self.assertEqual(sorted(pool.imap_unordered(_offset, [5, 6])),
+                             [6, 7])
+        for w in workers:
+            w.join(10)
+            self.assertEqual(w.exitcode, 0)
+
+    def test_task_errors_are_raised(self):
+        with coordinator.CoordinatorPool({}, self.address) as pool:
+            workers = self._workers(2, pool.authkey)
+            with self.assertRaisesRegex(ValueError, "three") as caught:
+                list(pool.imap_unordered(_fail_on_three, list(range(6))))
+            self.assertIn("_fail_on_three", str(caught.exception.__cause__))
+            # The workers survive the error.
+            self.assertEqual(sorted(pool.imap_unordered(_fail_on_three,
+                                                        [1, 2])), [1, 2])
+        for w in workers:
+            w.join(10)
+            self.assertEqual(w.exitcode, 0)
+
+    def test_tasks_fail_after_too_many_lost_workers(self):
+        queue = coordinator.Coordinator({}, timeout=0.01)
+        queue.submit([(_offset, 1)])
+        for attempt in range(coordinator.MAX_REQUEUES + 1):
+            self.assertEqual(len(queue.get_tasks(queue.register())), 1)
+            time.sleep(0.02)
+        self.assertEqual(queue.get_tasks(queue.register()), [])
+        (task_id, error), = queue.take_results()
+        self.assertIsInstance(error, coordinator.TaskError)
+        with self.assertRaises(RuntimeError):
+            error.raise_()
+
+    def test_lost_tasks_are_requeued(self):
+        queue = coordinator.Coordinator({}, timeout=0.1)
+        queue.submit([(_offset, 1), (_offset, 2)])
+        lost = queue.register()
+        self.assertEqual(len(queue.get_tasks(lost, count=2)), 2)
+        alive = queue.register()
+        self.assertEqual(queue.get_tasks(alive), [])
+        time.sleep(0.2)
+        queue.heartbeat(alive)
+        tasks = queue.get_tasks(alive)
+        self.assertEqual(len(tasks), 2)
+        self.assertEqual(queue.requeued, 2)
+        for task_id, task in tasks:
+            queue.put_result(alive, task_id, task[1])
+        # A late result of the lost worker is dropped.
+        queue.put_result(lost, tasks[0][0], -1)
+        self.assertEqual(sorted(r for i, r in queue.take_results()), [1, 2])
+        queue.stop()
+        self.assertEqual(queue.get_tasks(alive), coordinator.STOP)
+
+    def test_served_simulations_match_local(self):
+        stn = stntools.load_stn_from_json_file(STN)["stn"]
+        variants = run_simulator.make_variants("early,drea", OPTIONS)
+        with stages.stn_pool({0: stn}, threads=1,
+                             serve=self.address) as pool:
+            workers = self._workers(2, pool.authkey)
+            served = run_simulator.multiple_variant_simulations(
+                stn, variants, 8, random_seed=5, pool=pool, stn_id=0)
+        for w in workers:
+            w.join(10)
+        local = run_simulator.multiple_variant_simulations(
+            stn, variants, 8, random_seed=5)
+        for a, b in zip(served, local):
+            self.assertEqual(a["sample_results"], b["sample_results"])
+            self.assertEqual(a["reschedules"], b["reschedules"])
+
+
+if __name__ == "__main__":
+    unittest.main()
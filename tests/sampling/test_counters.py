@@ -0,0 +1,67 @@
+import json
+import unittest
+
+import libheat.stntools as stntools
+from libheat import counters
+import run_simulator
+
+
+STN = "test_data/two_agent_stretch.json"
+OPTIONS = {"ar_threshold": 0.0, "si_threshold": 0.0, "alp_threshold": 0.0}
+
+
+@counters.hook
+def _strategy(stn):
+    return counters.copy_stn(stn)
+
+
+class TestCounters(unittest.TestCase):
+
+    def setUp(self):
+        counters.collect()
+
+    def test_counts_are_kept_by_hook(self):
+        stn = stntools.load_stn_from_json_file(STN)["stn"]
+        counters.copy_stn(stn)
+        stn.copy()
+        _strategy(stn)
+        _strategy(stn)
+        counters.count("dispatch_steps", 3)
+        counts = counters.collect()
+        self.assertEqual(counts["simulator/stn_copies"][0], 1)
+        self.assertEqual(counts["_strategy/stn_copies"][0], 2)
+        self.assertGreater(counts["_strategy/stn_copies"][1], 0.0)
+        self.assertEqual(counts["simulator/dispatch_steps"], (3, 0.0))
+        self.assertEqual(counters.collect(), {})
+        self.assertEqual(counters.totals(counts)["stn_copies"][0], 3)
+
+    def test_columns(self):
+        row = counters.columns([
+            {"_drea_algorithm/srea_calls": (1, 0.0),
+             "_drea_algorithm/alpha_probes": (10, 0.0),
+             "simulator/floyd_warshall": (4, 0.5)},
+            {"simulator/floyd_warshall": [2, 0.5]}])
+        self.assertEqual(row["floyd_warshall_per_sample"], 3.0)
+        self.assertEqual(row["floyd_warshall_s_per_sample"], 0.5)
+        self.assertEqual(row["lp_solves_per_sample"], 0.0)
+        self.assertEqual(row["alpha_probes_per_srea"], 10.0)
+        self.assertEqual(json.loads(row["counters_by_hook"]),
+                         {"_drea_algorithm": {"alpha_probes": 5.0,
+                                              "srea_calls": 0.5},
+                          "simulator": {"floyd_warshall": 3.0}})
+
+    def test_samples_are_counted_per_strategy(self):
+        stn = stntools.load_stn_from_json_file(STN)["stn"]
+        variants = run_simulator.make_variants("early,drea", OPTIONS)
+        early, drea = run_simulator.multiple_variant_simulations(
+            stn, variants, 4, random_seed=2)
+        for counts in early["counters"]:
+            self.assertEqual(counters.totals(counts)["lp_solves"][0], 0)
+            self.assertGreater(
+                counters.totals(counts)["dispatch_steps"][0], 0)
+        for counts in drea["counters"]:
+            self.assertGreater(counts["_drea_algorithm/lp_solves"][0], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from libheat import fileio
+
+
+class TestFileIO(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "out.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_to_json(self):
+        self.assertEqual(json.dumps([np.int64(4), np.float64(0.5)],
+                                    default=fileio.to_json), "[4, 0.5]")
+        with self.assertRaises(TypeError):
+            json.dumps(object(), default=fileio.to_json)
+
+    def test_atomic_write(self):
+        with fileio.atomic_write(self.path) as f:
+            f.write("first")
+        with self.assertRaises(ValueError):
+            with fileio.atomic_write(self.path) as f:
+                f.write("second")
+                raise ValueError()
+        with open(self.path) as f:
+            self.assertEqual(f.read(), "first")
+        self.assertEqual(os.listdir(self.tmp.name), ["out.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import pstats
+import tempfile
+import unittest
+
+from libheat import hotspots
+import run_simulator
+
+
+STN = "test_data/two_agent_stretch.json"
+OPTIONS = {"ar_threshold": 0.0, "si_threshold": 0.0, "alp_threshold": 0.0}
+
+
+def _work(n):
+    return sum(i * i for i in range(n))
+
+
+class TestHotspots(unittest.TestCase):
+
+    def setUp(self):
+        hotspots.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        hotspots.clear()
+        self.tmp.cleanup()
+
+    def test_merge_and_dump(self):
+        result, raw = hotspots.run(_work, 1000)
+        self.assertEqual(result, _work(1000))
+        hotspots.merge([("a", raw)])
+        hotspots.merge([("a", hotspots.run(_work, 10)[1]),
+                        ("b", hotspots.run(_work, 10)[1])])
+        self.assertEqual(hotspots.keys(), ["a", "b"])
+        self.assertIn("_work", hotspots.report(lines=5))
+
+        path = os.path.join(self.tmp.name, "run.pstats")
+        written = hotspots.dump(path)
+        self.assertEqual(written,
+                         [path, os.path.join(self.tmp.name, "run.a.pstats"),
+                          os.path.join(self.tmp.name, "run.b.pstats")])
+        calls = {func[2]: stat[1] for func, stat
+                 in pstats.Stats(path).stats.items()}
+        self.assertEqual(calls["_work"], 3)
+
+    def test_workers_are_profiled_per_strategy(self):
+        run_simulator.across_paths([STN], "early,drea", 1, 4, OPTIONS,
+                                   live_updates=False, random_seed=7,
+                                   profile_tasks=1)
+        self.assertEqual(hotspots.keys(), ["drea", "early"])
+
+
+if __name__ == "__main__":
+    unittest.main()
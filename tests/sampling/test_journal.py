@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import libheat.stntools as stntools
+from libheat import journal, stages
+import run_simulator
+
+
+STN1 = "test_data/two_contingent.json"
+STN2 = "test_data/two_agent_stretch.json"
+OPTIONS = {"ar_threshold": 0.5, "si_threshold": 0.0, "alp_threshold": 0.0}
+
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "run.journal")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_reload(self):
+        variants = run_simulator.make_variants("early", OPTIONS)
+        done = journal.stage_key(STN1, 0, variants, 4, 10)
+        partial = journal.stage_key(STN1, 1, variants, 4, 10)
+        with journal.Journal(self.path) as j:
+            j.start_run(4)
+            j.checkpoint(done).record(0, [(True, 0, 0, 0.1, 0, False)])
+            j.finish_stage(done)
+            j.checkpoint(partial).record(3, [(False, 1, 2, 0.1, 0, False)])
+        with open(self.path, "a") as f:
+            f.write('{"type": "sample", "sta')
+        with journal.Journal(self.path, resume=True) as j:
+            self.assertEqual(j.random_seed, 4)
+            self.assertTrue(j.is_finished(done))
+            self.assertFalse(j.is_finished(partial))
+            self.assertEqual(j.checkpoint(partial).samples,
+                             {3: [(False, 1, 2, 0.1, 0, False)]})
+
+    def test_resume_after_partial_line(self):
+        variants = run_simulator.make_variants("early", OPTIONS)
+        stage = journal.stage_key(STN1, 0, variants, 4, 10)
+        with journal.Journal(self.path) as j:
+            j.start_run(4)
+            j.checkpoint(stage).record(0, [(True, 0, 0, 0.1, 0, False)])
+        with open(self.path, "a") as f:
+            f.write('{"type": "sample", "sta')
+        with journal.Journal(self.path, resume=True) as j:
+            j.checkpoint(stage).record(1, [(False, 1, 2, 0.1, 0, False)])
+        with journal.Journal(self.path, resume=True) as j:
+            self.assertEqual(sorted(j.checkpoint(stage).samples), [0, 1])
+
+    def test_finished_stns_are_not_shared(self):
+        def run(**kwargs):
+            with journal.Journal(self.path, resume=True) as j:
+                run_simulator.across_paths([STN1, STN2], "early,drea", 1, 3,
+                                           OPTIONS, live_updates=False,
+                                           random_seed=4, journal=j,
+                                           **kwargs)
+        run(stop_index=1)
+        with mock.patch.object(stages, "stn_pool",
+                               wraps=stages.stn_pool) as pool:
+            run()
+        self.assertEqual(list(pool.call_args[0][0]), [1])
+
+    def test_resume_matches_full_run(self):
+        stn = stntools.load_stn_from_json_file(STN1)["stn"]
+        variants = run_simulator.make_variants("early,drea", OPTIONS)
+        key = journal.stage_key(STN1, 0, variants, 8, 10)
+        full = run_simulator.multiple_variant_simulations(
+            stn, variants, 10, random_seed=8)
+        with journal.Journal(self.path) as j:
+            run_simulator.multiple_variant_simulations(
+                stn, variants, 4, random_seed=8, checkpoint=j.checkpoint(key))
+        with journal.Journal(self.path, resume=True) as j:
+            checkpoint = j.checkpoint(key)
+            self.assertEqual(sorted(checkpoint.samples), [0, 1, 2, 3])
+            resumed = run_simulator.multiple_variant_simulations(
+                stn, variants, 10, random_seed=8, checkpoint=checkpoint)
+            self.assertEqual(len(checkpoint.samples), 10)
+        for a, b in zip(full, resumed):
+            self.assertEqual(a["sample_results"], b["sample_results"])
+            self.assertEqual(a["reschedules"], b["reschedules"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import json
+import os
+import tracemalloc
+import unittest
+
+from libheat import memory, stages
+import run_simulator
+
+
+STN = "test_data/two_agent_stretch.json"
+OPTIONS = {"ar_threshold": 0.0, "si_threshold": 0.0, "alp_threshold": 0.0}
+
+
+class TestMemory(unittest.TestCase):
+
+    def tearDown(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def test_traced_task(self):
+        task = memory.TaskMemory("tracemalloc")
+        kept = [bytearray(1024) for i in range(256)]
+        task.sample_sites()
+        result = task.finish(steps=4)
+        del kept
+        self.assertEqual(result["pid"], os.getpid())
+        self.assertGreater(result["peak_rss"], 0)
+        self.assertGreaterEqual(result["traced_peak"], 256 * 1024)
+        self.assertIn("tests/sampling/test_memory.py",
+                      " ".join(result["sites"]))
+
+        stage = {}
+        memory.merge(result, into=stage)
+        memory.merge(dict(result, pid=-1, peak_rss=1), into=stage)
+        memory.merge(None, into=stage)
+        row = memory.columns(stage)
+        self.assertEqual(row["peak_rss_mb"], result["peak_rss"] / memory.MB)
+        self.assertEqual(len(json.loads(row["peak_rss_by_worker"])), 2)
+        self.assertEqual(row["traced_bytes_per_step"],
+                         result["traced_peak"] / 4)
+        self.assertLessEqual(len(json.loads(row["top_allocation_sites"])),
+                             memory.TOP_SITES)
+
+    def test_rss_only(self):
+        stage = {}
+        memory.merge(memory.TaskMemory("rss").finish(), into=stage)
+        row = memory.columns(stage)
+        self.assertGreater(row["peak_rss_mb"], 0)
+        self.assertIsNone(row["traced_peak_mb"])
+        with self.assertRaises(ValueError):
+            memory.TaskMemory("heap")
+
+    def test_rows_hold_memory_columns(self):
+        pair = (STN, run_simulator.load_stn_from_json_file(STN)["stn"])
+        with stages.stn_pool({0: pair[1]}, 1,
+                             memory_mode="tracemalloc") as pool:
+            rows, responses = stages.run_stage(
+                pair, [("drea", OPTIONS)], 4, 1, 7,
+                sampling={"ci_tolerance": None, "chunk_size": 20,
+                          "ci_confidence": 0.95, "memory": "tracemalloc"},
+                pool=pool, stn_id=0)
+        self.assertGreater(rows[0]["peak_rss_mb"], 0)
+        self.assertGreater(rows[0]["traced_bytes_per_step"], 0)
+        self.assertTrue(json.loads(rows[0]["top_allocation_sites"]))
+        rows, responses = stages.run_stage(
+            pair, [("drea", OPTIONS)], 4, 1, 7)
+        self.assertNotIn("peak_rss_mb", rows[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+import libheat.stntools as stntools
+from libheat import stages, workerpool
+import run_simulator
+
+
+STN1 = "test_data/two_contingent.json"
+STN2 = "test_data/two_agent_stretch.json"
+OPTIONS = {"ar_threshold": 0.5, "si_threshold": 0.0, "alp_threshold": 0.0}
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def _keys(self, response):
+        return (response["sample_results"], response["reschedules"],
+                response["prescreened"])
+
+    def test_shared_pool_matches_single_thread(self):
+        stns = [stntools.load_stn_from_json_file(p)["stn"]
+                for p in (STN1, STN2)]
+        variants = run_simulator.make_variants("early,drea", OPTIONS)
+        with stages.stn_pool(dict(enumerate(stns)), threads=2) as pool:
+            for i, stn in enumerate(stns):
+                pooled = run_simulator.multiple_variant_simulations(
+                    stn, variants, 12, random_seed=3, prescreen="batch",
+                    pool=pool, stn_id=i)
+                alone = run_simulator.multiple_variant_simulations(
+                    stn, variants, 12, random_seed=3, prescreen="batch")
+                for a, b in zip(pooled, alone):
+                    self.assertEqual(self._keys(a), self._keys(b))
+
+    def test_get_shared_in_single_thread(self):
+        with workerpool.WorkerPool({"a": 1}, threads=1) as pool:
+            self.assertEqual(workerpool.get_shared("a"), 1)
+            self.assertEqual(list(pool.imap_unordered(abs, [-1, 2])), [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
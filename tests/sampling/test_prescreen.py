@@ -0,0 +1,55 @@
+import unittest
+
+import numpy as np
+
+import libheat.stntools as stntools
+from libheat import prescreen
+from libheat.montsim import draw_samples
+import run_simulator
+
+
+STN1 = "test_data/two_contingent.json"
+OPTIONS = {"ar_threshold": 0.0, "si_threshold": 0.0}
+
+
+class TestPrescreen(unittest.TestCase):
+
+    def test_batch_matches_single(self):
+        stn = stntools.load_stn_from_json_file(STN1)["stn"]
+        samples = [draw_samples(stn, np.random.RandomState(s))
+                   for s in range(30)]
+        batch = prescreen.batch_consistent(stn, samples, batch_size=7)
+        single = [prescreen.is_consistent(stn, s) for s in samples]
+        self.assertEqual(list(batch), single)
+        self.assertIn(False, single)
+        self.assertIn(True, single)
+
+    def test_sampled_outside_bounds_is_inconsistent(self):
+        stn = stntools.load_stn_from_json_file(STN1)["stn"]
+        samples = {k: 6000.0 for k in stn.contingent_edges}
+        # Node 3 must happen by 7414, but it is two contingent durations of
+        # 6000 after node 1.
+        self.assertFalse(prescreen.is_consistent(stn, samples))
+        samples = {k: 3000.0 for k in stn.contingent_edges}
+        self.assertTrue(prescreen.is_consistent(stn, samples))
+
+    def test_results_unchanged(self):
+        stn = stntools.load_stn_from_json_file(STN1)["stn"]
+        plain = run_simulator.multiple_simulations(
+            stn, "drea", 12, random_seed=4, sim_options=OPTIONS)
+        self.assertEqual(plain["prescreened"], [False] * 12)
+        for mode in ("sample", "batch"):
+            screened = run_simulator.multiple_simulations(
+                stn, "drea", 12, random_seed=4, sim_options=OPTIONS,
+                prescreen=mode)
+            self.assertEqual(plain["sample_results"],
+                             screened["sample_results"])
+            self.assertIn(True, screened["prescreened"])
+            for i, was_screened in enumerate(screened["prescreened"]):
+                if not was_screened:
+                    self.assertEqual(plain["reschedules"][i],
+                                     screened["reschedules"][i])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+from libheat import profiling, stages
+import run_simulator
+
+
+STN = "test_data/two_agent_stretch.json"
+OPTIONS = {"ar_threshold": 0.0, "si_threshold": 0.0, "alp_threshold": 0.0}
+
+
+@profiling.profiled()
+def _countdown(n):
+    if n > 0:
+        _countdown(n - 1)
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        profiling.collect()
+        profiling.enable()
+
+    def tearDown(self):
+        profiling.enable(False)
+        profiling.collect()
+
+    def test_nested_spans(self):
+        for i in range(3):
+            with profiling.span("outer"):
+                with profiling.span("inner"):
+                    pass
+        totals = profiling.collect()
+        self.assertEqual(set(totals), {"outer", "outer/inner"})
+        self.assertEqual(totals["outer/inner"][0], 3)
+        self.assertGreaterEqual(totals["outer"][1], totals["outer/inner"][1])
+        self.assertEqual(profiling.snapshot(), {})
+
+    def test_recursion_is_not_counted_twice(self):
+        with profiling.span("top"):
+            _countdown(3)
+        totals = profiling.collect()
+        self.assertEqual(set(totals), {"top", "top/_countdown"})
+        self.assertEqual(totals["top/_countdown"][0], 4)
+
+    def test_disabled(self):
+        profiling.enable(False)
+        with profiling.span("outer"):
+            _countdown(2)
+        self.assertEqual(profiling.snapshot(), {})
+
+    def test_merge(self):
+        profile = {}
+        profiling.merge({"a": (1, 10), "a/b": (2, 4)}, into=profile)
+        profiling.merge({"a": (1, 5)}, into=profile)
+        profiling.merge(None, into=profile)
+        self.assertEqual(profile, {"a": (2, 15), "a/b": (2, 4)})
+        self.assertEqual(profiling.by_name({"a/b": (2, 4), "b": (1, 6)}),
+                         {"b": (3, 1e-8)})
+
+    def test_worker_profiles_reach_the_results(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "out.csv")
+            run_simulator.across_paths([STN], "early,drea", 2, 4, OPTIONS,
+                                       output=output, live_updates=False,
+                                       random_seed=3)
+            with open(output) as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 2)
+        for row in rows:
+            self.assertGreater(
+                int(row["profile_propagation_check_calls"]), 0)
+            self.assertIn("propagation & check",
+                          json.loads(row["profile_spans"]))
+        self.assertGreater(profiling.by_name(profiling.snapshot())
+                           ["selection"][0], 0)
+
+    def test_single_thread_tasks_report_their_own_spans(self):
+        # Tasks run in this process with a single thread.
+        with profiling.span("outside"):
+            pass
+        stn = run_simulator.load_stn_from_json_file(STN)["stn"]
+        report = stages.stage_report()
+        run_simulator.multiple_variant_simulations(stn, [("drea", OPTIONS)],
+                                                   3, threads=1,
+                                                   random_seed=3,
+                                                   report=report)
+        self.assertNotIn("outside", report["profile"])
+        self.assertEqual(report["profile"]["draw_samples"][0], 3)
+        self.assertEqual(profiling.snapshot()["outside"][0], 1)
+        self.assertEqual(profiling.snapshot()["draw_samples"][0], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import io
+import unittest
+
+from libheat import progress
+import run_simulator
+
+
+STN = "test_data/two_agent_stretch.json"
+OPTIONS = {"ar_threshold": 0.0, "si_threshold": 0.0, "alp_threshold": 0.0}
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _answers(*robust):
+    return [(r, 0, 0, 0.5, 0, False, 0, -1, -1, {}) for r in robust]
+
+
+class _Tty(io.StringIO):
+
+    def isatty(self):
+        return True
+
+
+class TestProgress(unittest.TestCase):
+
+    def test_status(self):
+        clock = _Clock()
+        stream = io.StringIO()
+        reporter = progress.ProgressReporter(workers=2, stream=stream,
+                                             interval=10.0, clock=clock)
+        on_sample = reporter.add_stage("a", 10, "stn.json", ["early", "drea"])
+        reporter.add_stage("b", 10, "other.json", ["drea"])
+        for k in range(4):
+            clock.now += 1.0
+            on_sample(_answers(k % 2 == 0, True))
+        # Within the interval, nothing is printed.
+        self.assertEqual(stream.getvalue(), "")
+        line = reporter.status()
+        self.assertIn("4/20 samples (20%)", line)
+        self.assertIn("1.0/s", line)
+        self.assertIn("ETA 16s", line)
+        # 4 samples of 2 variants of 0.5s, over 4s of 2 workers.
+        self.assertIn("busy 50%", line)
+        self.assertIn("stn.json: 4/10 ETA 6s", line)
+        self.assertIn("early 0.500 drea 1.000", line)
+        clock.now += 10.0
+        on_sample(_answers(True, True))
+        self.assertEqual(stream.getvalue().count("\n"), 1)
+
+    def test_stage_done_drops_unneeded_samples(self):
+        reporter = progress.ProgressReporter(stream=io.StringIO())
+        on_sample = reporter.add_stage("a", 100, "stn.json", ["drea"])
+        for k in range(30):
+            on_sample(_answers(True))
+        reporter.stage_done("a")
+        self.assertEqual(reporter.total, 30)
+        line = reporter.status()
+        self.assertIn("30/30 samples (100%)", line)
+        self.assertNotIn("busy", line)
+        self.assertNotIn("stn.json", line)
+
+    def test_tty(self):
+        clock = _Clock()
+        stream = _Tty()
+        reporter = progress.ProgressReporter(stream=stream, clock=clock)
+        self.assertEqual(reporter.interval, progress.INTERVAL)
+        on_sample = reporter.add_stage("a", 2, "stn.json", ["drea"])
+        clock.now += 1.0
+        on_sample(_answers(False))
+        self.assertTrue(stream.getvalue().startswith("\r1/2 samples"))
+        self.assertNotIn("\n", stream.getvalue())
+        reporter.clear()
+        self.assertTrue(stream.getvalue().endswith("\r"))
+        reporter.close()
+        self.assertTrue(stream.getvalue().endswith("\n"))
+
+    def test_eta(self):
+        self.assertEqual(progress._eta(0, 0.0), "0s")
+        self.assertEqual(progress._eta(10, 0.0), "?")
+        self.assertEqual(progress._eta(150, 1.0), "2m30s")
+        self.assertEqual(progress._eta(7300, 1.0), "2h01m")
+
+    def test_multiple_simulations_reports_every_sample(self):
+        stn = run_simulator.load_stn_from_json_file(STN)["stn"]
+        reporter = progress.ProgressReporter(stream=io.StringIO())
+        on_sample = reporter.add_stage(0, 6, "stn", ["drea"])
+        response = run_simulator.multiple_simulations(
+            stn, "drea", 6, threads=2, random_seed=3, sim_options=OPTIONS,
+            progress=on_sample)
+        self.assertEqual(reporter.done, 6)
+        self.assertIn("drea {:.3f}".format(
+            response["sample_results"].count(True) / 6), reporter.status())
+
+
+if __name__ == "__main__":
+    unittest.main()
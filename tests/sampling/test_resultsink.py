@@ -0,0 +1,109 @@
+import csv
+import importlib.util
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+
+from libheat import resultsink
+
+
+def _write_rows(path, start):
+    with resultsink.open_sink(path, buffer_rows=3) as sink:
+        for i in range(start, start + 20):
+            sink.write([{"a": i, "b": i * 0.5}], [{"a": i, "sample": 0}])
+
+
+def _has_pyarrow():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+class TestResultSink(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def _concurrent(self, path):
+        writers = [multiprocessing.Process(target=_write_rows,
+                                           args=(path, 100 * n))
+                   for n in range(3)]
+        for w in writers:
+            w.start()
+        for w in writers:
+            w.join()
+            self.assertEqual(w.exitcode, 0)
+
+    def test_csv_concurrent_writers(self):
+        path = self._path("out.csv")
+        self._concurrent(path)
+        with open(path, newline="") as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ["a", "b"])
+        self.assertEqual(len(rows), 61)
+        self.assertEqual(sorted(int(r[0]) for r in rows[1:]),
+                         sorted(100 * n + i for n in range(3)
+                                for i in range(20)))
+        with open(self._path("out.samples.csv"), newline="") as f:
+            self.assertEqual(len(list(csv.reader(f))), 61)
+
+    def test_sqlite_concurrent_writers(self):
+        path = self._path("out.db")
+        self._concurrent(path)
+        connection = sqlite3.connect(path)
+        self.assertEqual(connection.execute(
+            "PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(connection.execute(
+            "SELECT COUNT(*) FROM stages").fetchone()[0], 60)
+        self.assertEqual(connection.execute(
+            "SELECT COUNT(*) FROM samples").fetchone()[0], 60)
+
+    def test_sqlite_adds_columns(self):
+        path = self._path("out.sqlite")
+        with resultsink.open_sink(path) as sink:
+            sink.write([{"a": np.int64(1)}])
+            sink.flush()
+            sink.write([{"a": 2, "b": np.float64(0.5)}])
+        rows = sqlite3.connect(path).execute(
+            "SELECT a, b FROM stages ORDER BY a").fetchall()
+        self.assertEqual(rows, [(1, None), (2, 0.5)])
+
+    def test_written_after_flush(self):
+        with resultsink.open_sink(self._path("out.csv")) as sink:
+            sink.write([{"a": 1}], token="first")
+            sink.write([{"a": 2}], token="second")
+            sink.flush()
+            self.assertEqual(sink.written(), ["first", "second"])
+            self.assertEqual(sink.written(), [])
+
+    def test_csv_refuses_new_columns(self):
+        path = self._path("out.csv")
+        with resultsink.open_sink(path) as sink:
+            sink.write([{"a": 1, "b": 2}], [{"a": 1}], token="first")
+        sink = resultsink.open_sink(path)
+        sink.write([{"a": 3}], [{"a": 3, "c": 4}], token="second")
+        with self.assertRaisesRegex(ValueError, "no c column"):
+            sink.close()
+        self.assertEqual(sink.written(), [])
+        with open(path, newline="") as f:
+            self.assertEqual(list(csv.reader(f)), [["a", "b"], ["1", "2"]])
+
+    @unittest.skipUnless(_has_pyarrow(), "pyarrow is not installed")
+    def test_parquet(self):
+        import pandas as pd
+        path = self._path("out.parquet")
+        self._concurrent(path)
+        self.assertEqual(len(pd.read_parquet(os.path.join(path, "stages"))),
+                         60)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import libheat.stntools as stntools
+from libheat import samplerecords
+from libheat.montsim import NO_FAILURE
+import run_simulator
+
+
+STN = "test_data/two_agent_stretch.json"
+OPTIONS = {"ar_threshold": 0.0, "si_threshold": 0.0, "alp_threshold": 0.0}
+
+
+class TestSampleRecords(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "out.samples.npy")
+        stn = stntools.load_stn_from_json_file(STN)["stn"]
+        variants = run_simulator.make_variants("early,drea", OPTIONS)
+        self.responses = run_simulator.multiple_variant_simulations(
+            stn, variants, 10, random_seed=4)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_failures_are_recorded(self):
+        for response in self.responses:
+            for ok, step, vertex in zip(response["sample_results"],
+                                        response["failure_steps"],
+                                        response["failure_vertices"]):
+                self.assertEqual(ok, step == NO_FAILURE)
+                self.assertEqual(ok, vertex == NO_FAILURE)
+        self.assertIn(False, self.responses[0]["sample_results"])
+
+    def test_append_and_reopen(self):
+        with samplerecords.SampleRecords(self.path) as records:
+            self.assertEqual(records.append({"name": "a"}, self.responses), 0)
+        with samplerecords.SampleRecords(self.path) as records:
+            self.assertEqual(records.append({"name": "b"}, self.responses), 1)
+        loaded = np.load(self.path)
+        self.assertEqual(loaded.dtype, samplerecords.RECORD_DTYPE)
+        self.assertEqual(len(loaded), 40)
+        first = loaded[(loaded["stage"] == 1) & (loaded["variant"] == 0)]
+        self.assertEqual(first["robust"].tolist(),
+                         self.responses[0]["sample_results"])
+        self.assertEqual(first["seed"].tolist(), self.responses[0]["seeds"])
+        self.assertEqual(first["sample"].tolist(), list(range(10)))
+        with open(os.path.join(self.tmp.name,
+                               "out.samples.stages.jsonl")) as f:
+            stages = [json.loads(line) for line in f]
+        self.assertEqual(stages, [{"name": "a", "stage": 0},
+                                  {"name": "b", "stage": 1}])
+
+
+if __name__ == "__main__":
+    unittest.main()
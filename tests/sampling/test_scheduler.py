@@ -0,0 +1,50 @@
+import csv
+import os
+import tempfile
+import unittest
+
+from libheat import scheduler
+from libheat import workerpool
+import run_simulator
+
+
+STNS = ["test_data/two_agent_stretch.json", "test_data/two_contingent.json"]
+OPTIONS = {"ar_threshold": 0.0, "si_threshold": 0.0, "alp_threshold": 0.0}
+
+
+class TestStageScheduler(unittest.TestCase):
+
+    def test_longest_stage_first(self):
+        with workerpool.WorkerPool({}, threads=1) as pool:
+            queue = scheduler.StageScheduler(pool, abs)
+            queue.add_stage("cheap", [-1, -2], cost=1.0)
+            queue.add_stage("empty", [], cost=5.0)
+            queue.add_stage("dear", [-3], cost=10.0)
+            finished = list(queue.run())
+        self.assertEqual(finished, [("empty", []), ("dear", [3]),
+                                    ("cheap", [1, 2])])
+
+    def test_every_task_runs_with_threads(self):
+        with workerpool.WorkerPool({}, threads=2) as pool:
+            queue = scheduler.StageScheduler(pool, abs)
+            for k in range(4):
+                queue.add_stage(k, range(-k * 10, 0), cost=k)
+            finished = dict(queue.run())
+        for k in range(4):
+            self.assertEqual(sorted(finished[k]), list(range(1, k * 10 + 1)))
+
+    def test_runtime_is_per_stage(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "out.csv")
+            run_simulator.across_paths(STNS, "early,drea", 2, 4, OPTIONS,
+                                       output=output, live_updates=False,
+                                       random_seed=3)
+            with open(output) as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 4)
+        for row in rows:
+            self.assertLessEqual(float(row["runtime"]), float(row["elapsed"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
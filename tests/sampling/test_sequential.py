@@ -0,0 +1,57 @@
+import unittest
+
+import libheat.stntools as stntools
+from libheat import confidence
+import run_simulator
+
+
+STN1 = "test_data/two_agent_sync.json"
+
+
+class TestSequentialStopping(unittest.TestCase):
+
+    def test_wilson_interval(self):
+        low, high = confidence.wilson_interval(0, 30)
+        self.assertEqual(low, 0.0)
+        self.assertTrue(0.1 < high < 0.12)
+        low, high = confidence.wilson_interval(30, 30)
+        self.assertTrue(0.88 < low < 0.9)
+        self.assertAlmostEqual(high, 1.0)
+
+    def test_should_stop(self):
+        self.assertFalse(confidence.should_stop(0, 0, 0.1, 100))
+        self.assertTrue(confidence.should_stop(5, 100, 0.0, 100))
+        self.assertTrue(confidence.should_stop(0, 40, 0.1, 100))
+        self.assertFalse(confidence.should_stop(20, 40, 0.1, 100))
+
+    def test_chunks_match_single_run(self):
+        stn = stntools.load_stn_from_json_file(STN1)["stn"]
+        whole = run_simulator.multiple_simulations(stn, "early", 10,
+                                                   random_seed=7)
+        chunked = run_simulator.sequential_simulations(stn, "early", 10,
+                                                       0.0, chunk_size=4,
+                                                       random_seed=7)
+        self.assertEqual(whole["sample_results"], chunked["sample_results"])
+
+    def test_stops_before_cap(self):
+        stn = stntools.load_stn_from_json_file(STN1)["stn"]
+        response = run_simulator.sequential_simulations(stn, "early", 1000,
+                                                        0.2, chunk_size=10,
+                                                        random_seed=7)
+        self.assertTrue(len(response["sample_results"]) < 1000)
+
+    def test_chunk_size_must_be_positive(self):
+        stn = stntools.load_stn_from_json_file(STN1)["stn"]
+        for chunk_size in (0, -4):
+            with self.assertRaises(ValueError):
+                run_simulator.sequential_simulations(stn, "early", 10, 0.1,
+                                                     chunk_size=chunk_size)
+            with self.assertRaises(ValueError):
+                run_simulator.across_paths([STN1], "early", 1, 10, {},
+                                           live_updates=False,
+                                           ci_tolerance=0.1,
+                                           chunk_size=chunk_size)
+
+
+if __name__ == "__main__":
+    unittest.main()
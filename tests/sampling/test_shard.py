@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from libheat import journal, stages
+import run_simulator
+
+
+STN1 = "test_data/two_contingent.json"
+OPTIONS = {"ar_threshold": 0.5, "si_threshold": 0.0, "alp_threshold": 0.0}
+TIMING_COLUMNS = ["runtime", "elapsed", "timestamp", "sim_time"]
+
+
+def _drop_timings(frame):
+    return frame.drop(columns=TIMING_COLUMNS + [
+        c for c in frame.columns if c.endswith("_s_per_sample")])
+
+
+class TestShard(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _path(self, name):
+        return os.path.join(self.folder, name)
+
+    def _run(self, output=None, **kwargs):
+        run_simulator.across_paths([STN1], "early,drea", 1, 9, OPTIONS,
+                                   output=output, live_updates=False,
+                                   random_seed=3, **kwargs)
+
+    def test_merge_matches_single_run(self):
+        self._run(output=self._path("full.csv"))
+        for k in range(2):
+            with journal.Journal(self._path("{}.journal".format(k))) as j:
+                self._run(journal=j, shard=(k, 2))
+        self.assertFalse(os.path.exists(self._path("merged.csv")))
+        with journal.Journal(self._path("merged.journal")) as j:
+            j.load(self._path("0.journal"))
+            with self.assertRaises(ValueError):
+                self._run(output=self._path("merged.csv"), journal=j,
+                          merge=True)
+            j.load(self._path("1.journal"))
+            # Merging runs no task, so it must not start any workers.
+            with mock.patch.object(stages, "stn_pool",
+                                   side_effect=AssertionError):
+                self._run(output=self._path("merged.csv"), journal=j,
+                          merge=True)
+        full = _drop_timings(pd.read_csv(self._path("full.csv")))
+        merged = _drop_timings(pd.read_csv(self._path("merged.csv")))
+        pd.testing.assert_frame_equal(full, merged)
+
+    def test_parse_shard(self):
+        self.assertEqual(run_simulator.parse_shard("2/5"), (2, 5))
+        with self.assertRaises(Exception):
+            run_simulator.parse_shard("5/5")
+
+
+if __name__ == "__main__":
+    unittest.main()
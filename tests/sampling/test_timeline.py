@@ -0,0 +1,66 @@
+import json
+import os
+import tempfile
+import unittest
+
+from libheat import profiling
+from libheat import timeline
+import run_simulator
+
+
+STN = "test_data/two_agent_stretch.json"
+OPTIONS = {"ar_threshold": 0.0, "si_threshold": 0.0, "alp_threshold": 0.0}
+
+
+class TestTimeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_recording_leaves_totals_alone(self):
+        profiling.collect()
+        profiling.record_events()
+        with profiling.span("outer", {"alpha": 0.5}):
+            profiling.instant("mark")
+            with profiling.span("inner"):
+                pass
+        events = profiling.take_events()
+        self.assertEqual([(e[0], e[1]) for e in events],
+                         [("mark", "i"), ("inner", "X"), ("outer", "X")])
+        self.assertEqual(profiling.snapshot(), {})
+        with profiling.span("ignored"):
+            profiling.instant("ignored")
+        self.assertEqual(profiling.take_events(), [])
+
+        trace = timeline.trace_events(events, pid=2, thread_name="drea")
+        self.assertEqual(trace[0]["ph"], "M")
+        self.assertEqual([e["name"] for e in trace[1:]],
+                         ["outer", "mark", "inner"])
+        self.assertEqual(trace[1]["args"], {"alpha": 0.5})
+
+    def test_selected_samples_are_written(self):
+        run_simulator.across_paths([STN], "drea", 1, 4, OPTIONS,
+                                   live_updates=False, random_seed=7,
+                                   timeline=self.tmp.name,
+                                   timeline_samples=(1,))
+        self.assertEqual(os.listdir(self.tmp.name),
+                         [timeline.timeline_name(STN, 0, "drea", OPTIONS, 1)])
+        with open(os.path.join(self.tmp.name,
+                               os.listdir(self.tmp.name)[0])) as f:
+            written = json.load(f)
+        self.assertEqual(written["otherData"]["sample"], 1)
+        names = {e["name"] for e in written["traceEvents"]}
+        self.assertTrue({"get_guide", "alpha_probe", "selection",
+                         "propagation & check"} <= names)
+
+    def test_parse_samples(self):
+        self.assertEqual(run_simulator.parse_samples("0,4, 9"), (0, 4, 9))
+        with self.assertRaises(Exception):
+            run_simulator.parse_samples("-1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from libheat import trace
+import run_simulator
+
+
+STN = "test_data/two_agent_stretch.json"
+OPTIONS = {"ar_threshold": 0.0, "si_threshold": 0.0, "alp_threshold": 0.0}
+
+
+class TestTrace(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_save_and_load(self):
+        path = os.path.join(self.tmp.name, "t.npz")
+        meta = {"seed": np.int64(3), "success": False}
+        trace.save(path, meta, {(1, 2): 4.5},
+                   [(1, 0.0, 0.0, 1.0, False, 0.5),
+                    (2, 4.5, 4.0, 5.0, True, 0.5)])
+        loaded_meta, samples, dispatches = trace.load(path)
+        self.assertEqual(loaded_meta, {"seed": 3, "success": False})
+        self.assertEqual(samples, {(1, 2): 4.5})
+        self.assertEqual(dispatches["vertex"].tolist(), [1, 2])
+        self.assertIsNone(trace.first_difference(dispatches, dispatches))
+        self.assertEqual(trace.first_difference(dispatches, dispatches[:1]),
+                         1)
+
+    def test_failed_samples_replay(self):
+        run_simulator.across_paths([STN], "early,drea", 1, 6, OPTIONS,
+                                   live_updates=False, random_seed=7,
+                                   trace=self.tmp.name)
+        traces = sorted(os.listdir(self.tmp.name))
+        self.assertTrue(traces)
+        for name in traces[:2]:
+            meta, samples, dispatches = trace.load(
+                os.path.join(self.tmp.name, name))
+            self.assertFalse(meta["success"])
+            self.assertEqual(len(dispatches), meta["failure_step"] + 1)
+            self.assertTrue(run_simulator.replay(
+                os.path.join(self.tmp.name, name)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+import libheat.stntools as stntools
+import run_simulator
+
+
+STN1 = "test_data/two_contingent.json"
+STN2 = "test_data/two_agent_stretch.json"
+OPTIONS = {"ar_threshold": 0.5, "si_threshold": 0.0, "alp_threshold": 0.0}
+
+
+class TestVariantSimulations(unittest.TestCase):
+
+    def test_variants_match_separate_runs(self):
+        stn = stntools.load_stn_from_json_file(STN1)["stn"]
+        variants = run_simulator.make_variants("early,drea,arsi", OPTIONS)
+        together = run_simulator.multiple_variant_simulations(
+            stn, variants, 8, random_seed=11)
+        for (strat, options), response in zip(variants, together):
+            alone = run_simulator.multiple_simulations(
+                stn, strat, 8, random_seed=11, sim_options=options)
+            self.assertEqual(alone["sample_results"],
+                             response["sample_results"])
+            self.assertEqual(alone["reschedules"], response["reschedules"])
+
+    def test_arsi_sweep_matches_separate_runs(self):
+        stn = stntools.load_stn_from_json_file(STN2)["stn"]
+        variants = run_simulator.make_variants(
+            "arsi", OPTIONS, ordering_pairs=[(0.0, 0.0), (1.0, 0.0)])
+        together = run_simulator.multiple_variant_simulations(
+            stn, variants, 4, random_seed=5)
+        for (strat, options), response in zip(variants, together):
+            alone = run_simulator.multiple_simulations(
+                stn, strat, 4, random_seed=5, sim_options=options)
+            self.assertEqual(alone["sample_results"],
+                             response["sample_results"])
+            self.assertEqual(alone["sent_schedules"],
+                             response["sent_schedules"])
+
+    def test_make_variants_ordering_pairs(self):
+        variants = run_simulator.make_variants(
+            "arsi", OPTIONS, ordering_pairs=[(0.0, 0.5), (1.0, 0.25)])
+        self.assertEqual([(v[1]["ar_threshold"], v[1]["si_threshold"])
+                          for v in variants], [(0.0, 0.5), (1.0, 0.25)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+import pulp
+import scipy.optimize
+
+from libheat import lpcapture
+import libheat.srea as srea
+import libheat.stntools as stntools
+from libheat.decoupling import optdecouple
+
+STN = "test_data/two_agent_sync.json"
+
+
+class TestLpCapture(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "lps.jsonl")
+        self.stn = stntools.load_stn_from_json_file(STN)["stn"]
+
+    def tearDown(self):
+        lpcapture.stop()
+        self.tmp.cleanup()
+
+    def test_capture_srea(self):
+        alpha, guide = srea.srea(self.stn)
+        self.assertFalse(os.path.exists(self.path))
+        lpcapture.start(self.path)
+        self.assertTrue(lpcapture.is_capturing())
+        again, guide = srea.srea(self.stn)
+        counts = lpcapture.stop()
+        self.assertFalse(lpcapture.is_capturing())
+        self.assertEqual(again, alpha)
+        lps = lpcapture.load(self.path)
+        self.assertEqual(counts, {"srea": len(lps)})
+        self.assertEqual({lp["kind"] for lp in lps}, {"srea"})
+        self.assertIn(alpha, [lp["alpha"] for lp in lps
+                              if lp["status"] == "Optimal"])
+
+    def test_limit(self):
+        lpcapture.start(self.path, limit=2)
+        optdecouple.decouple_agents(self.stn, fidelity=0.005)
+        self.assertEqual(lpcapture.stop(), {"interagent_flex": 2})
+        self.assertEqual(len(lpcapture.load(self.path)), 2)
+
+    def test_rebuilt_lps_have_the_same_optimum(self):
+        lpcapture.start(self.path)
+        srea.srea(self.stn)
+        optdecouple.decouple_agents(self.stn, fidelity=0.005)
+        lpcapture.stop()
+        lps = [lp for lp in lpcapture.load(self.path)
+               if lp["status"] == "Optimal"]
+        self.assertEqual({lp["kind"] for lp in lps},
+                         {"srea", "interagent_flex"})
+        for lp in lps:
+            prob = lpcapture.to_pulp(lp)
+            prob.solve()
+            self.assertEqual(pulp.LpStatus[prob.status], "Optimal")
+            self.assertAlmostEqual(pulp.value(prob.objective),
+                                   lp["objective_value"], places=3)
+            arrays = lpcapture.to_arrays(lp)
+            result = scipy.optimize.linprog(
+                arrays["c"], A_ub=arrays["A_ub"], b_ub=arrays["b_ub"],
+                A_eq=arrays["A_eq"], b_eq=arrays["b_eq"],
+                bounds=arrays["bounds"])
+            if result.status == 0:
+                self.assertAlmostEqual(
+                    arrays["sign"] * result.fun + arrays["constant"],
+                    lp["objective_value"], places=3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+
+import libheat.stntools as stntools
+from libheat.stntools import generator
+
+
+class TestGenerator(unittest.TestCase):
+
+    def test_sizes(self):
+        stn = stntools.generate_stn(agents=5, timepoints=6,
+                                    synchrony_density=0.2, seed=1)
+        self.assertEqual(len(stn.verts), 5 * 6 + 1)
+        self.assertEqual(sorted(stn.agents), list(range(5)))
+        self.assertEqual(len(stn.getAgentVerts(3)), 6)
+        self.assertEqual(len(stn.interagent_edges), 6)
+        self.assertEqual(stn.name, "synthetic-a5-t6-c0.5-s0.2-g1.0-seed1")
+
+    def test_seeded(self):
+        self.assertEqual(stntools.generate_json(agents=3, seed=4),
+                         stntools.generate_json(agents=3, seed=4))
+        self.assertNotEqual(stntools.generate_json(agents=3, seed=4),
+                            stntools.generate_json(agents=3, seed=5))
+
+    def test_densities_and_mixes(self):
+        stn = stntools.generate_stn(agents=2, timepoints=10,
+                                    contingent_density=0.0, seed=2)
+        self.assertEqual(len(stn.contingent_edges), 0)
+        stn = stntools.generate_stn(agents=2, timepoints=10,
+                                    contingent_density=1.0,
+                                    gaussian_fraction=0.0, seed=2)
+        self.assertEqual(len(stn.contingent_edges), 10)
+        self.assertEqual({e.dtype() for e in stn.contingent_edges.values()},
+                         {"uniform"})
+        stn = stntools.generate_stn(agents=1, timepoints=9,
+                                    synchrony_density=1.0, seed=2)
+        self.assertEqual(len(stn.interagent_edges), 0)
+
+    def test_consistent(self):
+        for seed in range(5):
+            stn = stntools.generate_stn(agents=4, timepoints=8,
+                                        synchrony_density=0.5,
+                                        contingent_density=0.7,
+                                        gaussian_fraction=0.5, seed=seed)
+            self.assertTrue(stn.floyd_warshall())
+
+    def test_written_json_loads(self):
+        jsonstn = stntools.generate_json(agents=3, timepoints=4, seed=6)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "synthetic.json")
+            generator.write_json(path, jsonstn)
+            stn = stntools.load_stn_from_json_file(path)["stn"]
+        self.assertEqual(len(stn.verts), 13)
+        self.assertEqual(len(stn.edges), len(jsonstn["nodes"])
+                         + len(jsonstn["constraints"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import pickle
+import unittest
+
+import libheat.stntools as stntools
+from libheat import prescreen
+from libheat import sharedstn
+from libheat.sharedstn import SharedSTN
+
+
+STN1 = "test_data/two_agent_stretch.json"
+
+
+class TestSharedSTN(unittest.TestCase):
+
+    def setUp(self):
+        self.stn = stntools.load_stn_from_json_file(STN1)["stn"]
+        self.handle = SharedSTN(self.stn)
+
+    def tearDown(self):
+        self.handle.unlink()
+
+    def test_round_trip(self):
+        stn = self.handle.to_stn()
+        self.assertEqual(stn.verts, self.stn.verts)
+        self.assertEqual(stn.edges, self.stn.edges)
+        self.assertEqual(stn.contingent_edges, self.stn.contingent_edges)
+        self.assertEqual(stn.interagent_edges, self.stn.interagent_edges)
+        self.assertEqual(stn.agents, self.stn.agents)
+        self.assertEqual(stn.name, self.stn.name)
+
+    def test_pickled_handle_attaches_read_only(self):
+        handle = pickle.loads(pickle.dumps(self.handle))
+        index, matrix = handle.distances()
+        expected_index, expected = prescreen.distance_matrix(self.stn)
+        self.assertEqual(index, expected_index)
+        self.assertTrue((matrix == expected).all())
+        with self.assertRaises(ValueError):
+            matrix[0, 0] = 1.0
+
+    def test_stn_is_cached(self):
+        self.assertIs(self.handle.stn(), self.handle.stn())
+
+    def test_derived_once(self):
+        built = []
+        for n in range(2):
+            self.handle.derived("count", lambda stn: built.append(stn))
+        self.assertEqual(built, [self.handle.stn()])
+
+    def test_cache_keeps_recent_stns(self):
+        built = self.handle.stn()
+        others = [SharedSTN(self.stn) for n in range(sharedstn.CACHE_SIZE)]
+        try:
+            for other in others[:-1]:
+                other.stn()
+            # Still cached, and now the most recently used.
+            self.assertIs(self.handle.stn(), built)
+            others[-1].stn()
+            self.assertIs(self.handle.stn(), built)
+            self.assertEqual(len(sharedstn._cache), sharedstn.CACHE_SIZE)
+            self.assertNotIn((others[0].name, "stn"), sharedstn._cache)
+        finally:
+            for other in others:
+                other.unlink()
+
+
+if __name__ == "__main__":
+    unittest.main()
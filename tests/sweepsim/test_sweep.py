@@ -0,0 +1,55 @@
+import unittest
+
+import numpy as np
+
+import libheat.stntools as stntools
+from libheat.montsim import Simulator, draw_samples
+from libheat.sweepsim import SweepSimulator
+
+
+STN1 = "test_data/two_agent_sync.json"
+STN2 = "test_data/two_agent_stretch.json"
+SETTINGS = [(0.0, 0.0), (0.25, 0.0), (0.5, 0.125), (1.0, 0.0), (1.0, 1.0)]
+
+
+class TestSweepSimulator(unittest.TestCase):
+
+    def _compare(self, path, seeds):
+        stn = stntools.load_stn_from_json_file(path)["stn"]
+        for seed in seeds:
+            samples = draw_samples(stn, np.random.RandomState(seed))
+            swept = SweepSimulator(seed).simulate_sweep(stn, SETTINGS,
+                                                        samples=samples)
+            for (ar, si), result in zip(SETTINGS, swept):
+                sim = Simulator(seed)
+                ans = sim.simulate(stn, "arsi", samples=samples,
+                                   sim_options={"ar_threshold": ar,
+                                                "si_threshold": si})
+                self.assertEqual(result, (ans, sim.num_reschedules,
+                                          sim.num_sent_schedules))
+
+    def test_sweep_matches_separate_runs(self):
+        self._compare(STN1, range(6))
+
+    def test_sweep_matches_separate_runs_2(self):
+        self._compare(STN2, range(3))
+
+    def test_fork_is_independent(self):
+        stn = stntools.load_stn_from_json_file(STN1)["stn"]
+        sim = Simulator(3)
+        sim.setup(stn)
+        sim.update_guide("early")
+        forked = sim.fork()
+        self.assertTrue(sim.dispatch_next())
+        self.assertNotEqual(sim.get_assigned_times(),
+                            forked.get_assigned_times())
+        while not forked.all_assigned():
+            forked.update_guide("early")
+            if not forked.dispatch_next():
+                break
+        self.assertEqual(sim.get_assigned_times()[0],
+                         forked.get_assigned_times()[0])
+
+
+if __name__ == "__main__":
+    unittest.main()